@@ -1,8 +1,12 @@
 import os
-import sqlite3
 from datetime import datetime
-from google.cloud import vision
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
+import cache_analisis
+from clasificador import Clasificador
+from detectores import obtener_detector, MAX_IMAGENES_POR_SOLICITUD, MAX_BYTES_POR_SOLICITUD
+from migraciones import MIGRACIONES_ALERTAS, aplicar as aplicar_migraciones
+from escritor_alertas import obtener_escritor
+from overlays import dibujar_cajas_pil
 
 # Ruta al JSON de credenciales
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'hackaton-segiridad-500d3a7a5a64.json'
@@ -13,84 +17,109 @@ os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'hackaton-segiridad-500d3a7a5a64.
 DB_PATH = "alertas.db"
 
 def init_db():
-    """Crea la base de datos y la tabla si no existen."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS alertas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fecha_hora TEXT NOT NULL,
-            imagen TEXT NOT NULL,
-            tipo TEXT NOT NULL,
-            objeto TEXT NOT NULL,
-            confianza REAL NOT NULL,
-            x1 REAL,
-            y1 REAL,
-            x2 REAL,
-            y2 REAL,
-            ubicacion TEXT
-        )
-    """)
-    
-    # Migración: agregar columna 'tipo' si no existe
-    try:
-        cur.execute("ALTER TABLE alertas ADD COLUMN tipo TEXT")
-        # Si la tabla ya tenía datos, actualizar los tipos basándose en el objeto
-        cur.execute("""
-            UPDATE alertas 
-            SET tipo = CASE 
-                WHEN objeto LIKE 'incendio:%' THEN 'incendio'
-                WHEN objeto IN ('gun', 'knife', 'weapon', 'firearm', 'rifle') 
-                     OR objeto LIKE '%gun%' OR objeto LIKE '%knife%' 
-                     OR objeto LIKE '%weapon%' OR objeto LIKE '%firearm%' 
-                     OR objeto LIKE '%rifle%' THEN 'arma'
-                ELSE 'otro'
-            END
-            WHERE tipo IS NULL
-        """)
-        conn.commit()
-    except sqlite3.OperationalError:
-        # La columna ya existe, no hacer nada
-        pass
-    
-    # Migración: agregar columna 'ubicacion' si no existe
-    try:
-        cur.execute("ALTER TABLE alertas ADD COLUMN ubicacion TEXT")
-        conn.commit()
-    except sqlite3.OperationalError:
-        # La columna ya existe, no hacer nada
-        pass
-    
-    conn.commit()
-    conn.close()
-
-def guardar_alerta(imagen, tipo, objeto, confianza, x1=None, y1=None, x2=None, y2=None, ubicacion=None):
-    """Guarda una alerta en la base de datos y envía notificaciones si es crítica."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO alertas (fecha_hora, imagen, tipo, objeto, confianza, x1, y1, x2, y2, ubicacion)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    """Lleva alertas.db a la última versión de esquema (solo corre las migraciones pendientes)."""
+    aplicar_migraciones(DB_PATH, MIGRACIONES_ALERTAS)
+    
+    # Caché de análisis (cache_analisis.db, junto a alertas.db)
+    cache_analisis.init_cache()
+
+def guardar_alerta(imagen, tipo, objeto, confianza, x1=None, y1=None, x2=None, y2=None, ubicacion=None,
+                   clip=None):
+    """
+    Encola una alerta en el escritor de alertas y envía notificaciones si es crítica.
+    
+    La inserción se hace en segundo plano, agrupada con otras alertas; solo las
+    alertas críticas esperan a que se escriba su fila para notificar con su id.
+    `clip` es la ruta del video de la alerta (cámaras), que puede terminar de
+    escribirse después.
+    
+    Returns:
+        Future que se resuelve con el id de la alerta insertada
+    """
+    futuro = obtener_escritor(DB_PATH).encolar((
         datetime.now().isoformat(timespec="seconds"),
         imagen,
         tipo,
         objeto,
         confianza,
         x1, y1, x2, y2,
-        ubicacion
+        ubicacion,
+        clip
     ))
-    conn.commit()
-    conn.close()
     
-    # Enviar alerta a destinatarios si es crítica (arma, incendio o agresión con confianza >= 50%)
-    if tipo in ['arma', 'incendio', 'agresion'] and confianza >= 0.50 and ubicacion:
+    if es_alerta_critica(tipo, confianza, ubicacion):
+        notificar_alerta(imagen, tipo, objeto, confianza, ubicacion, alerta_id=_id_alerta(futuro))
+    return futuro
+
+def guardar_alertas_lote(registros):
+    """
+    Guarda varias alertas con el escritor de alertas y notifica las críticas.
+    
+    Args:
+        registros: Lista de tuplas (imagen, tipo, objeto, confianza, x1, y1, x2, y2, ubicacion)
+    
+    Returns:
+        Lista de ids de las alertas insertadas (None si alguna falló)
+    """
+    if not registros:
+        return []
+    
+    fecha_hora = datetime.now().isoformat(timespec="seconds")
+    escritor = obtener_escritor(DB_PATH)
+    # Las imágenes analizadas no tienen clip
+    futuros = [escritor.encolar((fecha_hora,) + tuple(registro) + (None,)) for registro in registros]
+    ids = [_id_alerta(futuro) for futuro in futuros]
+    
+    for (imagen, tipo, objeto, confianza, _, _, _, _, ubicacion), alerta_id in zip(registros, ids):
+        if es_alerta_critica(tipo, confianza, ubicacion):
+            notificar_alerta(imagen, tipo, objeto, confianza, ubicacion, alerta_id=alerta_id)
+    return ids
+
+def actualizar_alerta(alerta, confianza, imagen=None, objeto=None):
+    """
+    Actualiza la confianza (y opcionalmente la imagen y el objeto) de una alerta ya guardada.
+    
+    Se usa cuando un incidente que sigue a la vista mejora su confianza: la fila
+    se actualiza en su lugar en vez de insertar otra alerta. No vuelve a notificar.
+    
+    Args:
+        alerta: id de la alerta o el Future que devolvió guardar_alerta
+        confianza: Nueva confianza
+        imagen: Nueva imagen de evidencia (None = conservar la actual)
+        objeto: Objeto de la detección que mejoró la confianza (None = conservar el actual)
+    
+    Returns:
+        Future que se resuelve con el id de la alerta actualizada
+    """
+    cambios = {'confianza': confianza}
+    if imagen is not None:
+        cambios['imagen'] = imagen
+    if objeto is not None:
+        cambios['objeto'] = objeto
+    return obtener_escritor(DB_PATH).actualizar(alerta, **cambios)
+
+def _id_alerta(futuro, timeout=10):
+    """Espera a que se escriba una alerta y devuelve su id, o None si no se pudo guardar."""
+    try:
+        return futuro.result(timeout=timeout)
+    except Exception as e:
+        print(f"[ERROR] No se pudo guardar la alerta: {e}")
+        return None
+
+def es_alerta_critica(tipo, confianza, ubicacion):
+    """Indica si una alerta debe enviarse a los destinatarios de su ubicación."""
+    # Arma, incendio o agresión con confianza >= 50% en una ubicación conocida
+    return tipo in ['arma', 'incendio', 'agresion'] and confianza >= 0.50 and bool(ubicacion)
+
+def notificar_alerta(imagen, tipo, objeto, confianza, ubicacion, alerta_id=None):
+    """Envía la alerta a los destinatarios de la ubicación si es crítica."""
+    if es_alerta_critica(tipo, confianza, ubicacion):
         try:
             # Importación condicional para evitar importación circular
             import sys
             if 'app' in sys.modules:
                 from app import enviar_alerta_ubicacion
-                enviar_alerta_ubicacion(ubicacion, tipo, objeto, confianza, imagen)
+                enviar_alerta_ubicacion(ubicacion, tipo, objeto, confianza, imagen, alerta_id=alerta_id)
         except Exception as e:
             print(f"[ERROR] No se pudo enviar alerta: {e}")
 
@@ -108,57 +137,13 @@ def dibujar_bounding_boxes(ruta_imagen, detecciones, ruta_salida=None):
     Returns:
         Ruta de la imagen guardada
     """
-    # Leer imagen con PIL para mejor compatibilidad
+    # Leer imagen con PIL para mejor compatibilidad (JPEG requiere RGB)
     img = Image.open(ruta_imagen)
-    draw = ImageDraw.Draw(img)
-    
-    # Colores por tipo de amenaza
-    colores = {
-        'arma': (255, 0, 0),      # Rojo
-        'incendio': (255, 165, 0), # Naranja
-        'vehiculo': (255, 255, 0), # Amarillo
-        'otro': (0, 0, 255)        # Azul
-    }
-    
-    # Obtener dimensiones de la imagen
-    width, height = img.size
-    
-    for tipo, objeto, confianza, x1, y1, x2, y2 in detecciones:
-        if x1 is None or y1 is None or x2 is None or y2 is None:
-            continue  # Saltar si no hay coordenadas
-        
-        # Convertir coordenadas normalizadas a píxeles
-        x1_px = int(x1 * width)
-        y1_px = int(y1 * height)
-        x2_px = int(x2 * width)
-        y2_px = int(y2 * height)
-        
-        # Color según tipo
-        color = colores.get(tipo, colores['otro'])
-        
-        # Dibujar rectángulo
-        draw.rectangle([x1_px, y1_px, x2_px, y2_px], outline=color, width=3)
-        
-        # Dibujar etiqueta con fondo
-        etiqueta = f"{objeto} ({confianza:.2f})"
-        try:
-            font = ImageFont.truetype("arial.ttf", 16)
-        except:
-            font = ImageFont.load_default()
-        
-        # Obtener tamaño del texto
-        bbox = draw.textbbox((0, 0), etiqueta, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Fondo para el texto
-        draw.rectangle(
-            [x1_px, y1_px - text_height - 4, x1_px + text_width + 4, y1_px],
-            fill=color
-        )
-        
-        # Texto
-        draw.text((x1_px + 2, y1_px - text_height - 2), etiqueta, fill=(255, 255, 255), font=font)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Fuentes y etiquetas renderizadas se reutilizan entre imágenes
+    dibujar_cajas_pil(img, detecciones)
     
     # Guardar imagen
     if ruta_salida is None:
@@ -169,199 +154,111 @@ def dibujar_bounding_boxes(ruta_imagen, detecciones, ruta_salida=None):
     return ruta_salida
 
 
-def detectar_amenazas(ruta_imagen, generar_imagen_anotada=True, ubicacion=None):
+# Umbrales de las imágenes subidas: cualquier arma se reporta, incendio exige 0.70
+CLASIFICADOR = Clasificador(umbrales={'arma': 0.0, 'vehiculo': 0.60, 'incendio': 0.70})
+
+
+def clasificar_amenazas(objetos, etiquetas, verbose=True):
     """
-    Detecta amenazas en una imagen: armas, incendios y vehículos sospechosos.
+    Clasifica los objetos y etiquetas de Vision en detecciones de amenazas.
     
     Args:
-        ruta_imagen: Ruta de la imagen a analizar
-        generar_imagen_anotada: Si True, genera una imagen con bounding boxes dibujados
-        ubicacion: Ubicación donde se tomó la imagen (opcional)
+        objetos: Lista [(nombre, score, x1, y1, x2, y2), ...] de parsear_respuesta
+        etiquetas: Lista [(descripcion, score), ...] de parsear_respuesta
+        verbose: Si True, imprime el detalle de cada alerta y las etiquetas de debug
+    
+    Returns:
+        Lista de detecciones: [(tipo, objeto, confianza, x1, y1, x2, y2), ...]
     """
+    log = print if verbose else (lambda *args, **kwargs: None)
 
-    cliente = vision.ImageAnnotatorClient()
-
-    with open(ruta_imagen, 'rb') as f:
-        content = f.read()
-
-    image = vision.Image(content=content)
-
-    # Detección de objetos (ARMAS / PERSONAS / VEHÍCULOS)
-    respuesta = cliente.object_localization(image=image)
-
-    print("\n--- RESULTADOS DEL OJO DE DIOS ---")
-
-    alerta = False
     detecciones = []  # Lista para almacenar todas las detecciones para dibujar
 
-    # Lista de objetos peligrosos que queremos detectar
-    OBJETOS_PELIGROSOS = [
-        "gun", "knife", "weapon", "firearm", "rifle", "pistol", "sword",
-        "blade", "cutting tool", "kitchen knife", "dagger", "machete",
-        "scalpel", "razor", "bayonet"
-    ]
-    
-    # Vehículos sospechosos (pueden ser usados para ataques)
-    VEHICULOS_SOSPECHOSOS = ["truck", "van", "suv", "vehicle", "car", "automobile"]
-
-    for obj in respuesta.localized_object_annotations:
-        nombre = obj.name.lower()
-        score = obj.score
-        box = obj.bounding_poly.normalized_vertices
-        x1, y1 = box[0].x, box[0].y
-        x2, y2 = box[2].x, box[2].y
+    objetos_clasificados = CLASIFICADOR.clasificar([(nombre, score) for nombre, score, *_ in objetos])
+    etiquetas_clasificadas = CLASIFICADOR.clasificar(etiquetas)
 
-        # (A) Si detecta persona (informativo)
-        if "person" in nombre:
-            print(f"[OK] Persona detectada (confianza: {score:.2f})")
-
-        # (B) Si detecta un arma (ALERTA)
-        for peligro in OBJETOS_PELIGROSOS:
-            if peligro in nombre:
-                alerta = True
-                print(f"\n🚨 ALERTA PELIGROSA (ARMA) 🚨")
-                print(f"Objeto detectado: {nombre.upper()}")
-                print(f"Confianza: {score:.2f}")
-                print(f"Coordenadas: {x1:.2f},{y1:.2f} → {x2:.2f},{y2:.2f}")
-                print("----------------------------------")
-
-                guardar_alerta(
-                    imagen=ruta_imagen,
-                    tipo="arma",
-                    objeto=nombre,
-                    confianza=score,
-                    x1=x1, y1=y1, x2=x2, y2=y2,
-                    ubicacion=ubicacion
-                )
-                detecciones.append(("arma", nombre, score, x1, y1, x2, y2))
-                break
-
-        # (C) Detección de vehículos sospechosos
-        for vehiculo in VEHICULOS_SOSPECHOSOS:
-            if vehiculo in nombre and score >= 0.60:
-                alerta = True
-                print(f"\n⚠️ ALERTA: VEHÍCULO SOSPECHOSO ⚠️")
-                print(f"Vehículo detectado: {nombre.upper()}")
-                print(f"Confianza: {score:.2f}")
-                print(f"Coordenadas: {x1:.2f},{y1:.2f} → {x2:.2f},{y2:.2f}")
-                print("----------------------------------")
-
-                guardar_alerta(
-                    imagen=ruta_imagen,
-                    tipo="vehiculo",
-                    objeto=nombre,
-                    confianza=score,
-                    x1=x1, y1=y1, x2=x2, y2=y2,
-                    ubicacion=ubicacion
-                )
-                detecciones.append(("vehiculo", nombre, score, x1, y1, x2, y2))
-                break
-
-    # ================================
-    # 🔥 DETECCIÓN DE INCENDIO
-    # ================================
-    PATRONES_INCENDIO = [
-        "fire", "flames", "flame", "smoke",
-        "wildfire", "conflagration", "explosion", "burning"
-    ]
-    
-    # ================================
-    # ⚔️ DETECCIÓN DE AGRESIÓN (MEJORADA)
-    # ================================
-    PATRONES_AGRESION_DIRECTOS = [
-        "violence", "aggression", "aggressive", "fight", "fighting",
-        "assault", "attack", "conflict", "combat", "brawl",
-        "altercation", "struggle", "hostility", "hostile",
-        "physical violence", "physical altercation", "physical conflict",
-        "punch", "punching", "hitting", "striking", "kicking",
-        "wrestling", "grappling", "scuffle", "tussle", "melee"
-    ]
-    
-    PATRONES_AGRESION_CONTEXTO = [
-        "action", "tension", "drama", "martial arts", "boxing",
-        "self defense", "defense", "street", "urban", "outdoor",
-        "person", "people", "crowd", "group", "gathering"
-    ]
-    
-    PATRONES_POSTURAS_AGRESIVAS = [
-        "lying", "lying down", "on ground", "ground", "floor",
-        "standing", "over", "above", "leaning", "bending",
-        "arm", "arms", "raised", "extended", "outstretched"
-    ]
-    
     # Detectar múltiples personas (puede indicar pelea)
     personas_detectadas = 0
     personas_en_suelo = 0
     personas_de_pie = 0
-    
-    for obj in respuesta.localized_object_annotations:
-        nombre_obj = obj.name.lower()
-        if "person" in nombre_obj:
+
+    for (nombre, score, x1, y1, x2, y2), clasificado in zip(objetos, objetos_clasificados):
+        # (A) Si detecta persona (informativo)
+        if 'persona' in clasificado.coincidencias:
+            log(f"[OK] Persona detectada (confianza: {score:.2f})")
             personas_detectadas += 1
             # Intentar detectar postura (esto es aproximado)
-            box = obj.bounding_poly.normalized_vertices
-            if len(box) >= 4:
-                altura_obj = abs(box[2].y - box[0].y)
-                posicion_y = (box[0].y + box[2].y) / 2
+            if y1 is not None:
+                posicion_y = (y1 + y2) / 2
                 # Si está en la parte inferior de la imagen, probablemente está en el suelo
                 if posicion_y > 0.7:  # Parte inferior de la imagen
                     personas_en_suelo += 1
                 else:
                     personas_de_pie += 1
 
-    resp_labels = cliente.label_detection(image=image)
-    
+        if x1 is None:
+            continue  # Sin bounding box no se puede ubicar la amenaza
+
+        # (B) Si detecta un arma (ALERTA)
+        if 'arma' in clasificado.activas:
+            log(f"\n🚨 ALERTA PELIGROSA (ARMA) 🚨")
+            log(f"Objeto detectado: {nombre.upper()}")
+            log(f"Confianza: {score:.2f}")
+            log(f"Coordenadas: {x1:.2f},{y1:.2f} → {x2:.2f},{y2:.2f}")
+            log("----------------------------------")
+            detecciones.append(("arma", nombre, score, x1, y1, x2, y2))
+
+        # (C) Detección de vehículos sospechosos
+        if 'vehiculo' in clasificado.activas:
+            log(f"\n⚠️ ALERTA: VEHÍCULO SOSPECHOSO ⚠️")
+            log(f"Vehículo detectado: {nombre.upper()}")
+            log(f"Confianza: {score:.2f}")
+            log(f"Coordenadas: {x1:.2f},{y1:.2f} → {x2:.2f},{y2:.2f}")
+            log("----------------------------------")
+            detecciones.append(("vehiculo", nombre, score, x1, y1, x2, y2))
+
     # Modo debug: mostrar todas las etiquetas detectadas (SIEMPRE activo para diagnóstico)
-    print("\n[DEBUG] Etiquetas detectadas por Google Vision:")
-    todas_las_etiquetas = []
-    for label in resp_labels.label_annotations[:25]:  # Primeras 25
-        desc_lower = label.description.lower()
-        todas_las_etiquetas.append((desc_lower, label.score))
-        print(f"  - {label.description}: {label.score:.3f}")
+    log("\n[DEBUG] Etiquetas detectadas por Google Vision:")
+    primeras_etiquetas = etiquetas_clasificadas[:25]  # Primeras 25
+    for etiqueta in primeras_etiquetas:
+        log(f"  - {etiqueta.descripcion}: {etiqueta.score:.3f}")
         # Resaltar si alguna coincide con patrones de agresión
-        if any(palabra in desc_lower for palabra in PATRONES_AGRESION_DIRECTOS):
-            print(f"    ⚠️ COINCIDE CON PATRÓN DE AGRESIÓN DIRECTA!")
-        elif any(palabra in desc_lower for palabra in PATRONES_AGRESION_CONTEXTO):
-            print(f"    ⚠️ COINCIDE CON PATRÓN DE CONTEXTO DE AGRESIÓN!")
+        if 'agresion_directa' in etiqueta.coincidencias:
+            log(f"    ⚠️ COINCIDE CON PATRÓN DE AGRESIÓN DIRECTA!")
+        elif 'agresion_contexto' in etiqueta.coincidencias:
+            log(f"    ⚠️ COINCIDE CON PATRÓN DE CONTEXTO DE AGRESIÓN!")
     
-    print(f"\n[DEBUG] Personas detectadas: {personas_detectadas}")
-    print(f"[DEBUG] Personas en suelo: {personas_en_suelo}, Personas de pie: {personas_de_pie}")
-
-    resp_labels = cliente.label_detection(image=image)
+    log(f"\n[DEBUG] Personas detectadas: {personas_detectadas}")
+    log(f"[DEBUG] Personas en suelo: {personas_en_suelo}, Personas de pie: {personas_de_pie}")
 
+    # ================================
+    # ⚔️ DETECCIÓN DE AGRESIÓN (MEJORADA)
+    # ================================
     # Estrategia 1: Detección directa de agresión (umbral bajo: 0.40)
     agresion_detectada = False
     confianza_agresion = 0.0
     descripcion_agresion = ""
     
-    for label in resp_labels.label_annotations:
-        desc = label.description.lower()
-        score = label.score
-
-        # Umbral muy bajo para agresión directa
-        if score >= 0.40:
-            for palabra in PATRONES_AGRESION_DIRECTOS:
-                if palabra in desc:
-                    agresion_detectada = True
-                    confianza_agresion = max(confianza_agresion, score)
-                    descripcion_agresion = desc
-                    break
+    for etiqueta in etiquetas_clasificadas:
+        if 'agresion_directa' in etiqueta.activas:
+            agresion_detectada = True
+            confianza_agresion = max(confianza_agresion, etiqueta.score)
+            descripcion_agresion = etiqueta.descripcion
     
     # Estrategia 2: Detección por contexto (múltiples personas + etiquetas de acción)
     if not agresion_detectada and personas_detectadas >= 2:
         etiquetas_accion = []
         confianza_total = 0.0
         
-        for desc, score in todas_las_etiquetas:
-            if score >= 0.35:  # Umbral muy bajo
-                # Buscar etiquetas de acción/tensión
-                if any(palabra in desc for palabra in ["action", "tension", "drama", "movement", "motion"]):
-                    etiquetas_accion.append(desc)
-                    confianza_total += score
-                # Buscar posturas agresivas
-                if any(palabra in desc for palabra in PATRONES_POSTURAS_AGRESIVAS):
-                    etiquetas_accion.append(desc)
-                    confianza_total += score * 0.5
+        for etiqueta in primeras_etiquetas:
+            # Buscar etiquetas de acción/tensión (umbral muy bajo: 0.35)
+            if 'accion' in etiqueta.activas:
+                etiquetas_accion.append(etiqueta.descripcion)
+                confianza_total += etiqueta.score
+            # Buscar posturas agresivas
+            if 'postura_ampliada' in etiqueta.activas:
+                etiquetas_accion.append(etiqueta.descripcion)
+                confianza_total += etiqueta.score * 0.5
         
         if len(etiquetas_accion) >= 2:
             # Si hay múltiples personas y varias etiquetas de acción, es probable agresión
@@ -377,50 +274,79 @@ def detectar_amenazas(ruta_imagen, generar_imagen_anotada=True, ubicacion=None):
         confianza_agresion = 0.65
         descripcion_agresion = "persona en suelo con otra persona de pie (posible agresión)"
     
-    # Guardar alerta si se detectó agresión
+    # Registrar agresión
     if agresion_detectada:
-        alerta = True
-        print(f"\n⚔️🚨 ALERTA DE AGRESIÓN 🚨⚔️")
-        print(f"Etiqueta/Contexto detectado: {descripcion_agresion.upper()}")
-        print(f"Confianza: {confianza_agresion:.2f}")
-        print(f"Personas detectadas: {personas_detectadas} (en suelo: {personas_en_suelo}, de pie: {personas_de_pie})")
-        print("----------------------------------")
-
-        guardar_alerta(
-            imagen=ruta_imagen,
-            tipo="agresion",
-            objeto=descripcion_agresion,
-            confianza=confianza_agresion,
-            x1=None, y1=None, x2=None, y2=None,
-            ubicacion=ubicacion
-        )
+        log(f"\n⚔️🚨 ALERTA DE AGRESIÓN 🚨⚔️")
+        log(f"Etiqueta/Contexto detectado: {descripcion_agresion.upper()}")
+        log(f"Confianza: {confianza_agresion:.2f}")
+        log(f"Personas detectadas: {personas_detectadas} (en suelo: {personas_en_suelo}, de pie: {personas_de_pie})")
+        log("----------------------------------")
         detecciones.append(("agresion", descripcion_agresion, confianza_agresion, None, None, None, None))
     
-    # Detectar incendio (después de agresión)
-    for label in resp_labels.label_annotations:
-        desc = label.description.lower()
-        score = label.score
-        
-        if score >= 0.70:
-            for palabra in PATRONES_INCENDIO:
-                if palabra in desc:
-                    alerta = True
-                    print(f"\n🔥🚨 ALERTA DE INCENDIO 🚨🔥")
-                    print(f"Etiqueta detectada: {desc.upper()}")
-                    print(f"Confianza: {score:.2f}")
-                    print("----------------------------------")
-
-                    guardar_alerta(
-                        imagen=ruta_imagen,
-                        tipo="incendio",
-                        objeto=desc,
-                        confianza=score,
-                        x1=None, y1=None, x2=None, y2=None,
-                        ubicacion=ubicacion
-                    )
-                    # Para incendios no hay bounding box, pero lo agregamos a detecciones sin coordenadas
-                    detecciones.append(("incendio", desc, score, None, None, None, None))
-                    break
+    # ================================
+    # 🔥 DETECCIÓN DE INCENDIO (después de agresión)
+    # ================================
+    for etiqueta in etiquetas_clasificadas:
+        if 'incendio' in etiqueta.activas:
+            log(f"\n🔥🚨 ALERTA DE INCENDIO 🚨🔥")
+            log(f"Etiqueta detectada: {etiqueta.descripcion.upper()}")
+            log(f"Confianza: {etiqueta.score:.2f}")
+            log("----------------------------------")
+            # Para incendios no hay bounding box, pero lo agregamos a detecciones sin coordenadas
+            detecciones.append(("incendio", etiqueta.descripcion, etiqueta.score, None, None, None, None))
+
+    return detecciones
+
+
+def detectar_amenazas(ruta_imagen, generar_imagen_anotada=True, ubicacion=None, metricas=None):
+    """
+    Detecta amenazas en una imagen: armas, incendios y vehículos sospechosos.
+    
+    Args:
+        ruta_imagen: Ruta de la imagen a analizar
+        generar_imagen_anotada: Si True, genera una imagen con bounding boxes dibujados
+        ubicacion: Ubicación donde se tomó la imagen (opcional)
+        metricas: Diccionario opcional que se completa con métricas del análisis
+                  ('detector', 'llamadas_vision', 'cache')
+    """
+
+    with open(ruta_imagen, 'rb') as f:
+        content = f.read()
+
+    detector = obtener_detector()
+
+    # Consultar la caché antes de cualquier llamada de red
+    hash_contenido = cache_analisis.hash_imagen(content)
+    en_cache = cache_analisis.obtener(hash_contenido) if detector.usa_cache else None
+
+    print("\n--- RESULTADOS DEL OJO DE DIOS ---")
+
+    if en_cache:
+        _, detecciones = en_cache
+        llamadas_vision = 0
+        print(f"[CACHE] ✅ Imagen ya analizada ({hash_contenido[:12]}): se reutiliza el resultado")
+    else:
+        entrada, metricas_normalizacion = detector.preparar_bytes(content)
+        if metricas_normalizacion:
+            print(f"[NORMALIZACIÓN] {metricas_normalizacion['bytes_antes'] / 1024:.0f} KB → "
+                  f"{metricas_normalizacion['bytes_despues'] / 1024:.0f} KB "
+                  f"(+{metricas_normalizacion['ms_codificacion']:.1f} ms)")
+        if metricas is not None:
+            metricas.update(metricas_normalizacion)
+
+        # Una sola detección: objetos (ARMAS / PERSONAS / VEHÍCULOS) + etiquetas
+        resultado = detector.detectar(entrada)
+        llamadas_vision = 1 if detector.nombre == 'vision' else 0
+
+        detecciones = clasificar_amenazas(resultado.objetos, resultado.etiquetas)
+        if detector.usa_cache:
+            cache_analisis.guardar(hash_contenido, resultado.crudo, detecciones)
+
+    # Guardar cada detección como alerta (espera a que estén escritas antes de devolver)
+    guardar_alertas_lote([
+        (ruta_imagen, tipo, objeto, confianza, x1, y1, x2, y2, ubicacion)
+        for tipo, objeto, confianza, x1, y1, x2, y2 in detecciones
+    ])
 
     # Generar imagen anotada si hay detecciones
     if generar_imagen_anotada and detecciones:
@@ -431,27 +357,196 @@ def detectar_amenazas(ruta_imagen, generar_imagen_anotada=True, ubicacion=None):
             print(f"\n⚠️ Error al generar imagen anotada: {e}")
 
     # Mensaje final
-    if alerta:
+    if detecciones:
         print("\n🔥 *** ALERTA ROJA: AMENAZA DETECTADA *** 🔥\n")
     else:
         print("\n✔️ Imagen analizada: No se detectaron amenazas.\n")
     
+    print(f"[VISION] Llamadas a la API para esta imagen: {llamadas_vision}")
+    if metricas is not None:
+        metricas['detector'] = detector.nombre
+        metricas['llamadas_vision'] = llamadas_vision
+        metricas['cache'] = en_cache is not None
+    
     return detecciones
 
 
+def _armar_lotes(rutas, tam_lote):
+    """Agrupa rutas en lotes respetando el máximo de imágenes y de bytes por solicitud."""
+    lotes = []
+    actual = []
+    bytes_actual = 0
+    for ruta in rutas:
+        try:
+            tamano = os.path.getsize(ruta)
+        except OSError:
+            tamano = 0  # _analizar_lote informa el error al leerla
+        if actual and (len(actual) >= tam_lote or bytes_actual + tamano > MAX_BYTES_POR_SOLICITUD):
+            lotes.append(actual)
+            actual = []
+            bytes_actual = 0
+        actual.append(ruta)
+        bytes_actual += tamano
+    if actual:
+        lotes.append(actual)
+    return lotes
+
+
+def _analizar_lote(rutas):
+    """
+    Lee y analiza un lote de imágenes, reutilizando la caché cuando es posible.
+    
+    Una imagen que no se puede leer, o un lote que la API rechaza entero
+    (deadline, UNAVAILABLE, cuota), se informa como error de esas rutas sin
+    interrumpir los demás lotes.
+    
+    Returns:
+        Lista [(ruta, detecciones, error), ...] en el orden de rutas
+    """
+    detector = obtener_detector()
+    pendientes = []
+    resultados = {}
+    for ruta in rutas:
+        try:
+            with open(ruta, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            resultados[ruta] = (ruta, None, str(e))
+            continue
+        hash_contenido = cache_analisis.hash_imagen(content)
+        en_cache = cache_analisis.obtener(hash_contenido) if detector.usa_cache else None
+        if en_cache:
+            resultados[ruta] = (ruta, en_cache[1], None)
+            continue
+        try:
+            entrada, _ = detector.preparar_bytes(content)
+        except Exception as e:
+            resultados[ruta] = (ruta, None, str(e))
+            continue
+        pendientes.append((ruta, hash_contenido, entrada))
+    
+    if pendientes:
+        try:
+            respuestas = detector.detectar_lote([entrada for _, _, entrada in pendientes])
+        except Exception as e:
+            for ruta, _, _ in pendientes:
+                resultados[ruta] = (ruta, None, str(e))
+            return [resultados[ruta] for ruta in rutas]
+        for (ruta, hash_contenido, _), resultado in zip(pendientes, respuestas):
+            if isinstance(resultado, Exception):
+                resultados[ruta] = (ruta, None, str(resultado))
+                continue
+            detecciones = clasificar_amenazas(resultado.objetos, resultado.etiquetas, verbose=False)
+            if detector.usa_cache:
+                cache_analisis.guardar(hash_contenido, resultado.crudo, detecciones)
+            resultados[ruta] = (ruta, detecciones, None)
+    
+    return [resultados[ruta] for ruta in rutas]
+
+
+def detectar_amenazas_lote(rutas, generar_imagen_anotada=False, ubicacion=None,
+                           tam_lote=MAX_IMAGENES_POR_SOLICITUD, max_concurrencia=4):
+    """
+    Analiza muchas imágenes agrupándolas en lotes del detector configurado
+    (solicitudes batch_annotate_images con Google Vision).
+    
+    Args:
+        rutas: Lista de rutas de imágenes
+        generar_imagen_anotada: Si True, genera la imagen anotada de cada imagen con detecciones
+        ubicacion: Ubicación asignada a todas las alertas (opcional)
+        tam_lote: Imágenes por lote (como máximo el tam_lote del detector)
+        max_concurrencia: Número de lotes enviados en paralelo
+    
+    Returns:
+        Diccionario {ruta: detecciones} en el mismo orden que rutas. Las imágenes
+        que fallaron en la API tienen None en lugar de la lista de detecciones.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    tam_lote = max(1, min(tam_lote, obtener_detector().tam_lote))
+    lotes = _armar_lotes(rutas, tam_lote)
+    resultados = {ruta: None for ruta in rutas}
+    total_alertas = 0
+
+    with ThreadPoolExecutor(max_workers=max_concurrencia) as executor:
+        for resultados_lote in executor.map(_analizar_lote, lotes):
+            # Las alertas de cada lote se guardan al terminarlo: un fallo posterior no las descarta
+            registros = []
+            for ruta, detecciones, error in resultados_lote:
+                if error:
+                    print(f"[LOTE] ❌ {ruta}: {error}")
+                    continue
+                
+                resultados[ruta] = detecciones
+                for tipo, objeto, confianza, x1, y1, x2, y2 in detecciones:
+                    registros.append((ruta, tipo, objeto, confianza, x1, y1, x2, y2, ubicacion))
+                
+                if generar_imagen_anotada and detecciones:
+                    try:
+                        dibujar_bounding_boxes(ruta, detecciones)
+                    except Exception as e:
+                        print(f"[LOTE] ⚠️ Error al generar imagen anotada de {ruta}: {e}")
+
+            guardar_alertas_lote(registros)
+            total_alertas += len(registros)
+
+    print(f"[LOTE] {len(rutas)} imágenes en {len(lotes)} solicitud(es), {total_alertas} alerta(s) guardada(s)")
+    return resultados
+
+
+EXTENSIONES_IMAGEN = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+def expandir_rutas(argumentos):
+    """
+    Expande archivos, directorios y patrones glob en una lista de imágenes.
+    
+    Las imágenes anotadas (*_anotada.jpg) se omiten porque son resultados del propio analizador.
+    """
+    import glob
+
+    rutas = []
+    vistas = set()
+    for argumento in argumentos:
+        if os.path.isdir(argumento):
+            candidatas = sorted(
+                os.path.join(raiz, nombre)
+                for raiz, _, nombres in os.walk(argumento)
+                for nombre in nombres
+            )
+        else:
+            candidatas = sorted(glob.glob(argumento, recursive=True)) or [argumento]
+        
+        for ruta in candidatas:
+            if not ruta.lower().endswith(EXTENSIONES_IMAGEN) or "_anotada." in ruta:
+                continue
+            if ruta not in vistas:
+                vistas.add(ruta)
+                rutas.append(ruta)
+    return rutas
+
+
 if __name__ == "__main__":
     import sys
+    import time
     
     init_db()
     
-    # Permite pasar la imagen como argumento
-    if len(sys.argv) > 1:
-        ruta_imagen = sys.argv[1]
-    else:
-        ruta_imagen = "prueba.jpg"
+    # Permite pasar imágenes, directorios o patrones glob como argumentos
+    argumentos = sys.argv[1:] or ["prueba.jpg"]
+    rutas = expandir_rutas(argumentos)
     
-    if not os.path.exists(ruta_imagen):
-        print(f"❌ Error: No se encontró la imagen '{ruta_imagen}'")
+    faltantes = [ruta for ruta in rutas if not os.path.exists(ruta)]
+    if not rutas or faltantes:
+        print(f"❌ Error: No se encontró la imagen '{(faltantes or argumentos)[0]}'")
         sys.exit(1)
     
-    detectar_amenazas(ruta_imagen)
+    inicio = time.perf_counter()
+    if len(rutas) == 1:
+        detectar_amenazas(rutas[0])
+    else:
+        detectar_amenazas_lote(rutas)
+    duracion = time.perf_counter() - inicio
+    
+    print(f"[RENDIMIENTO] {len(rutas)} imagen(es) en {duracion:.2f}s "
+          f"({len(rutas) / duracion:.2f} imágenes/s)")
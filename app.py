@@ -6,6 +6,18 @@ from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
 from analizador import detectar_amenazas, init_db
+from detectores import obtener_detector, estadisticas_llamadas_vision
+import cache_analisis
+import cache_consultas
+import normalizacion
+import overlays
+from trabajos_analisis import ColaAnalisis, ColaLlena, EN_COLA, COMPLETADO, FALLIDO
+from grabador_clips import CLIPS_DIR
+from base_datos import conectar, obtener_conexion, registrar_app
+from escritor_alertas import registrar_oyente
+from estadisticas import (alertas_por_dia, alertas_por_tipo, resumen_alertas, resumen_patrullas,
+                          resumen_reportes_usuarios, ubicaciones_con_alertas)
+from migraciones import MIGRACIONES_POBLACION, MIGRACIONES_USUARIOS, aplicar as aplicar_migraciones
 import json
 
 app = Flask(__name__)
@@ -13,6 +25,12 @@ app.config['SECRET_KEY'] = 'hackaton-seguridad-nacional-2024'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 
+# Una conexión por base de datos y solicitud, cerrada al terminar (base_datos.py)
+registrar_app(app)
+
+# Cada alerta guardada o actualizada en este proceso descarta las páginas en caché (cache_consultas.py)
+registrar_oyente(cache_consultas.invalidar)
+
 # Crear carpeta de uploads si no existe
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('alertas_frames', exist_ok=True)
@@ -26,30 +44,16 @@ def allowed_file(filename):
 # Inicializar base de datos al iniciar
 init_db()
 
+# Preparar el detector configurado (DETECTOR_BACKEND) para que la primera solicitud no pague
+# la conexión a Vision o la carga del modelo ONNX
+obtener_detector().calentar()
+
 # ------------------ BASE DE DATOS DE PATRULLAS ------------------ #
 
 def init_patrullas_db():
-    """Crea la base de datos de patrullas si no existe"""
-    conn = sqlite3.connect('alertas.db')
+    """Carga las patrullas de ejemplo si la tabla (migraciones.py) está vacía"""
+    conn = conectar('alertas.db')
     cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS patrullas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            numero_patrulla TEXT UNIQUE NOT NULL,
-            tipo TEXT NOT NULL,
-            zona TEXT NOT NULL,
-            municipio TEXT NOT NULL,
-            departamento TEXT NOT NULL,
-            estado TEXT NOT NULL DEFAULT 'disponible',
-            latitud REAL,
-            longitud REAL,
-            oficial_encargado TEXT,
-            telefono TEXT,
-            ultima_actualizacion TEXT,
-            observaciones TEXT
-        )
-    """)
-    conn.commit()
     
     # Insertar patrullas de ejemplo si no existen
     cur.execute("SELECT COUNT(*) FROM patrullas")
@@ -86,27 +90,9 @@ init_patrullas_db()
 
 def init_users_db():
     """Crea la base de datos de usuarios si no existe"""
-    conn = sqlite3.connect('usuarios.db')
+    aplicar_migraciones('usuarios.db', MIGRACIONES_USUARIOS)
+    conn = conectar('usuarios.db')
     cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            correo TEXT UNIQUE NOT NULL,
-            contraseña TEXT NOT NULL,
-            nombre TEXT NOT NULL,
-            fecha_registro TEXT NOT NULL,
-            rol TEXT DEFAULT 'usuario'
-        )
-    """)
-    conn.commit()
-    
-    # Migración: agregar columna 'rol' si no existe
-    try:
-        cur.execute("ALTER TABLE usuarios ADD COLUMN rol TEXT DEFAULT 'usuario'")
-        conn.commit()
-    except sqlite3.OperationalError:
-        # La columna ya existe, no hacer nada
-        pass
     
     # Crear usuario por defecto si no existe
     cur.execute("SELECT COUNT(*) FROM usuarios")
@@ -165,71 +151,11 @@ def admin_required(f):
 # Inicializar base de datos de usuarios
 init_users_db()
 
-# ------------------ REPORTES DE USUARIOS AUTORIZADOS ------------------ #
-
-def init_reportes_usuarios_db():
-    """Crea la tabla de reportes para usuarios autorizados"""
-    conn = sqlite3.connect('alertas.db')
-    cur = conn.cursor()
-    
-    # Tabla de reportes de usuarios autorizados
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS reportes_usuarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            usuario_id INTEGER NOT NULL,
-            imagen TEXT NOT NULL,
-            descripcion TEXT,
-            ubicacion TEXT,
-            tipo_reporte TEXT,
-            fecha_hora TEXT NOT NULL,
-            estado TEXT DEFAULT 'pendiente',
-            FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
-
-# Inicializar base de datos de reportes de usuarios
-init_reportes_usuarios_db()
-
 # ------------------ USUARIOS DE LA POBLACIÓN ------------------ #
 
 def init_poblacion_db():
     """Crea la base de datos de usuarios de la población y sus reportes"""
-    conn = sqlite3.connect('poblacion.db')
-    cur = conn.cursor()
-    
-    # Tabla de usuarios de la población
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS usuarios_poblacion (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            correo TEXT UNIQUE NOT NULL,
-            contraseña TEXT NOT NULL,
-            nombre TEXT NOT NULL,
-            telefono TEXT,
-            fecha_registro TEXT NOT NULL,
-            ultima_sesion TEXT
-        )
-    """)
-    
-    # Tabla de reportes de la población
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS reportes_poblacion (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            usuario_id INTEGER NOT NULL,
-            imagen TEXT NOT NULL,
-            descripcion TEXT,
-            ubicacion TEXT,
-            tipo_reporte TEXT,
-            fecha_hora TEXT NOT NULL,
-            estado TEXT DEFAULT 'pendiente',
-            FOREIGN KEY (usuario_id) REFERENCES usuarios_poblacion(id)
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
+    aplicar_migraciones('poblacion.db', MIGRACIONES_POBLACION)
 
 # Inicializar base de datos de población
 init_poblacion_db()
@@ -246,42 +172,6 @@ def poblacion_login_required(f):
 
 # ------------------ GESTIÓN DE DESTINATARIOS DE ALERTAS ------------------ #
 
-def init_destinatarios_db():
-    """Crea la base de datos de destinatarios de alertas si no existe"""
-    conn = sqlite3.connect('alertas.db')
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS destinatarios_alertas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ubicacion TEXT NOT NULL,
-            nombre TEXT NOT NULL,
-            email TEXT,
-            telefono TEXT,
-            activo INTEGER DEFAULT 1,
-            fecha_creacion TEXT NOT NULL
-        )
-    """)
-    
-    # Crear tabla de historial de envíos si no existe
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS historial_envios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            alerta_id INTEGER,
-            destinatario_id INTEGER,
-            ubicacion TEXT NOT NULL,
-            tipo_alerta TEXT NOT NULL,
-            fecha_envio TEXT NOT NULL,
-            estado TEXT DEFAULT 'enviado',
-            FOREIGN KEY (destinatario_id) REFERENCES destinatarios_alertas(id)
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
-
-# Inicializar base de datos de destinatarios
-init_destinatarios_db()
-
 def crear_servicio_emergencia(tipo_servicio, ubicacion):
     """
     Crea un destinatario automático de servicio de emergencia si no existe.
@@ -290,7 +180,7 @@ def crear_servicio_emergencia(tipo_servicio, ubicacion):
         tipo_servicio: 'bomberos' o 'policia'
         ubicacion: Ubicación donde se necesita el servicio
     """
-    conn = sqlite3.connect('alertas.db')
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     
     # Verificar si ya existe (buscar por ubicación y tipo de servicio)
@@ -300,7 +190,6 @@ def crear_servicio_emergencia(tipo_servicio, ubicacion):
     """, (ubicacion, f'%{tipo_servicio}%'))
     
     if cur.fetchone():
-        conn.close()
         print(f"[INFO] Servicio de {tipo_servicio} ya existe para {ubicacion}")
         return
     
@@ -319,10 +208,9 @@ def crear_servicio_emergencia(tipo_servicio, ubicacion):
     """, (ubicacion, nombre, email, telefono, datetime.now().isoformat()))
     
     conn.commit()
-    conn.close()
     print(f"[SERVICIO CREADO] {nombre} para {ubicacion}")
 
-def enviar_alerta_ubicacion(ubicacion, tipo_alerta, objeto, confianza, imagen_path):
+def enviar_alerta_ubicacion(ubicacion, tipo_alerta, objeto, confianza, imagen_path, alerta_id=None):
     """
     Envía alerta a todos los destinatarios configurados para una ubicación específica.
     Si la confianza es >= 80%, también envía a servicios de emergencia automáticamente.
@@ -333,12 +221,12 @@ def enviar_alerta_ubicacion(ubicacion, tipo_alerta, objeto, confianza, imagen_pa
         objeto: Objeto detectado
         confianza: Nivel de confianza
         imagen_path: Ruta de la imagen de la alerta
+        alerta_id: Id de la alerta ya guardada (si no se indica, se usa la última)
     """
     if not ubicacion:
         return
     
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     
     # Si confianza >= 80%, enviar a servicios de emergencia automáticamente
@@ -359,31 +247,25 @@ def enviar_alerta_ubicacion(ubicacion, tipo_alerta, objeto, confianza, imagen_pa
     """, (ubicacion,))
     
     destinatarios = cur.fetchall()
-    conn.close()
     
     if not destinatarios:
         print(f"[INFO] No hay destinatarios configurados para la ubicación: {ubicacion}")
         # Aunque no haya destinatarios, si se creó un servicio de emergencia, registrarlo en historial
         if confianza >= 0.80:
             # Buscar el servicio de emergencia recién creado
-            conn = sqlite3.connect('alertas.db')
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
             tipo_servicio = 'bomberos' if tipo_alerta == 'incendio' else 'policia'
             cur.execute("""
                 SELECT * FROM destinatarios_alertas 
                 WHERE ubicacion = ? AND nombre LIKE ? AND activo = 1
             """, (ubicacion, f'%{tipo_servicio}%'))
             servicio_emergencia = cur.fetchone()
-            conn.close()
             
             if servicio_emergencia:
                 # Registrar envío al servicio de emergencia
-                conn = sqlite3.connect('alertas.db')
-                cur = conn.cursor()
-                cur.execute("SELECT id FROM alertas ORDER BY id DESC LIMIT 1")
-                ultima_alerta = cur.fetchone()
-                alerta_id = ultima_alerta[0] if ultima_alerta else None
+                if alerta_id is None:
+                    cur.execute("SELECT id FROM alertas ORDER BY id DESC LIMIT 1")
+                    ultima_alerta = cur.fetchone()
+                    alerta_id = ultima_alerta[0] if ultima_alerta else None
                 
                 cur.execute("""
                     INSERT INTO historial_envios 
@@ -398,18 +280,15 @@ def enviar_alerta_ubicacion(ubicacion, tipo_alerta, objeto, confianza, imagen_pa
                     'enviado'
                 ))
                 conn.commit()
-                conn.close()
                 print(f"[ALERTA ENVIADA] 🚨 SERVICIO DE EMERGENCIA {servicio_emergencia['nombre']} - {tipo_alerta.upper()} - Ubicación: {ubicacion}")
         return
     
     # Registrar envío de alertas (tabla de historial)
-    conn = sqlite3.connect('alertas.db')
-    cur = conn.cursor()
-    
-    # Obtener el ID de la última alerta guardada
-    cur.execute("SELECT id FROM alertas ORDER BY id DESC LIMIT 1")
-    ultima_alerta = cur.fetchone()
-    alerta_id = ultima_alerta[0] if ultima_alerta else None
+    # Sin id explícito, usar el de la última alerta guardada
+    if alerta_id is None:
+        cur.execute("SELECT id FROM alertas ORDER BY id DESC LIMIT 1")
+        ultima_alerta = cur.fetchone()
+        alerta_id = ultima_alerta[0] if ultima_alerta else None
     
     # Registrar cada envío
     fecha_envio = datetime.now().isoformat()
@@ -429,10 +308,9 @@ def enviar_alerta_ubicacion(ubicacion, tipo_alerta, objeto, confianza, imagen_pa
         
         # Aquí se podría integrar envío por email/SMS
         servicio_emergencia = "🚨 SERVICIO DE EMERGENCIA" if "bomberos" in destinatario['nombre'].lower() or "policia" in destinatario['nombre'].lower() else ""
-        print(f"[ALERTA ENVIADA] {servicio_emergencia} {destinatario['nombre']} ({destinatario.get('email', 'N/A')}) - {tipo_alerta.upper()} - Ubicación: {ubicacion}")
+        print(f"[ALERTA ENVIADA] {servicio_emergencia} {destinatario['nombre']} ({destinatario['email'] or 'N/A'}) - {tipo_alerta.upper()} - Ubicación: {ubicacion}")
     
     conn.commit()
-    conn.close()
 
 # ------------------ RUTAS DE AUTENTICACIÓN ------------------ #
 
@@ -447,12 +325,10 @@ def login():
             flash('Por favor, completa todos los campos', 'danger')
             return render_template('login.html')
         
-        conn = sqlite3.connect('usuarios.db')
-        conn.row_factory = sqlite3.Row
+        conn = obtener_conexion('usuarios.db')
         cur = conn.cursor()
         cur.execute("SELECT * FROM usuarios WHERE correo = ?", (correo,))
         usuario = cur.fetchone()
-        conn.close()
         
         if usuario and check_password_hash(usuario['contraseña'], contraseña):
             session['user_id'] = usuario['id']
@@ -498,12 +374,10 @@ def registro():
             return render_template('registro.html')
         
         # Verificar si el correo ya existe
-        conn = sqlite3.connect('usuarios.db')
-        conn.row_factory = sqlite3.Row
+        conn = obtener_conexion('usuarios.db')
         cur = conn.cursor()
         cur.execute("SELECT id FROM usuarios WHERE correo = ?", (correo,))
         if cur.fetchone():
-            conn.close()
             flash('Este correo ya está registrado', 'danger')
             return render_template('registro.html')
         
@@ -514,7 +388,6 @@ def registro():
             VALUES (?, ?, ?, ?, ?)
         """, (correo, password_hash, nombre, datetime.now().isoformat(), rol))
         conn.commit()
-        conn.close()
         
         flash('¡Registro exitoso! Por favor, inicia sesión', 'success')
         return redirect(url_for('login'))
@@ -527,8 +400,7 @@ def registro():
 @admin_required
 def gestionar_usuarios():
     """Página para que los admins gestionen usuarios"""
-    conn = sqlite3.connect('usuarios.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('usuarios.db')
     cur = conn.cursor()
     
     if request.method == 'POST':
@@ -579,8 +451,6 @@ def gestionar_usuarios():
     cur.execute("SELECT * FROM usuarios ORDER BY fecha_registro DESC")
     usuarios = [dict(row) for row in cur.fetchall()]
     
-    conn.close()
-    
     return render_template('gestionar_usuarios.html', usuarios=usuarios)
 
 @app.route('/logout')
@@ -594,8 +464,7 @@ def logout():
 @login_required
 def perfil():
     """Perfil del usuario autorizado"""
-    conn = sqlite3.connect('usuarios.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('usuarios.db')
     cur = conn.cursor()
     
     # Obtener información del usuario
@@ -603,27 +472,12 @@ def perfil():
     usuario = dict(cur.fetchone())
     
     # Estadísticas del usuario (alertas procesadas, etc.)
-    conn_alertas = sqlite3.connect('alertas.db')
-    conn_alertas.row_factory = sqlite3.Row
+    conn_alertas = obtener_conexion('alertas.db')
     cur_alertas = conn_alertas.cursor()
     
-    # Total de alertas en el sistema
-    cur_alertas.execute("SELECT COUNT(*) as total FROM alertas")
-    total_alertas_sistema = cur_alertas.fetchone()['total']
-    
-    # Alertas de las últimas 24 horas
+    # Total de alertas, últimas 24 horas y críticas de las últimas 24 horas, en una consulta
     hace_24h = (datetime.now() - timedelta(hours=24)).isoformat()
-    cur_alertas.execute("SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?", (hace_24h,))
-    alertas_24h = cur_alertas.fetchone()['total']
-    
-    # Alertas críticas
-    cur_alertas.execute("""
-        SELECT COUNT(*) as total 
-        FROM alertas 
-        WHERE fecha_hora >= ? 
-        AND (confianza >= 0.50 OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion')))
-    """, (hace_24h,))
-    alertas_criticas_24h = cur_alertas.fetchone()['total']
+    resumen = resumen_alertas(conn_alertas, hace_24h, por_tipo=False)
     
     # Reportes del usuario
     cur_alertas.execute("""
@@ -634,17 +488,13 @@ def perfil():
     """, (session['user_id'],))
     reportes = [dict(row) for row in cur_alertas.fetchall()]
     
-    cur_alertas.execute("SELECT COUNT(*) as total FROM reportes_usuarios WHERE usuario_id = ?", (session['user_id'],))
-    total_reportes = cur_alertas.fetchone()['total']
-    
-    conn_alertas.close()
-    conn.close()
+    total_reportes = resumen_reportes_usuarios(conn_alertas, session['user_id'])['total_reportes']
     
     return render_template('perfil.html',
                          usuario=usuario,
-                         total_alertas_sistema=total_alertas_sistema,
-                         alertas_24h=alertas_24h,
-                         alertas_criticas_24h=alertas_criticas_24h,
+                         total_alertas_sistema=resumen['total_alertas'],
+                         alertas_24h=resumen['alertas_24h'],
+                         alertas_criticas_24h=resumen['alertas_criticas_24h'],
                          reportes=reportes,
                          total_reportes=total_reportes)
 
@@ -669,14 +519,12 @@ def cambiar_contraseña():
         return redirect(url_for('perfil'))
     
     # Verificar contraseña actual
-    conn = sqlite3.connect('usuarios.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('usuarios.db')
     cur = conn.cursor()
     cur.execute("SELECT contraseña FROM usuarios WHERE id = ?", (session['user_id'],))
     usuario = cur.fetchone()
     
     if not usuario or not check_password_hash(usuario['contraseña'], contraseña_actual):
-        conn.close()
         flash('La contraseña actual es incorrecta', 'danger')
         return redirect(url_for('perfil'))
     
@@ -685,7 +533,6 @@ def cambiar_contraseña():
     cur.execute("UPDATE usuarios SET contraseña = ? WHERE id = ?", 
                 (nueva_contraseña_hash, session['user_id']))
     conn.commit()
-    conn.close()
     
     flash('Contraseña actualizada exitosamente', 'success')
     return redirect(url_for('perfil'))
@@ -712,11 +559,24 @@ def usuario_alertas():
     if session.get('user_rol') == 'admin':
         return redirect(url_for('dashboard'))
     
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
+    alertas_lista, total_criticas = cache_consultas.obtener('alertas_graves', alertas_graves_24h)
+    
+    return render_template('usuario_alertas.html', 
+                         alertas=alertas_lista, 
+                         total_criticas=total_criticas)
+
+def alertas_graves_24h():
+    """
+    Alertas MUY GRAVES (confianza >= 80%) de las últimas 24 horas con ubicación.
+    
+    Las comparten /usuario/alertas y /usuario/mapa a través de cache_consultas.
+    
+    Returns:
+        (las 50 más recientes como diccionarios, total de alertas graves)
+    """
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     
-    # Solo alertas MUY GRAVES (confianza >= 80%) de las últimas 24 horas con ubicación
     hace_24h = (datetime.now() - timedelta(hours=24)).isoformat()
     
     cur.execute("""
@@ -729,7 +589,7 @@ def usuario_alertas():
         )
         AND ubicacion IS NOT NULL
         AND ubicacion != ''
-        ORDER BY id DESC 
+        ORDER BY fecha_hora DESC 
         LIMIT 50
     """, (hace_24h,))
     
@@ -749,11 +609,7 @@ def usuario_alertas():
     """, (hace_24h,))
     total_criticas = cur.fetchone()['total']
     
-    conn.close()
-    
-    return render_template('usuario_alertas.html', 
-                         alertas=alertas_lista, 
-                         total_criticas=total_criticas)
+    return alertas_lista, total_criticas
 
 @app.route('/usuario/mapa')
 @login_required
@@ -763,32 +619,10 @@ def usuario_mapa():
     if session.get('user_rol') == 'admin':
         return redirect(url_for('mapa_vigilancia'))
     
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    
-    # Solo alertas graves con ubicación y coordenadas (si las hay)
-    hace_24h = (datetime.now() - timedelta(hours=24)).isoformat()
-    
-    cur.execute("""
-        SELECT tipo, ubicacion, fecha_hora
-        FROM alertas 
-        WHERE fecha_hora >= ?
-        AND (
-            confianza >= 0.80
-            OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion'))
-        )
-        AND ubicacion IS NOT NULL
-        AND ubicacion != ''
-        ORDER BY id DESC 
-        LIMIT 30
-    """, (hace_24h,))
-    
-    alertas_graves = [dict(row) for row in cur.fetchall()]
-    
-    conn.close()
+    # Solo alertas graves con ubicación: las 30 más recientes del mismo resultado que /usuario/alertas
+    alertas_lista, _ = cache_consultas.obtener('alertas_graves', alertas_graves_24h)
     
-    return render_template('usuario_mapa.html', alertas=alertas_graves)
+    return render_template('usuario_mapa.html', alertas=alertas_lista[:30])
 
 @app.route('/dashboard')
 @login_required
@@ -797,69 +631,17 @@ def dashboard():
     # Solo admins pueden acceder al dashboard completo
     if session.get('user_rol') != 'admin':
         return redirect(url_for('usuario_alertas'))
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    
-    # Estadísticas generales
-    cur.execute("SELECT COUNT(*) as total FROM alertas")
-    total_alertas = cur.fetchone()['total']
-    
-    cur.execute("SELECT COUNT(*) as total FROM alertas WHERE tipo = 'arma'")
-    total_armas = cur.fetchone()['total']
     
-    cur.execute("SELECT COUNT(*) as total FROM alertas WHERE tipo = 'incendio'")
-    total_incendios = cur.fetchone()['total']
-    
-    cur.execute("SELECT COUNT(*) as total FROM alertas WHERE tipo = 'agresion'")
-    total_agresiones = cur.fetchone()['total']
-    
-    cur.execute("SELECT COUNT(*) as total FROM alertas WHERE tipo = 'vehiculo'")
-    total_vehiculos = cur.fetchone()['total']
+    return render_template('dashboard.html', **cache_consultas.obtener('dashboard', datos_dashboard))
+
+def datos_dashboard():
+    """Estadísticas, alertas recientes y alertas por día del dashboard (en caché con cache_consultas)."""
+    conn = obtener_conexion('alertas.db')
+    cur = conn.cursor()
     
-    # Alertas de las últimas 24 horas clasificadas por nivel de confianza
+    # Estadísticas generales y de las últimas 24 horas por nivel de confianza, en una consulta
     hace_24h = (datetime.now() - timedelta(hours=24)).isoformat()
-    
-    # Total de alertas en las últimas 24 horas
-    cur.execute("""
-        SELECT COUNT(*) as total 
-        FROM alertas 
-        WHERE fecha_hora >= ?
-    """, (hace_24h,))
-    alertas_24h = cur.fetchone()['total']
-    
-    # Alertas CRÍTICAS (confianza >= 50% o tipo crítico con confianza NULL) de las últimas 24 horas
-    cur.execute("""
-        SELECT COUNT(*) as total
-        FROM alertas
-        WHERE fecha_hora >= ?
-        AND (
-            confianza >= 0.50
-            OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion'))
-        )
-    """, (hace_24h,))
-    alertas_criticas_24h = cur.fetchone()['total']
-    
-    # Alertas INTERMEDIAS (confianza >= 20% y < 50%) de las últimas 24 horas
-    cur.execute("""
-        SELECT COUNT(*) as total 
-        FROM alertas 
-        WHERE fecha_hora >= ? 
-        AND confianza IS NOT NULL 
-        AND confianza >= 0.20 
-        AND confianza < 0.50
-    """, (hace_24h,))
-    alertas_intermedias_24h = cur.fetchone()['total']
-    
-    # Alertas BAJAS (confianza < 20%) de las últimas 24 horas
-    cur.execute("""
-        SELECT COUNT(*) as total 
-        FROM alertas 
-        WHERE fecha_hora >= ? 
-        AND confianza IS NOT NULL 
-        AND confianza < 0.20
-    """, (hace_24h,))
-    alertas_bajas_24h = cur.fetchone()['total']
+    resumen = resumen_alertas(conn, hace_24h)
     
     # Alertas recientes (últimas 10)
     cur.execute("""
@@ -877,34 +659,49 @@ def dashboard():
         alertas_recientes.append(alerta_dict)
     
     # Gráfico de alertas por día (últimos 7 días)
-    cur.execute("""
-        SELECT DATE(fecha_hora) as fecha, COUNT(*) as cantidad
-        FROM alertas
-        WHERE fecha_hora >= datetime('now', '-7 days')
-        GROUP BY DATE(fecha_hora)
-        ORDER BY fecha
-    """)
-    alertas_por_dia = [dict(row) for row in cur.fetchall()]
+    por_dia = alertas_por_dia(conn, 7)
     
-    conn.close()
+    return dict(resumen,
+                alertas_recientes=alertas_recientes,
+                alertas_por_dia=por_dia)
+
+def ejecutar_analisis(filepath, filename, ubicacion):
+    """
+    Analiza una imagen subida y devuelve las alertas generadas.
+    Se ejecuta en los workers de la cola de análisis, fuera de los hilos web.
+    """
+    metricas = {}
+    detectar_amenazas(filepath, generar_imagen_anotada=True, ubicacion=ubicacion, metricas=metricas)
     
-    return render_template('dashboard.html',
-                         total_alertas=total_alertas,
-                         total_armas=total_armas,
-                         total_incendios=total_incendios,
-                         total_agresiones=total_agresiones,
-                         total_vehiculos=total_vehiculos,
-                         alertas_24h=alertas_24h,
-                         alertas_criticas_24h=alertas_criticas_24h,
-                         alertas_intermedias_24h=alertas_intermedias_24h,
-                         alertas_bajas_24h=alertas_bajas_24h,
-                         alertas_recientes=alertas_recientes,
-                         alertas_por_dia=alertas_por_dia)
+    # Obtener las alertas generadas para esta imagen
+    conn = obtener_conexion('alertas.db')
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT * FROM alertas 
+        WHERE imagen LIKE ? 
+        ORDER BY id DESC 
+        LIMIT 5
+    """, (f'%{filename}%',))
+    alertas = [dict(a) for a in cur.fetchall()]
+    
+    resultado = {
+        'alertas': alertas,
+        'imagen': filename,
+        'total': len(alertas),
+        'cache': metricas.get('cache', False),
+        'metricas': metricas
+    }
+    if not alertas:
+        resultado['mensaje'] = 'Imagen analizada: No se detectaron amenazas'
+    return resultado
+
+# Cola de análisis en segundo plano (ANALISIS_WORKERS / ANALISIS_COLA_MAX)
+cola_analisis = ColaAnalisis(ejecutar_analisis)
 
 @app.route('/analizar', methods=['GET', 'POST'])
 @admin_required
 def analizar():
-    """Página para subir y analizar imágenes"""
+    """Página para subir imágenes y encolar su análisis"""
     if request.method == 'POST':
         if 'imagen' not in request.files:
             return jsonify({'error': 'No se proporcionó ninguna imagen'}), 400
@@ -923,50 +720,54 @@ def analizar():
             # Obtener ubicación del formulario
             ubicacion = request.form.get('ubicacion', 'Ubicación no especificada').strip()
             
-            # Analizar imagen
+            # Encolar el análisis y responder de inmediato
             try:
-                detectar_amenazas(filepath, generar_imagen_anotada=True, ubicacion=ubicacion)
-                
-                # Obtener las alertas generadas para esta imagen
-                conn = sqlite3.connect('alertas.db')
-                conn.row_factory = sqlite3.Row
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT * FROM alertas 
-                    WHERE imagen LIKE ? 
-                    ORDER BY id DESC 
-                    LIMIT 5
-                """, (f'%{filename}%',))
-                alertas = cur.fetchall()
-                conn.close()
-                
-                if alertas:
-                    # Retornar todas las alertas encontradas
-                    return jsonify({
-                        'success': True,
-                        'alertas': [dict(a) for a in alertas],
-                        'imagen': filename,
-                        'total': len(alertas)
-                    })
-                else:
-                    return jsonify({
-                        'success': True,
-                        'mensaje': 'Imagen analizada: No se detectaron amenazas',
-                        'imagen': filename,
-                        'alertas': []
-                    })
-            except Exception as e:
-                import traceback
-                return jsonify({'error': f'Error al analizar imagen: {str(e)}', 'traceback': traceback.format_exc()}), 500
+                job_id = cola_analisis.encolar(filepath=filepath, filename=filename, ubicacion=ubicacion)
+            except ColaLlena as e:
+                return jsonify({'error': f'{e}. Intenta de nuevo en unos segundos.'}), 503
+            
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'estado': EN_COLA,
+                'imagen': filename,
+                'url_estado': url_for('api_analisis_estado', job_id=job_id)
+            }), 202
     
     return render_template('analizar.html')
 
+@app.route('/api/analisis/metricas')
+@admin_required
+def api_analisis_metricas():
+    """API con la profundidad de la cola de análisis y la utilización de los workers"""
+    return jsonify(cola_analisis.metricas())
+
+@app.route('/api/analisis/<job_id>')
+@admin_required
+def api_analisis_estado(job_id):
+    """API para consultar el estado de un trabajo de análisis"""
+    trabajo = cola_analisis.estado(job_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo de análisis no encontrado'}), 404
+    
+    respuesta = {
+        'success': trabajo['estado'] != FALLIDO,
+        'job_id': job_id,
+        'estado': trabajo['estado'],
+        'segundos_en_cola': trabajo['segundos_en_cola'],
+        'segundos_ejecucion': trabajo['segundos_ejecucion']
+    }
+    if trabajo['estado'] == COMPLETADO:
+        respuesta.update(trabajo['resultado'])
+    elif trabajo['estado'] == FALLIDO:
+        respuesta['error'] = f"Error al analizar imagen: {trabajo['error']}"
+    return jsonify(respuesta)
+
 @app.route('/alertas')
 @admin_required
 def alertas():
     """Página con lista completa de alertas"""
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     
     # Filtros
@@ -1010,15 +811,12 @@ def alertas():
                     alerta_dict[coord] = None
         alertas_lista.append(alerta_dict)
     
-    conn.close()
-    
     return render_template('alertas.html', alertas=alertas_lista, tipo_filtro=tipo_filtro)
 
 @app.route('/alertas-publicas')
 def alertas_publicas():
     """Página pública para que la población vea alertas sin login - Solo alertas muy graves"""
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     
     # Solo mostrar alertas MUY GRAVES (confianza >= 80%) de las últimas 24 horas
@@ -1034,7 +832,7 @@ def alertas_publicas():
         )
         AND ubicacion IS NOT NULL
         AND ubicacion != ''
-        ORDER BY id DESC 
+        ORDER BY fecha_hora DESC 
         LIMIT 30
     """, (hace_24h,))
     
@@ -1064,8 +862,6 @@ def alertas_publicas():
     """, (hace_24h,))
     total_criticas = cur.fetchone()['total']
     
-    conn.close()
-    
     return render_template('alertas_publicas.html', 
                          alertas=alertas_lista, 
                          total_criticas=total_criticas)
@@ -1073,8 +869,7 @@ def alertas_publicas():
 @app.route('/api/alertas')
 def api_alertas():
     """API para obtener alertas en formato JSON"""
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     
     limit = request.args.get('limit', 50, type=int)
@@ -1099,40 +894,63 @@ def api_alertas():
         if alerta_dict.get('confianza') is None:
             alerta_dict['confianza'] = 0.0
         alertas.append(alerta_dict)
-    conn.close()
     
     return jsonify(alertas)
 
 @app.route('/api/estadisticas')
 def api_estadisticas():
     """API para obtener estadísticas"""
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    
-    # Total por tipo
-    cur.execute("""
-        SELECT tipo, COUNT(*) as cantidad 
-        FROM alertas 
-        GROUP BY tipo
-    """)
-    por_tipo = {row['tipo']: row['cantidad'] for row in cur.fetchall()}
-    
-    # Alertas últimas 24 horas
+    return jsonify(cache_consultas.obtener('api_estadisticas', datos_api_estadisticas))
+
+def datos_api_estadisticas():
+    """Total por tipo y alertas de las últimas 24 horas, de las tablas de resumen (en caché)."""
+    conn = obtener_conexion('alertas.db')
     hace_24h = (datetime.now() - timedelta(hours=24)).isoformat()
-    cur.execute("""
-        SELECT COUNT(*) as total 
-        FROM alertas 
-        WHERE fecha_hora >= ?
-    """, (hace_24h,))
-    ultimas_24h = cur.fetchone()['total']
     
-    conn.close()
-    
-    return jsonify({
-        'por_tipo': por_tipo,
-        'ultimas_24h': ultimas_24h
-    })
+    return {
+        'por_tipo': alertas_por_tipo(conn),
+        'ultimas_24h': resumen_alertas(conn, hace_24h, por_tipo=False)['alertas_24h']
+    }
+
+@app.route('/api/vision/llamadas')
+@admin_required
+def api_vision_llamadas():
+    """API con el conteo de llamadas a Google Vision por imagen analizada"""
+    return jsonify(estadisticas_llamadas_vision())
+
+@app.route('/api/cache/analisis')
+@admin_required
+def api_cache_analisis():
+    """API con los aciertos y fallos de la caché de análisis de imágenes"""
+    return jsonify(cache_analisis.estadisticas())
+
+@app.route('/api/cache/consultas')
+@admin_required
+def api_cache_consultas():
+    """API con los aciertos, cálculos compartidos e invalidaciones de la caché de páginas"""
+    return jsonify(cache_consultas.estadisticas())
+
+@app.route('/api/normalizacion')
+@admin_required
+def api_normalizacion():
+    """API con los bytes antes/después y la latencia añadida por la normalización de imágenes"""
+    return jsonify(normalizacion.estadisticas())
+
+@app.route('/api/overlays')
+@admin_required
+def api_overlays():
+    """API con el tiempo de dibujo de las imágenes anotadas y el uso de la caché de etiquetas"""
+    return jsonify(overlays.estadisticas())
+
+@app.route('/api/camaras')
+@admin_required
+def api_camaras():
+    """API con FPS, retraso, errores y reinicios de cada cámara del supervisor (supervisor_camaras.py)"""
+    ruta = os.environ.get('ESTADO_CAMARAS_PATH', 'estado_camaras.json')
+    if not os.path.exists(ruta):
+        return jsonify({'error': 'El supervisor de cámaras no está en ejecución'}), 404
+    with open(ruta, encoding='utf-8') as f:
+        return jsonify(json.load(f))
 
 @app.route('/configurar_alertas', methods=['GET', 'POST'])
 @admin_required
@@ -1151,31 +969,29 @@ def configurar_alertas():
                 flash('Ubicación y nombre son obligatorios', 'danger')
                 return redirect(url_for('configurar_alertas'))
             
-            conn = sqlite3.connect('alertas.db')
+            conn = obtener_conexion('alertas.db')
             cur = conn.cursor()
             cur.execute("""
                 INSERT INTO destinatarios_alertas (ubicacion, nombre, email, telefono, fecha_creacion)
                 VALUES (?, ?, ?, ?, ?)
             """, (ubicacion, nombre, email or None, telefono or None, datetime.now().isoformat()))
             conn.commit()
-            conn.close()
             
             flash(f'Destinatario {nombre} agregado para {ubicacion}', 'success')
             
         elif accion == 'eliminar':
             destinatario_id = request.form.get('id')
             if destinatario_id:
-                conn = sqlite3.connect('alertas.db')
+                conn = obtener_conexion('alertas.db')
                 cur = conn.cursor()
                 cur.execute("DELETE FROM destinatarios_alertas WHERE id = ?", (destinatario_id,))
                 conn.commit()
-                conn.close()
                 flash('Destinatario eliminado', 'success')
         
         elif accion == 'toggle':
             destinatario_id = request.form.get('id')
             if destinatario_id:
-                conn = sqlite3.connect('alertas.db')
+                conn = obtener_conexion('alertas.db')
                 cur = conn.cursor()
                 cur.execute("SELECT activo FROM destinatarios_alertas WHERE id = ?", (destinatario_id,))
                 resultado = cur.fetchone()
@@ -1184,14 +1000,12 @@ def configurar_alertas():
                     cur.execute("UPDATE destinatarios_alertas SET activo = ? WHERE id = ?", 
                               (nuevo_estado, destinatario_id))
                     conn.commit()
-                conn.close()
                 flash('Estado actualizado', 'success')
         
         return redirect(url_for('configurar_alertas'))
     
     # Obtener todos los destinatarios
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     cur.execute("SELECT * FROM destinatarios_alertas ORDER BY ubicacion, nombre")
     destinatarios = cur.fetchall()
@@ -1205,8 +1019,7 @@ def configurar_alertas():
     servicios_emergencia = cur.fetchall()
     
     # Obtener ubicaciones únicas
-    cur.execute("SELECT DISTINCT ubicacion FROM alertas WHERE ubicacion IS NOT NULL ORDER BY ubicacion")
-    ubicaciones_existentes = [row[0] for row in cur.fetchall()]
+    ubicaciones_existentes = ubicaciones_con_alertas(conn)
     
     # Obtener historial de envíos recientes (si la tabla existe)
     try:
@@ -1222,8 +1035,6 @@ def configurar_alertas():
         # Si la tabla no existe aún, retornar lista vacía
         historial = []
     
-    conn.close()
-    
     return render_template('configurar_alertas.html',
                          destinatarios=destinatarios,
                          ubicaciones_existentes=ubicaciones_existentes,
@@ -1251,12 +1062,20 @@ def imagen_anotada(filename):
     
     return "Imagen no encontrada", 404
 
+@app.route('/clip/<path:filename>')
+def clip(filename):
+    """Servir clips de video de alertas de cámara"""
+    ruta = os.path.join(CLIPS_DIR, secure_filename(os.path.basename(filename)))
+    if not os.path.exists(ruta):
+        # El clip se escribe cuando pasan los segundos posteriores a la alerta
+        return "Clip no disponible todavía", 404
+    return send_file(ruta, mimetype='video/mp4')
+
 @app.route('/patrullas')
 @admin_required
 def patrullas():
     """Panel de patrullas en El Salvador"""
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     
     # Obtener todas las patrullas
@@ -1266,18 +1085,8 @@ def patrullas():
     """)
     patrullas_lista = [dict(row) for row in cur.fetchall()]
     
-    # Estadísticas
-    cur.execute("SELECT COUNT(*) as total FROM patrullas")
-    total_patrullas = cur.fetchone()['total']
-    
-    cur.execute("SELECT COUNT(*) as total FROM patrullas WHERE estado = 'activa'")
-    patrullas_activas = cur.fetchone()['total']
-    
-    cur.execute("SELECT COUNT(*) as total FROM patrullas WHERE estado = 'disponible'")
-    patrullas_disponibles = cur.fetchone()['total']
-    
-    cur.execute("SELECT COUNT(*) as total FROM patrullas WHERE estado = 'en_ruta'")
-    patrullas_en_ruta = cur.fetchone()['total']
+    # Estadísticas por estado, en una consulta
+    resumen = resumen_patrullas(conn)
     
     # Patrullas por departamento
     cur.execute("""
@@ -1288,22 +1097,16 @@ def patrullas():
     """)
     patrullas_por_departamento = [dict(row) for row in cur.fetchall()]
     
-    conn.close()
-    
     return render_template('patrullas.html',
                          patrullas=patrullas_lista,
-                         total_patrullas=total_patrullas,
-                         patrullas_activas=patrullas_activas,
-                         patrullas_disponibles=patrullas_disponibles,
-                         patrullas_en_ruta=patrullas_en_ruta,
+                         **resumen,
                          patrullas_por_departamento=patrullas_por_departamento)
 
 @app.route('/mapa-vigilancia')
 @admin_required
 def mapa_vigilancia():
     """Mapa de zonas con menos patrullas o vigilancia"""
-    conn = sqlite3.connect('alertas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('alertas.db')
     cur = conn.cursor()
     
     # Obtener todas las patrullas con coordenadas
@@ -1369,8 +1172,6 @@ def mapa_vigilancia():
     cur.execute("SELECT COUNT(DISTINCT zona || municipio || departamento) as total_zonas FROM patrullas")
     total_zonas = cur.fetchone()['total_zonas']
     
-    conn.close()
-    
     return render_template('mapa_vigilancia.html',
                          zonas_baja_vigilancia=zonas_baja_vigilancia,
                          todas_patrullas=todas_patrullas,
@@ -1402,12 +1203,10 @@ def poblacion_registro():
             return render_template('poblacion_registro.html')
         
         # Verificar si el correo ya existe
-        conn = sqlite3.connect('poblacion.db')
-        conn.row_factory = sqlite3.Row
+        conn = obtener_conexion('poblacion.db')
         cur = conn.cursor()
         cur.execute("SELECT id FROM usuarios_poblacion WHERE correo = ?", (correo,))
         if cur.fetchone():
-            conn.close()
             flash('Este correo ya está registrado', 'danger')
             return render_template('poblacion_registro.html')
         
@@ -1418,7 +1217,6 @@ def poblacion_registro():
             VALUES (?, ?, ?, ?, ?)
         """, (correo, password_hash, nombre, telefono or None, datetime.now().isoformat()))
         conn.commit()
-        conn.close()
         
         flash('¡Registro exitoso! Por favor, inicia sesión', 'success')
         return redirect(url_for('poblacion_login'))
@@ -1436,8 +1234,7 @@ def poblacion_login():
             flash('Por favor, completa todos los campos', 'danger')
             return render_template('poblacion_login.html')
         
-        conn = sqlite3.connect('poblacion.db')
-        conn.row_factory = sqlite3.Row
+        conn = obtener_conexion('poblacion.db')
         cur = conn.cursor()
         cur.execute("SELECT * FROM usuarios_poblacion WHERE correo = ?", (correo,))
         usuario = cur.fetchone()
@@ -1450,7 +1247,6 @@ def poblacion_login():
                 WHERE id = ?
             """, (datetime.now().isoformat(), usuario['id']))
             conn.commit()
-            conn.close()
             
             # Guardar en sesión
             session['poblacion_user_id'] = usuario['id']
@@ -1460,7 +1256,6 @@ def poblacion_login():
             flash(f'¡Bienvenido, {usuario["nombre"]}!', 'success')
             return redirect(url_for('poblacion_perfil'))
         else:
-            conn.close()
             flash('Correo o contraseña incorrectos', 'danger')
     
     return render_template('poblacion_login.html')
@@ -1478,8 +1273,7 @@ def poblacion_logout():
 @poblacion_login_required
 def poblacion_perfil():
     """Perfil del usuario de la población"""
-    conn = sqlite3.connect('poblacion.db')
-    conn.row_factory = sqlite3.Row
+    conn = obtener_conexion('poblacion.db')
     cur = conn.cursor()
     
     # Obtener información del usuario
@@ -1506,8 +1300,6 @@ def poblacion_perfil():
     """, (session['poblacion_user_id'],))
     reportes_pendientes = cur.fetchone()['total']
     
-    conn.close()
-    
     return render_template('poblacion_perfil.html',
                          usuario=usuario,
                          reportes=reportes,
@@ -1547,7 +1339,7 @@ def poblacion_reportar():
                 f.write(imagen_data)
             
             # Guardar reporte en BD
-            conn = sqlite3.connect('poblacion.db')
+            conn = obtener_conexion('poblacion.db')
             cur = conn.cursor()
             cur.execute("""
                 INSERT INTO reportes_poblacion 
@@ -1556,7 +1348,6 @@ def poblacion_reportar():
             """, (session['poblacion_user_id'], filename, descripcion or None, 
                   ubicacion or None, tipo_reporte, datetime.now().isoformat(), 'pendiente'))
             conn.commit()
-            conn.close()
             
             flash('¡Reporte enviado exitosamente!', 'success')
             return redirect(url_for('poblacion_perfil'))
@@ -1609,7 +1400,7 @@ def usuario_reportar():
                 f.write(imagen_data)
             
             # Guardar reporte en BD
-            conn = sqlite3.connect('alertas.db')
+            conn = obtener_conexion('alertas.db')
             cur = conn.cursor()
             cur.execute("""
                 INSERT INTO reportes_usuarios 
@@ -1618,7 +1409,6 @@ def usuario_reportar():
             """, (session['user_id'], filename, descripcion or None, 
                   ubicacion or None, tipo_reporte, datetime.now().isoformat(), 'pendiente'))
             conn.commit()
-            conn.close()
             
             # Analizar automáticamente con IA
             try:
@@ -1629,11 +1419,10 @@ def usuario_reportar():
                 if detecciones:
                     print(f"[ANÁLISIS AUTOMÁTICO] ⚠️ Se detectaron {len(detecciones)} amenaza(s) en el reporte")
                     # Actualizar estado del reporte a "en_revision" si hay amenazas
-                    conn = sqlite3.connect('alertas.db')
+                    conn = obtener_conexion('alertas.db')
                     cur = conn.cursor()
                     cur.execute("UPDATE reportes_usuarios SET estado = 'en_revision' WHERE imagen = ?", (filename,))
                     conn.commit()
-                    conn.close()
                 else:
                     print(f"[ANÁLISIS AUTOMÁTICO] ✅ No se detectaron amenazas en el reporte")
             except Exception as e:
@@ -1663,36 +1452,21 @@ def usuario_imagen(filename):
 def admin_reportes():
     """Página para que administradores vean todos los reportes de usuarios"""
     # Obtener reportes de alertas.db
-    conn_alertas = sqlite3.connect('alertas.db')
-    conn_alertas.row_factory = sqlite3.Row
+    conn_alertas = obtener_conexion('alertas.db')
     cur_alertas = conn_alertas.cursor()
     
     # Obtener todos los reportes
     cur_alertas.execute("SELECT * FROM reportes_usuarios ORDER BY fecha_hora DESC")
     reportes_raw = [dict(row) for row in cur_alertas.fetchall()]
     
-    # Estadísticas
-    cur_alertas.execute("SELECT COUNT(*) as total FROM reportes_usuarios")
-    total_reportes = cur_alertas.fetchone()['total']
-    
-    cur_alertas.execute("SELECT COUNT(*) as total FROM reportes_usuarios WHERE estado = 'pendiente'")
-    reportes_pendientes = cur_alertas.fetchone()['total']
-    
-    cur_alertas.execute("SELECT COUNT(*) as total FROM reportes_usuarios WHERE estado = 'en_revision'")
-    reportes_en_revision = cur_alertas.fetchone()['total']
-    
-    cur_alertas.execute("SELECT COUNT(*) as total FROM reportes_usuarios WHERE estado = 'resuelto'")
-    reportes_resueltos = cur_alertas.fetchone()['total']
-    
-    conn_alertas.close()
+    # Estadísticas por estado, en una consulta
+    resumen = resumen_reportes_usuarios(conn_alertas)
     
     # Obtener información de usuarios de usuarios.db
-    conn_usuarios = sqlite3.connect('usuarios.db')
-    conn_usuarios.row_factory = sqlite3.Row
+    conn_usuarios = obtener_conexion('usuarios.db')
     cur_usuarios = conn_usuarios.cursor()
     cur_usuarios.execute("SELECT id, nombre, correo FROM usuarios")
     usuarios_dict = {row['id']: dict(row) for row in cur_usuarios.fetchall()}
-    conn_usuarios.close()
     
     # Combinar datos: agregar información de usuario a cada reporte
     reportes = []
@@ -1711,10 +1485,7 @@ def admin_reportes():
     
     return render_template('admin_reportes.html',
                          reportes=reportes,
-                         total_reportes=total_reportes,
-                         reportes_pendientes=reportes_pendientes,
-                         reportes_en_revision=reportes_en_revision,
-                         reportes_resueltos=reportes_resueltos,
+                         **resumen,
                          usuarios=usuarios)
 
 @app.route('/admin/reportes/cambiar-estado', methods=['POST'])
@@ -1725,11 +1496,10 @@ def cambiar_estado_reporte():
     nuevo_estado = request.form.get('nuevo_estado')
     
     if reporte_id and nuevo_estado:
-        conn = sqlite3.connect('alertas.db')
+        conn = obtener_conexion('alertas.db')
         cur = conn.cursor()
         cur.execute("UPDATE reportes_usuarios SET estado = ? WHERE id = ?", (nuevo_estado, reporte_id))
         conn.commit()
-        conn.close()
         flash('Estado del reporte actualizado exitosamente', 'success')
     else:
         flash('Datos inválidos', 'danger')
@@ -0,0 +1,125 @@
+"""
+Conexiones SQLite compartidas con WAL y pragmas ajustados.
+
+Cada solicitud web usa una sola conexión por base de datos (alertas.db,
+usuarios.db, poblacion.db), guardada en el contexto de la aplicación de
+Flask (flask.g) y cerrada en el teardown. Fuera de una solicitud (workers de
+la cola de análisis, notificaciones del escritor de alertas) la conexión se
+reutiliza por hilo.
+
+Todas las conexiones activan WAL (las lecturas del dashboard no bloquean las
+escrituras de las cámaras ni al revés), un busy timeout para esperar el
+bloqueo en lugar de fallar con "database is locked", synchronous=NORMAL
+(seguro con WAL) y una caché de páginas más grande.
+"""
+
+import os
+import sqlite3
+import threading
+
+# ------------------ CONFIGURACIÓN ------------------ #
+DB_WAL = os.environ.get('DB_WAL', '1') == '1'
+DB_TIMEOUT = float(os.environ.get('DB_TIMEOUT', 10))  # Segundos esperando un bloqueo antes de fallar
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL').upper()  # OFF, NORMAL o FULL
+DB_CACHE_KB = int(os.environ.get('DB_CACHE_KB', 16384))  # Caché de páginas por conexión (KiB)
+
+_locales = threading.local()
+_contadores = {'abiertas': 0, 'reutilizadas': 0, 'cerradas': 0}
+_lock_contadores = threading.Lock()
+
+
+def _contar(clave, cantidad=1):
+    with _lock_contadores:
+        _contadores[clave] += cantidad
+
+
+def configurar(conn):
+    """Aplica WAL y los pragmas de rendimiento a una conexión abierta."""
+    if DB_WAL:
+        conn.execute("PRAGMA journal_mode=WAL")
+    if DB_SYNCHRONOUS in ('OFF', 'NORMAL', 'FULL'):
+        conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def conectar(ruta, timeout=DB_TIMEOUT, **kwargs):
+    """
+    Abre una conexión nueva ya configurada.
+
+    Para scripts, inicialización de tablas y el escritor de alertas, que
+    administran su propia conexión; las rutas usan obtener_conexion().
+
+    Args:
+        ruta: Archivo de la base de datos
+        timeout: Segundos de espera ante un bloqueo (busy timeout)
+        **kwargs: Argumentos adicionales de sqlite3.connect (isolation_level, ...)
+
+    Returns:
+        sqlite3.Connection
+    """
+    conn = sqlite3.connect(ruta, timeout=timeout, **kwargs)
+    _contar('abiertas')
+    return configurar(conn)
+
+
+def _conexiones_actuales():
+    """Diccionario ruta -> conexión del contexto de Flask, o del hilo fuera de una solicitud."""
+    from flask import g, has_app_context  # Solo la aplicación web usa el contexto de Flask
+
+    if has_app_context():
+        if '_conexiones_db' not in g:
+            g._conexiones_db = {}
+        return g._conexiones_db
+    if not hasattr(_locales, 'conexiones'):
+        _locales.conexiones = {}
+    return _locales.conexiones
+
+
+def obtener_conexion(ruta):
+    """
+    Devuelve la conexión a `ruta` de esta solicitud (o de este hilo), creándola si falta.
+
+    Las filas son sqlite3.Row (acceso por nombre y por índice). No hay que
+    cerrarla: se cierra al terminar la solicitud.
+    """
+    conexiones = _conexiones_actuales()
+    conn = conexiones.get(ruta)
+    if conn is None:
+        conn = conectar(ruta)
+        conn.row_factory = sqlite3.Row
+        conexiones[ruta] = conn
+    else:
+        _contar('reutilizadas')
+    return conn
+
+
+def cerrar_conexiones(excepcion=None):
+    """
+    Cierra las conexiones de la solicitud actual (teardown de Flask).
+
+    Si la solicitud falló, descarta la transacción que haya quedado abierta.
+    """
+    from flask import g
+
+    conexiones = g.pop('_conexiones_db', None) or {}
+    for conn in conexiones.values():
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        finally:
+            conn.close()
+    if conexiones:
+        _contar('cerradas', len(conexiones))
+
+
+def registrar_app(app):
+    """Cierra las conexiones de cada solicitud al terminar su contexto."""
+    app.teardown_appcontext(cerrar_conexiones)
+
+
+def estadisticas():
+    """Conexiones abiertas, reutilizadas dentro de una misma solicitud o hilo, y cerradas."""
+    with _lock_contadores:
+        return dict(_contadores)
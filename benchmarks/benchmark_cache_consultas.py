@@ -0,0 +1,164 @@
+"""
+Benchmark: caché de consultas del portal (cache_consultas.py).
+
+1. Estampida: varios hilos piden la misma clave vencida al mismo tiempo;
+   las consultas deben ejecutarse una sola vez.
+2. Carga: hilos "lectores" piden las cifras del dashboard y las alertas
+   graves de /usuario/alertas mientras un hilo "cámara" guarda alertas con
+   EscritorAlertas (cada transacción invalida la caché). Se compara sin y
+   con caché: solicitudes/s, latencias, cálculos, proporción de aciertos e
+   invalidaciones.
+
+Ejecución:
+    python benchmarks/benchmark_cache_consultas.py [alertas] [segundos] [lectores] [alertas_por_segundo]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cache_consultas
+from base_datos import conectar
+from benchmark_indices import llenar
+from escritor_alertas import EscritorAlertas, registrar_oyente
+from estadisticas import alertas_por_dia, resumen_alertas
+from migraciones import MIGRACIONES_ALERTAS, aplicar
+
+_locales = threading.local()
+
+
+def conexion(ruta):
+    """Una conexión por hilo, como obtener_conexion() fuera de Flask."""
+    if not hasattr(_locales, 'conn'):
+        _locales.conn = conectar(ruta)
+        _locales.conn.row_factory = sqlite3.Row
+    return _locales.conn
+
+
+def datos_dashboard(ruta):
+    """Las mismas consultas que datos_dashboard() de app.py."""
+    conn = conexion(ruta)
+    hace_24h = (datetime.now() - timedelta(hours=24)).isoformat()
+    recientes = [dict(fila) for fila in conn.execute("SELECT * FROM alertas ORDER BY id DESC LIMIT 10")]
+    return dict(resumen_alertas(conn, hace_24h), alertas_recientes=recientes, alertas_por_dia=alertas_por_dia(conn))
+
+
+def alertas_graves(ruta):
+    """Las mismas consultas que alertas_graves_24h() de app.py."""
+    conn = conexion(ruta)
+    hace_24h = (datetime.now() - timedelta(hours=24)).isoformat()
+    filtro = """fecha_hora >= ? AND (confianza >= 0.80 OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion')))
+                AND ubicacion IS NOT NULL AND ubicacion != ''"""
+    lista = [dict(fila) for fila in conn.execute(
+        f"SELECT tipo, ubicacion, fecha_hora FROM alertas WHERE {filtro} ORDER BY fecha_hora DESC LIMIT 50",
+        (hace_24h,))]
+    total = conn.execute(f"SELECT COUNT(*) FROM alertas WHERE {filtro}", (hace_24h,)).fetchone()[0]
+    return lista, total
+
+
+def estampida(hilos=32):
+    """Todos los hilos piden la misma clave vencida a la vez; devuelve cuántas veces se calculó."""
+    calculos = []
+    barrera = threading.Barrier(hilos)
+
+    def calcular():
+        calculos.append(1)
+        time.sleep(0.2)  # Consulta lenta
+        return 42
+
+    def pedir(resultados):
+        barrera.wait()
+        resultados.append(cache_consultas.obtener('estampida', calcular))
+
+    resultados = []
+    cache_consultas.invalidar()
+    trabajadores = [threading.Thread(target=pedir, args=(resultados,)) for _ in range(hilos)]
+    for hilo in trabajadores:
+        hilo.start()
+    for hilo in trabajadores:
+        hilo.join()
+    return len(calculos), resultados
+
+
+def carga(ruta, con_cache, segundos, lectores, alertas_por_segundo):
+    cache_consultas.CACHE_CONSULTAS_ACTIVA = con_cache
+    cache_consultas.invalidar()
+    antes = cache_consultas.estadisticas()
+    tiempos = []
+    detener = threading.Event()
+
+    def lector(numero):
+        # Como los usuarios del portal: la mitad en el dashboard, la mitad en /usuario/alertas
+        clave, calcular = (('dashboard', datos_dashboard) if numero % 2 == 0 else ('alertas_graves', alertas_graves))
+        while not detener.is_set():
+            inicio = time.perf_counter()
+            cache_consultas.obtener(clave, lambda: calcular(ruta))
+            tiempos.append(time.perf_counter() - inicio)
+
+    def camara(escritor):
+        indice = 0
+        while not detener.is_set():
+            escritor.encolar((datetime.now().isoformat(timespec="seconds"), f"alertas_frames/cam_{indice}.jpg",
+                              'arma', 'gun', 0.9, 0.1, 0.1, 0.5, 0.5, 'Zona 1', None))
+            indice += 1
+            time.sleep(1 / alertas_por_segundo)
+
+    escritor = EscritorAlertas(ruta)
+    hilos = [threading.Thread(target=lector, args=(numero,)) for numero in range(lectores)]
+    hilos.append(threading.Thread(target=camara, args=(escritor,)))
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(segundos)
+    detener.set()
+    for hilo in hilos:
+        hilo.join()
+    escritor.detener()
+
+    despues = cache_consultas.estadisticas()
+    tiempos.sort()
+    p50, p99 = tiempos[len(tiempos) // 2] * 1000, tiempos[int(len(tiempos) * 0.99)] * 1000
+    calculos = len(tiempos) if not con_cache else despues['calculos'] - antes['calculos']
+    linea = (f"{'con caché' if con_cache else 'sin caché':10s} {len(tiempos) / segundos:8.0f} sol/s "
+             f"(p50 {p50:7.3f} ms, p99 {p99:7.3f} ms) | consultas ejecutadas: {calculos}")
+    if con_cache:
+        evitadas = (despues['aciertos'] - antes['aciertos']) + (despues['compartidos'] - antes['compartidos'])
+        linea += (f" | aciertos {evitadas / max(evitadas + calculos, 1):.2%}"
+                  f" | invalidaciones {despues['invalidaciones'] - antes['invalidaciones']}")
+    print(linea)
+
+
+def main():
+    alertas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    segundos = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    lectores = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    alertas_por_segundo = float(sys.argv[4]) if len(sys.argv) > 4 else 5
+
+    calculos, resultados = estampida()
+    print(f"{'✅' if calculos == 1 else '❌'} Estampida: {len(resultados)} solicitudes simultáneas, "
+          f"{calculos} cálculo(s)\n")
+
+    registrar_oyente(cache_consultas.invalidar)
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "alertas.db")
+        aplicar(ruta, MIGRACIONES_ALERTAS)
+        conn = conectar(ruta)
+        llenar(conn, alertas)
+        conn.close()
+        print(f"{alertas} alertas, {lectores} lectores durante {segundos:.0f} s, "
+              f"una cámara guardando {alertas_por_segundo:.0f} alertas/s "
+              f"(TTL {cache_consultas.CACHE_CONSULTAS_TTL:.0f} s)\n")
+        carga(ruta, False, segundos, lectores, alertas_por_segundo)
+        carga(ruta, True, segundos, lectores, alertas_por_segundo)
+
+    if calculos != 1:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark: bucles anidados de palabras clave vs clasificador compilado.
+
+Ejecución:
+    python benchmarks/benchmark_clasificador.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import clasificador
+from clasificador import CATEGORIAS, Clasificador
+
+# Etiquetas típicas devueltas por Google Vision para frames de cámara y fotos subidas
+ETIQUETAS_REALES = [
+    "person", "clothing", "face", "smile", "hair", "arm", "hand", "finger",
+    "gesture", "t-shirt", "sleeve", "jeans", "standing", "sitting", "room",
+    "interior design", "ceiling", "floor", "flooring", "wall", "window",
+    "street", "road", "car", "vehicle", "wheel", "tire", "motor vehicle",
+    "automotive lighting", "building", "sky", "tree", "crowd", "event", "fun",
+    "leisure", "sports", "competition event", "martial arts", "boxing",
+    "combat sport", "fire", "flame", "heat", "smoke", "gas", "lighter",
+    "candle", "night", "darkness", "kitchen knife", "blade", "cutting tool",
+    "gun", "firearm", "trigger", "air gun", "violence", "fight", "action film",
+    "drama", "movement", "public space", "city", "urban area", "glasses",
+    "eyewear", "electric blue", "font", "rectangle", "technology", "screenshot",
+]
+
+
+def clasificar_bucles(etiquetas):
+    """Versión original: listas de palabras recorridas con bucles anidados por etiqueta."""
+    resultado = []
+    for desc, score in etiquetas:
+        encontradas = {}
+        for categoria, (terminos, umbral) in CATEGORIAS.items():
+            for palabra in terminos:
+                if palabra in desc:
+                    encontradas[categoria] = palabra
+                    break
+        activas = frozenset(c for c in encontradas if score >= CATEGORIAS[c][1])
+        resultado.append((desc, score, encontradas, activas))
+    return resultado
+
+
+def generar_conjuntos(cantidad, tamano, semilla=0):
+    rnd = random.Random(semilla)
+    return [
+        [(rnd.choice(ETIQUETAS_REALES), round(rnd.uniform(0.3, 0.99), 3)) for _ in range(tamano)]
+        for _ in range(cantidad)
+    ]
+
+
+def main():
+    conjuntos = generar_conjuntos(cantidad=500, tamano=15)
+    compilado = Clasificador()
+
+    # Mismo resultado en ambos caminos
+    for etiquetas in conjuntos:
+        esperado = [(d, s, set(e), a) for d, s, e, a in clasificar_bucles(etiquetas)]
+        obtenido = [(d, s, set(e), a) for d, s, e, a in compilado.clasificar(etiquetas)]
+        assert esperado == obtenido, "El clasificador compilado difiere de los bucles anidados"
+
+    repeticiones = 5
+    total_etiquetas = sum(len(c) for c in conjuntos)
+
+    def bucles():
+        for etiquetas in conjuntos:
+            clasificar_bucles(etiquetas)
+
+    def compilado_frio():
+        clasificador.coincidencias.cache_clear()
+        for etiquetas in conjuntos:
+            compilado.clasificar(etiquetas)
+
+    def compilado_caliente():
+        for etiquetas in conjuntos:
+            compilado.clasificar(etiquetas)
+
+    print(f"{len(conjuntos)} conjuntos de {len(conjuntos[0])} etiquetas, {len(CATEGORIAS)} categorías\n")
+    resultados = {}
+    for nombre, funcion in [("bucles anidados", bucles),
+                            ("regex compilada (caché vacía)", compilado_frio),
+                            ("regex compilada (caché llena)", compilado_caliente)]:
+        mejor = min(timeit.repeat(funcion, number=1, repeat=repeticiones))
+        resultados[nombre] = mejor
+        print(f"{nombre:30s} {mejor * 1000:8.2f} ms  ({mejor / total_etiquetas * 1e6:6.2f} µs/etiqueta)")
+
+    base = resultados["bucles anidados"]
+    print()
+    for nombre, tiempo in resultados.items():
+        print(f"{nombre:30s} x{base / tiempo:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
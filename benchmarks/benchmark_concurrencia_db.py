@@ -0,0 +1,177 @@
+"""
+Benchmark: escrituras de cámaras y lecturas del dashboard al mismo tiempo.
+
+Varios hilos "cámara" guardan alertas con EscritorAlertas mientras otros
+hilos "dashboard" ejecutan las consultas de la ruta /dashboard sobre una base
+temporal precargada. Se compara:
+
+- original: journal por defecto (rollback), synchronous FULL y una conexión
+  nueva por solicitud del dashboard, como app.py antes de base_datos.py.
+- WAL: base_datos.conectar (WAL, synchronous NORMAL, caché y busy timeout)
+  y una conexión reutilizada por hilo, como obtener_conexion().
+
+Se informan alertas/s, solicitudes del dashboard/s, latencias y errores
+"database is locked".
+
+Ejecución:
+    python benchmarks/benchmark_concurrencia_db.py [segundos] [camaras] [lectores]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import base_datos
+from escritor_alertas import EscritorAlertas
+
+ESQUEMA = """
+    CREATE TABLE alertas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha_hora TEXT NOT NULL,
+        imagen TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        objeto TEXT NOT NULL,
+        confianza REAL NOT NULL,
+        x1 REAL,
+        y1 REAL,
+        x2 REAL,
+        y2 REAL,
+        ubicacion TEXT,
+        clip TEXT
+    )
+"""
+
+TIPOS = ('arma', 'incendio', 'agresion', 'vehiculo', 'otro')
+FILAS_INICIALES = 20000
+
+
+def consultas_dashboard(hace_24h):
+    """Las consultas de la ruta /dashboard, en el mismo orden."""
+    return [
+        ("SELECT COUNT(*) as total FROM alertas", ()),
+        ("SELECT COUNT(*) as total FROM alertas WHERE tipo = 'arma'", ()),
+        ("SELECT COUNT(*) as total FROM alertas WHERE tipo = 'incendio'", ()),
+        ("SELECT COUNT(*) as total FROM alertas WHERE tipo = 'agresion'", ()),
+        ("SELECT COUNT(*) as total FROM alertas WHERE tipo = 'vehiculo'", ()),
+        ("SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?", (hace_24h,)),
+        ("""SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?
+            AND (confianza >= 0.50 OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion')))""",
+         (hace_24h,)),
+        ("""SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?
+            AND confianza IS NOT NULL AND confianza >= 0.20 AND confianza < 0.50""", (hace_24h,)),
+        ("""SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?
+            AND confianza IS NOT NULL AND confianza < 0.20""", (hace_24h,)),
+        ("SELECT * FROM alertas ORDER BY id DESC LIMIT 10", ()),
+        ("""SELECT DATE(fecha_hora) as fecha, COUNT(*) as cantidad FROM alertas
+            WHERE fecha_hora >= datetime('now', '-7 days') GROUP BY DATE(fecha_hora) ORDER BY fecha""", ()),
+    ]
+
+
+def registro(camara, indice, ahora=None):
+    ahora = ahora or datetime.now()
+    return (ahora.isoformat(timespec="seconds"), f"alertas_frames/cam{camara}_{indice}.jpg",
+            TIPOS[indice % len(TIPOS)], 'objeto', (indice % 100) / 100, 0.1, 0.1, 0.5, 0.5,
+            f"Cámara {camara}", None)
+
+
+def crear_db(directorio, nombre):
+    ruta = os.path.join(directorio, nombre)
+    conn = sqlite3.connect(ruta)
+    conn.execute(ESQUEMA)
+    inicio = datetime.now() - timedelta(days=30)
+    conn.executemany(
+        "INSERT INTO alertas (fecha_hora, imagen, tipo, objeto, confianza, x1, y1, x2, y2, ubicacion, clip) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [registro(i % 8, i, inicio + timedelta(minutes=2 * i)) for i in range(FILAS_INICIALES)])
+    conn.commit()
+    conn.close()
+    return ruta
+
+
+def camara(escritor, numero, detener, resultados):
+    indice = 0
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        try:
+            escritor.encolar(registro(numero, indice)).result()
+            resultados['escrituras'].append(time.perf_counter() - inicio)
+        except sqlite3.OperationalError:
+            resultados['errores_escritura'] += 1
+        indice += 1
+        time.sleep(0.002)  # Una cámara no genera alertas sin pausa
+
+
+def dashboard(abrir, reutilizar, detener, resultados):
+    conn = abrir() if reutilizar else None
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        actual = conn or abrir()
+        try:
+            hace_24h = (datetime.now() - timedelta(hours=24)).isoformat()
+            for sql, parametros in consultas_dashboard(hace_24h):
+                actual.execute(sql, parametros).fetchall()
+            resultados['lecturas'].append(time.perf_counter() - inicio)
+        except sqlite3.OperationalError:
+            resultados['errores_lectura'] += 1
+        finally:
+            if conn is None:
+                actual.close()
+    if conn is not None:
+        conn.close()
+
+
+def ejecutar(nombre, ruta, abrir, reutilizar, segundos, camaras, lectores):
+    resultados = {'escrituras': [], 'lecturas': [], 'errores_escritura': 0, 'errores_lectura': 0}
+    escritor = EscritorAlertas(ruta)
+    detener = threading.Event()
+    hilos = [threading.Thread(target=camara, args=(escritor, c, detener, resultados)) for c in range(camaras)]
+    hilos += [threading.Thread(target=dashboard, args=(abrir, reutilizar, detener, resultados))
+              for _ in range(lectores)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(segundos)
+    detener.set()
+    for hilo in hilos:
+        hilo.join()
+    escritor.detener()
+
+    def percentiles(tiempos):
+        tiempos = sorted(tiempos) or [0.0]
+        return tiempos[len(tiempos) // 2] * 1000, tiempos[int(len(tiempos) * 0.99)] * 1000
+
+    e50, e99 = percentiles(resultados['escrituras'])
+    l50, l99 = percentiles(resultados['lecturas'])
+    print(f"{nombre:10s} cámaras {len(resultados['escrituras']) / segundos:7.0f} alertas/s "
+          f"(p50 {e50:6.2f} ms, p99 {e99:7.2f} ms) | dashboard {len(resultados['lecturas']) / segundos:6.1f} sol/s "
+          f"(p50 {l50:6.2f} ms, p99 {l99:7.2f} ms) | bloqueos: {resultados['errores_escritura']} escritura, "
+          f"{resultados['errores_lectura']} lectura")
+    return resultados
+
+
+def main():
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    camaras = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    lectores = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    print(f"{camaras} cámaras escribiendo y {lectores} lectores del dashboard durante {segundos:.0f} s, "
+          f"{FILAS_INICIALES} alertas previas (SQLite {sqlite3.sqlite_version})\n")
+    with tempfile.TemporaryDirectory() as directorio:
+        # Antes: journal por defecto y una conexión nueva por solicitud
+        base_datos.DB_WAL, base_datos.DB_SYNCHRONOUS = False, 'FULL'
+        ruta = crear_db(directorio, "original.db")
+        ejecutar("original", ruta, lambda: sqlite3.connect(ruta), False, segundos, camaras, lectores)
+
+        # Ahora: WAL, pragmas de base_datos y conexión reutilizada por hilo
+        base_datos.DB_WAL, base_datos.DB_SYNCHRONOUS = True, 'NORMAL'
+        ruta_wal = crear_db(directorio, "wal.db")
+        ejecutar("WAL", ruta_wal, lambda: base_datos.conectar(ruta_wal), True, segundos, camaras, lectores)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: una conexión y un commit por alerta vs escritor único por lotes.
+
+Varios hilos productores guardan alertas en una base temporal con la misma
+tabla que alertas.db, primero con el método original (connect, INSERT,
+commit, close por alerta) y luego con EscritorAlertas.
+
+Ejecución:
+    python benchmarks/benchmark_escritor_alertas.py [hilos] [alertas_por_hilo]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from escritor_alertas import EscritorAlertas
+
+ESQUEMA = """
+    CREATE TABLE alertas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha_hora TEXT NOT NULL,
+        imagen TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        objeto TEXT NOT NULL,
+        confianza REAL NOT NULL,
+        x1 REAL,
+        y1 REAL,
+        x2 REAL,
+        y2 REAL,
+        ubicacion TEXT,
+        clip TEXT
+    )
+"""
+
+
+def crear_db(directorio, nombre):
+    ruta = os.path.join(directorio, nombre)
+    conn = sqlite3.connect(ruta)
+    conn.execute(ESQUEMA)
+    conn.commit()
+    conn.close()
+    return ruta
+
+
+def registro(hilo, indice):
+    return (datetime.now().isoformat(timespec="seconds"), f"frame_{hilo}_{indice}.jpg",
+            'arma', 'knife', 0.8, 0.1, 0.1, 0.5, 0.5, "Cámara en Vivo")
+
+
+def por_fila(ruta_db, hilo, cantidad, latencias):
+    """Método original de guardar_alerta: una conexión y un commit por alerta."""
+    for indice in range(cantidad):
+        inicio = time.perf_counter()
+        conn = sqlite3.connect(ruta_db, timeout=30)
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO alertas (fecha_hora, imagen, tipo, objeto, confianza, x1, y1, x2, y2, ubicacion)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, registro(hilo, indice))
+        conn.commit()
+        conn.close()
+        latencias.append(time.perf_counter() - inicio)
+
+
+def con_escritor(escritor, hilo, cantidad, latencias):
+    """Encola cada alerta y espera su id, como hace guardar_alerta con las críticas."""
+    for indice in range(cantidad):
+        inicio = time.perf_counter()
+        escritor.encolar(registro(hilo, indice) + (None,)).result()  # Sin clip
+        latencias.append(time.perf_counter() - inicio)
+
+
+def ejecutar(nombre, objetivo, argumento, hilos, cantidad):
+    latencias = []
+    trabajadores = [threading.Thread(target=objetivo, args=(argumento, h, cantidad, latencias))
+                    for h in range(hilos)]
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    p50 = latencias[len(latencias) // 2] * 1000
+    p99 = latencias[int(len(latencias) * 0.99)] * 1000
+    print(f"{nombre:22s} {len(latencias) / total:9.0f} alertas/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+    return len(latencias) / total
+
+
+def main():
+    hilos = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    cantidad = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+
+    print(f"{hilos} hilos x {cantidad} alertas (SQLite {sqlite3.sqlite_version})\n")
+    with tempfile.TemporaryDirectory() as directorio:
+        base = ejecutar("conexión por alerta", por_fila, crear_db(directorio, "por_fila.db"), hilos, cantidad)
+
+        ruta = crear_db(directorio, "escritor.db")
+        escritor = EscritorAlertas(ruta)
+        lotes = ejecutar("escritor por lotes", con_escritor, escritor, hilos, cantidad)
+        escritor.detener()
+
+        conn = sqlite3.connect(ruta)
+        filas = conn.execute("SELECT COUNT(*) FROM alertas").fetchone()[0]
+        conn.close()
+        assert filas == hilos * cantidad, "El escritor perdió alertas"
+
+        stats = escritor.estadisticas()
+        print(f"\nTransacciones del escritor: {stats['transacciones']} "
+              f"({stats['filas'] / max(stats['transacciones'], 1):.1f} alertas por commit)")
+        print(f"Aceleración: x{lotes / base:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Benchmark: estadísticas del dashboard, /api/estadisticas, perfil, patrullas y admin_reportes.
+
+Para cada tamaño crea una base temporal con el esquema anterior a las tablas
+de resumen (con índices), la llena con el conjunto sintético de
+benchmark_indices.py y aplica la migración de resúmenes (mide su llenado
+inicial). Luego compara, por página, la secuencia original de consultas de
+app.py sobre la tabla alertas con las funciones de estadisticas.py, y
+verifica que ambas den las mismas cifras.
+
+También mide el costo de los triggers al guardar alertas (lotes como los del
+escritor de alertas) y que los resúmenes sigan iguales a una reconstrucción
+después de insertar, actualizar y borrar.
+
+Ejecución:
+    python benchmarks/benchmark_estadisticas.py [alertas ...]
+    (por defecto 10000 1000000 10000000)
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from base_datos import conectar
+from benchmark_indices import llenar
+from estadisticas import (TABLAS_RESUMEN, alertas_por_dia, alertas_por_tipo, reconstruir_resumenes,
+                          resumen_alertas, resumen_patrullas, resumen_reportes_usuarios)
+from migraciones import MIGRACIONES_ALERTAS, aplicar
+
+HACE_24H = (datetime.now() - timedelta(hours=24)).isoformat()
+USUARIO = 42
+
+CRITICAS = "(confianza >= 0.50 OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion')))"
+
+# Consultas de cada página antes de estadisticas.py: (clave, consulta, parámetros[, conversión de las filas])
+ORIGINAL = {
+    'dashboard': [
+        ('total_alertas', "SELECT COUNT(*) as total FROM alertas", ()),
+        ('total_armas', "SELECT COUNT(*) as total FROM alertas WHERE tipo = 'arma'", ()),
+        ('total_incendios', "SELECT COUNT(*) as total FROM alertas WHERE tipo = 'incendio'", ()),
+        ('total_agresiones', "SELECT COUNT(*) as total FROM alertas WHERE tipo = 'agresion'", ()),
+        ('total_vehiculos', "SELECT COUNT(*) as total FROM alertas WHERE tipo = 'vehiculo'", ()),
+        ('alertas_24h', "SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?", (HACE_24H,)),
+        ('alertas_criticas_24h',
+         f"SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ? AND {CRITICAS}", (HACE_24H,)),
+        ('alertas_intermedias_24h',
+         """SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?
+            AND confianza IS NOT NULL AND confianza >= 0.20 AND confianza < 0.50""", (HACE_24H,)),
+        ('alertas_bajas_24h',
+         """SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?
+            AND confianza IS NOT NULL AND confianza < 0.20""", (HACE_24H,)),
+        ('alertas_por_dia',
+         """SELECT DATE(fecha_hora) as fecha, COUNT(*) as cantidad FROM alertas
+            WHERE fecha_hora >= datetime('now', '-7 days') GROUP BY DATE(fecha_hora) ORDER BY fecha""", (),
+         lambda filas: [dict(fila) for fila in filas]),
+    ],
+    'api_estadisticas': [
+        ('por_tipo', "SELECT tipo, COUNT(*) as cantidad FROM alertas GROUP BY tipo", (),
+         lambda filas: {fila['tipo']: fila['cantidad'] for fila in filas}),
+        ('ultimas_24h', "SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?", (HACE_24H,)),
+    ],
+    'perfil': [
+        ('total_alertas', "SELECT COUNT(*) as total FROM alertas", ()),
+        ('alertas_24h', "SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?", (HACE_24H,)),
+        ('alertas_criticas_24h',
+         f"SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ? AND {CRITICAS}", (HACE_24H,)),
+        ('total_reportes', "SELECT COUNT(*) as total FROM reportes_usuarios WHERE usuario_id = ?", (USUARIO,)),
+    ],
+    'patrullas': [
+        ('total_patrullas', "SELECT COUNT(*) as total FROM patrullas", ()),
+        ('patrullas_activas', "SELECT COUNT(*) as total FROM patrullas WHERE estado = 'activa'", ()),
+        ('patrullas_disponibles', "SELECT COUNT(*) as total FROM patrullas WHERE estado = 'disponible'", ()),
+        ('patrullas_en_ruta', "SELECT COUNT(*) as total FROM patrullas WHERE estado = 'en_ruta'", ()),
+    ],
+    'admin_reportes': [
+        ('total_reportes', "SELECT COUNT(*) as total FROM reportes_usuarios", ()),
+        ('reportes_pendientes', "SELECT COUNT(*) as total FROM reportes_usuarios WHERE estado = 'pendiente'", ()),
+        ('reportes_en_revision',
+         "SELECT COUNT(*) as total FROM reportes_usuarios WHERE estado = 'en_revision'", ()),
+        ('reportes_resueltos', "SELECT COUNT(*) as total FROM reportes_usuarios WHERE estado = 'resuelto'", ()),
+    ],
+}
+
+
+def nuevo(conn, pagina):
+    """Las cifras de la página con estadisticas.py, como en app.py."""
+    if pagina == 'dashboard':
+        return {**resumen_alertas(conn, HACE_24H), 'alertas_por_dia': alertas_por_dia(conn, 7)}
+    if pagina == 'api_estadisticas':
+        return {'por_tipo': alertas_por_tipo(conn),
+                'ultimas_24h': resumen_alertas(conn, HACE_24H, por_tipo=False)['alertas_24h']}
+    if pagina == 'perfil':
+        resumen = resumen_alertas(conn, HACE_24H, por_tipo=False)
+        cifras = {clave: resumen[clave] for clave in ('total_alertas', 'alertas_24h', 'alertas_criticas_24h')}
+        cifras['total_reportes'] = resumen_reportes_usuarios(conn, USUARIO)['total_reportes']
+        return cifras
+    if pagina == 'patrullas':
+        return resumen_patrullas(conn)
+    return resumen_reportes_usuarios(conn)
+
+
+def original(conn, pagina):
+    cifras = {}
+    for clave, consulta, parametros, *conversion in ORIGINAL[pagina]:
+        filas = conn.execute(consulta, parametros).fetchall()
+        cifras[clave] = conversion[0](filas) if conversion else filas[0]['total']
+    return cifras
+
+
+def medir(funcion, conn, pagina, repeticiones=5):
+    """Mejor tiempo (ms) de varias ejecuciones y el último resultado."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(conn, pagina)
+        mejor = min(mejor, (time.perf_counter() - inicio) * 1000)
+    return mejor, resultado
+
+
+def llenar_patrullas(conn, cantidad=200):
+    conn.execute(f"""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {cantidad})
+        INSERT INTO patrullas (numero_patrulla, tipo, zona, municipio, departamento, estado)
+        SELECT 'PNC-' || i, 'Patrulla', 'Zona ' || (i % 25), 'Guatemala', 'Guatemala',
+               CASE i % 3 WHEN 0 THEN 'activa' WHEN 1 THEN 'disponible' ELSE 'en_ruta' END
+        FROM n
+    """)
+    conn.commit()
+
+
+def registros(cantidad, inicio=0):
+    ahora = datetime.now()
+    return [((ahora - timedelta(seconds=i)).isoformat(timespec="seconds"), f"alertas_frames/frame_{i}.jpg",
+             ('arma', 'incendio', 'agresion', 'vehiculo', 'otro')[i % 5], 'objeto', (i % 100) / 100,
+             f"Zona {i % 300}") for i in range(inicio, inicio + cantidad)]
+
+
+def medir_escritura(ruta, cantidad=20_000, lote=50):
+    """Alertas/s guardadas en transacciones de `lote` filas, como el escritor de alertas."""
+    conn = conectar(ruta)
+    filas = registros(cantidad)
+    inicio = time.perf_counter()
+    for desde in range(0, cantidad, lote):
+        conn.executemany("INSERT INTO alertas (fecha_hora, imagen, tipo, objeto, confianza, ubicacion) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", filas[desde:desde + lote])
+        conn.commit()
+    duracion = time.perf_counter() - inicio
+    conn.close()
+    return cantidad / duracion
+
+
+def resumenes(conn):
+    """Contenido de las tablas de resumen sin las filas que quedaron en cero."""
+    return [conn.execute(f"SELECT * FROM {tabla} WHERE {'total' if tabla == 'resumen_hora' else 'cantidad'} > 0 "
+                         f"ORDER BY 1").fetchall() for tabla in TABLAS_RESUMEN]
+
+
+def escrituras(directorio):
+    """Costo de los triggers al guardar y consistencia tras insertar, actualizar y borrar."""
+    sin_resumenes = os.path.join(directorio, "sin_resumenes.db")
+    con_resumenes = os.path.join(directorio, "con_resumenes.db")
+    aplicar(sin_resumenes, [migracion for migracion in MIGRACIONES_ALERTAS if migracion[0] < 5])
+    aplicar(con_resumenes, MIGRACIONES_ALERTAS)
+    antes = medir_escritura(sin_resumenes)
+    despues = medir_escritura(con_resumenes)
+    print(f"\nGuardar alertas en lotes de 50: {antes:8.0f} alertas/s sin triggers -> "
+          f"{despues:8.0f} alertas/s con triggers ({despues / antes - 1:+.0%})")
+
+    conn = conectar(con_resumenes)
+    conn.execute("UPDATE alertas SET confianza = 0.95, tipo = 'arma' WHERE id % 7 = 0")
+    conn.execute("UPDATE alertas SET ubicacion = NULL WHERE id % 11 = 0")
+    conn.execute("DELETE FROM alertas WHERE id % 3 = 0")
+    conn.commit()
+    mantenidos = resumenes(conn)
+    reconstruir_resumenes(conn)
+    iguales = mantenidos == resumenes(conn)
+    conn.close()
+    print(f"{'✅' if iguales else '❌'} Resúmenes tras actualizar y borrar iguales a la reconstrucción")
+    return iguales
+
+
+def main():
+    tamanos = [int(valor) for valor in sys.argv[1:]] or [10_000, 1_000_000, 10_000_000]
+    distintas = []
+
+    for alertas in tamanos:
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, "alertas.db")
+            aplicar(ruta, [migracion for migracion in MIGRACIONES_ALERTAS if migracion[0] < 5])
+            conn = conectar(ruta)
+            inicio = time.perf_counter()
+            llenar(conn, alertas)
+            llenar_patrullas(conn)
+            conn.close()
+            print(f"\n{alertas} alertas, {alertas // 10} reportes, 200 patrullas "
+                  f"({time.perf_counter() - inicio:.1f} s)")
+            inicio = time.perf_counter()
+            aplicar(ruta, MIGRACIONES_ALERTAS)
+            print(f"Llenado inicial de los resúmenes: {time.perf_counter() - inicio:.1f} s")
+
+            conn = conectar(ruta)
+            conn.row_factory = sqlite3.Row  # Como obtener_conexion()
+
+            for pagina, consultas in ORIGINAL.items():
+                antes, cifras_antes = medir(original, conn, pagina)
+                despues, cifras_despues = medir(nuevo, conn, pagina)
+                iguales = cifras_antes == cifras_despues
+                if not iguales:
+                    distintas.append(f"{pagina} ({alertas})")
+                print(f"{'✅' if iguales else '❌'} {pagina:16s} {len(consultas)} consultas {antes:9.2f} ms "
+                      f"-> estadisticas.py {despues:9.2f} ms (x{antes / max(despues, 1e-3):.1f})")
+            conn.close()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        if not escrituras(directorio):
+            distintas.append("resúmenes tras actualizar y borrar")
+
+    if distintas:
+        print(f"\nCifras distintas: {', '.join(distintas)}")
+        sys.exit(1)
+    print("\nLas cifras coinciden en todas las páginas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Micro-benchmark: detección de fuego por color original vs reducida con LUT.
+
+Genera frames sintéticos de 720p y 1080p (ruido de fondo, una "camiseta"
+naranja opaca y una llama brillante) y mide el tiempo por frame de la
+versión original (resolución completa, cuatro inRange) y de
+DetectorFuegoColor con varios anchos de reducción. También compara el
+resultado y el bbox normalizado con la versión original.
+
+Al final mide ConfirmadorFuego: el costo agregado por frame y si confirma
+una llama que parpadea y descarta una camiseta naranja brillante inmóvil.
+
+Ejecución:
+    python benchmarks/benchmark_fuego.py
+    python benchmarks/benchmark_fuego.py --frames 300 --anchos 0 960 640 320
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from deteccion_fuego import ConfirmadorFuego, DetectorFuegoColor
+
+RESOLUCIONES = {'720p': (720, 1280), '1080p': (1080, 1920)}
+
+
+def detectar_fuego_original(frame_rgb, umbral_pixeles=150, umbral_porcentaje=0.3):
+    """Versión original de camara_vivo.py: HSV, cuatro inRange y kernel nuevo en cada frame."""
+    hsv = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2HSV)
+    mask_red1 = cv2.inRange(hsv, np.array([0, 120, 180]), np.array([10, 255, 255]))
+    mask_red2 = cv2.inRange(hsv, np.array([170, 120, 180]), np.array([180, 255, 255]))
+    mask_orange = cv2.inRange(hsv, np.array([10, 120, 180]), np.array([25, 255, 255]))
+    mask_yellow = cv2.inRange(hsv, np.array([25, 120, 180]), np.array([35, 255, 255]))
+    mask_fuego = cv2.bitwise_or(mask_red1, mask_red2)
+    mask_fuego = cv2.bitwise_or(mask_fuego, mask_orange)
+    mask_fuego = cv2.bitwise_or(mask_fuego, mask_yellow)
+    kernel = np.ones((5, 5), np.uint8)
+    mask_fuego = cv2.morphologyEx(mask_fuego, cv2.MORPH_CLOSE, kernel)
+    mask_fuego = cv2.morphologyEx(mask_fuego, cv2.MORPH_OPEN, kernel)
+
+    pixeles_fuego = cv2.countNonZero(mask_fuego)
+    porcentaje = (pixeles_fuego / (frame_rgb.shape[0] * frame_rgb.shape[1])) * 100
+    if pixeles_fuego >= umbral_pixeles and porcentaje >= umbral_porcentaje:
+        contours, _ = cv2.findContours(mask_fuego, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if contours:
+            largest_contour = max(contours, key=cv2.contourArea)
+            if cv2.contourArea(largest_contour) < 300:
+                return False, porcentaje, None
+            x, y, w, h = cv2.boundingRect(largest_contour)
+            if w < 20 or h < 20:
+                return False, porcentaje, None
+            altura, ancho = frame_rgb.shape[:2]
+            return True, porcentaje, (x / ancho, y / altura, (x + w) / ancho, (y + h) / altura)
+    return False, porcentaje, None
+
+
+def generar_frames(altura, ancho, cantidad, semilla=0):
+    """Frames RGB con ruido, una camiseta naranja apagada y una llama que se mueve."""
+    rnd = np.random.default_rng(semilla)
+    base = rnd.integers(0, 140, size=(altura, ancho, 3), dtype=np.uint8)
+    cv2.rectangle(base, (ancho // 10, altura // 2), (ancho // 4, altura - 20), (200, 110, 60), -1)
+    frames = []
+    for i in range(cantidad):
+        frame = base.copy()
+        centro = (ancho // 2 + (i % 20) * 3, altura // 3)
+        ejes = (ancho // 30 + i % 5, altura // 12 + i % 7)
+        cv2.ellipse(frame, centro, ejes, 0, 0, 360, (255, 140, 20), -1)
+        cv2.ellipse(frame, centro, (ejes[0] // 2, ejes[1] // 2), 0, 0, 360, (255, 230, 90), -1)
+        frames.append(frame)
+    return frames
+
+
+def generar_frames_estaticos(altura, ancho, cantidad, semilla=0):
+    """Frames con una camiseta naranja brillante inmóvil y solo ruido de sensor."""
+    rnd = np.random.default_rng(semilla)
+    base = rnd.integers(0, 140, size=(altura, ancho, 3), dtype=np.uint8)
+    cv2.rectangle(base, (ancho // 3, altura // 4), (ancho // 2, altura * 3 // 4), (255, 120, 20), -1)
+    ruido = rnd.integers(0, 6, size=(cantidad, altura, ancho, 1), dtype=np.uint8)
+    return [cv2.add(base, np.repeat(ruido[i], 3, axis=2)) for i in range(cantidad)]
+
+
+def probar_confirmacion(frames):
+    """Devuelve (frames confirmados, ms promedio de la confirmación)."""
+    confirmador = ConfirmadorFuego()
+    confirmados = sum(confirmador.actualizar(frame).confirmado for frame in frames)
+    return confirmados, confirmador.estadisticas()['ms_promedio']
+
+
+def medir(funcion, frames):
+    """Devuelve los tiempos por frame (ms) y el último resultado."""
+    funcion(frames[0])  # Calentamiento: reserva de buffers
+    tiempos = []
+    resultado = None
+    for frame in frames:
+        inicio = time.perf_counter()
+        resultado = funcion(frame)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tiempos), resultado
+
+
+def percentil(tiempos, p):
+    return tiempos[min(len(tiempos) - 1, int(len(tiempos) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de detección de fuego por color")
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--anchos', type=int, nargs='+', default=[0, 640, 320],
+                        help="Anchos de reducción a medir (0 = resolución completa)")
+    args = parser.parse_args()
+
+    for nombre, (altura, ancho) in RESOLUCIONES.items():
+        frames = generar_frames(altura, ancho, args.frames)
+        print(f"\n=== {nombre} ({ancho}x{altura}, {args.frames} frames) ===")
+
+        tiempos, referencia = medir(detectar_fuego_original, frames)
+        base = np.mean(tiempos)
+        print(f"{'original':<14} p50 {percentil(tiempos, 0.5):7.2f} ms | p95 {percentil(tiempos, 0.95):7.2f} ms | "
+              f"media {base:7.2f} ms | resultado {referencia[0]}")
+
+        for ancho_reducido in args.anchos:
+            detector = DetectorFuegoColor(ancho=ancho_reducido)
+            tiempos, resultado = medir(detector.detectar, frames)
+            media = np.mean(tiempos)
+            diferencia_bbox = (max(abs(a - b) for a, b in zip(resultado[2], referencia[2]))
+                               if resultado[2] and referencia[2] else float('nan'))
+            etiqueta = f"LUT {ancho_reducido or 'completo'}"
+            print(f"{etiqueta:<14} p50 {percentil(tiempos, 0.5):7.2f} ms | p95 {percentil(tiempos, 0.95):7.2f} ms | "
+                  f"media {media:7.2f} ms ({base / media:4.1f}x) | resultado {resultado[0]} | "
+                  f"diferencia máx. bbox {diferencia_bbox:.4f}")
+
+        cantidad = min(args.frames, 60)
+        llama, ms_llama = probar_confirmacion(frames[:cantidad])
+        camiseta, ms_camiseta = probar_confirmacion(generar_frames_estaticos(altura, ancho, cantidad))
+        print(f"{'confirmación':<14} llama que parpadea: {llama}/{cantidad} frames confirmados | "
+              f"camiseta inmóvil: {camiseta}/{cantidad} | costo agregado {max(ms_llama, ms_camiseta):.3f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
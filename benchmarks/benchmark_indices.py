@@ -0,0 +1,167 @@
+"""
+Benchmark: consultas del portal sin y con los índices de migraciones.py.
+
+Crea una base temporal con el esquema de alertas.db hasta la migración
+anterior a los índices, la llena con un conjunto sintético (millones de
+alertas, reportes, destinatarios e historial de envíos), mide las consultas
+más frecuentes de app.py, aplica la migración de índices y las vuelve a medir.
+
+Para cada consulta muestra el plan (EXPLAIN QUERY PLAN) y verifica que
+ninguna recorra una tabla completa: si alguna lo hace, termina con código 1.
+
+Ejecución:
+    python benchmarks/benchmark_indices.py [alertas]
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from base_datos import conectar
+from migraciones import MIGRACIONES_ALERTAS, aplicar, version
+
+HACE_24H = (datetime.now() - timedelta(hours=24)).isoformat()
+
+# (nombre, consulta, parámetros) con la misma forma que en app.py
+CONSULTAS = [
+    ("dashboard: últimas 24 h",
+     "SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?", (HACE_24H,)),
+    ("dashboard: críticas 24 h",
+     """SELECT COUNT(*) as total FROM alertas WHERE fecha_hora >= ?
+        AND (confianza >= 0.50 OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion')))""",
+     (HACE_24H,)),
+    ("dashboard: total por tipo",
+     "SELECT COUNT(*) as total FROM alertas WHERE tipo = 'arma'", ()),
+    ("usuario_alertas: graves con ubicación",
+     """SELECT tipo, ubicacion, fecha_hora FROM alertas WHERE fecha_hora >= ?
+        AND (confianza >= 0.80 OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion')))
+        AND ubicacion IS NOT NULL AND ubicacion != '' ORDER BY fecha_hora DESC LIMIT 50""", (HACE_24H,)),
+    ("alertas: filtro por tipo",
+     "SELECT * FROM alertas WHERE 1=1 AND tipo = ? ORDER BY id DESC LIMIT 100", ('arma',)),
+    ("alertas: filtro tipo y fechas",
+     "SELECT * FROM alertas WHERE 1=1 AND tipo = ? AND fecha_hora >= ? ORDER BY id DESC LIMIT 100",
+     ('incendio', HACE_24H)),
+    ("api_estadisticas: por tipo",
+     "SELECT tipo, COUNT(*) as cantidad FROM alertas GROUP BY tipo", ()),
+    ("configurar_alertas: ubicaciones",
+     "SELECT DISTINCT ubicacion FROM alertas WHERE ubicacion IS NOT NULL ORDER BY ubicacion", ()),
+    ("perfil: reportes del usuario",
+     "SELECT * FROM reportes_usuarios WHERE usuario_id = ? ORDER BY fecha_hora DESC LIMIT 10", (42,)),
+    ("admin_reportes: por estado",
+     "SELECT COUNT(*) as total FROM reportes_usuarios WHERE estado = 'pendiente'", ()),
+    ("envío: destinatarios activos",
+     "SELECT * FROM destinatarios_alertas WHERE ubicacion = ? AND activo = 1", ('Zona 7',)),
+    ("configurar_alertas: historial",
+     """SELECT h.*, d.nombre as destinatario_nombre, d.email FROM historial_envios h
+        LEFT JOIN destinatarios_alertas d ON h.destinatario_id = d.id
+        ORDER BY h.fecha_envio DESC LIMIT 20""", ()),
+]
+
+# Una línea "SCAN tabla" sin índice es un recorrido completo de la tabla
+RECORRIDO_COMPLETO = re.compile(r"^SCAN \w+$")
+
+
+def llenar(conn, alertas):
+    """Genera los datos sintéticos con CTE recursivas (sin pasar por Python fila a fila)."""
+    segundos = 365 * 24 * 3600
+    conn.execute(f"""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {alertas})
+        INSERT INTO alertas (fecha_hora, imagen, tipo, objeto, confianza, x1, y1, x2, y2, ubicacion)
+        SELECT strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime',
+                        '-' || (({alertas} - i) * {segundos} / {alertas}) || ' seconds'),
+               'alertas_frames/frame_' || i || '.jpg',
+               CASE abs(random()) % 10 WHEN 0 THEN 'arma' WHEN 1 THEN 'incendio' WHEN 2 THEN 'agresion'
+                                       WHEN 3 THEN 'vehiculo' ELSE 'otro' END,
+               'objeto', (abs(random()) % 100) / 100.0, 0.1, 0.1, 0.5, 0.5,
+               CASE WHEN i % 10 = 0 THEN NULL ELSE 'Zona ' || (i % 300) END
+        FROM n
+    """)
+    conn.execute(f"""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {alertas // 10})
+        INSERT INTO reportes_usuarios (usuario_id, imagen, ubicacion, tipo_reporte, fecha_hora, estado)
+        SELECT i % 5000, 'reporte_' || i || '.jpg', 'Zona ' || (i % 300), 'general',
+               strftime('%Y-%m-%dT%H:%M:%S', 'now', '-' || i || ' minutes'),
+               CASE abs(random()) % 3 WHEN 0 THEN 'pendiente' WHEN 1 THEN 'en_revision' ELSE 'resuelto' END
+        FROM n
+    """)
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3000)
+        INSERT INTO destinatarios_alertas (ubicacion, nombre, email, activo, fecha_creacion)
+        SELECT 'Zona ' || (i % 300), 'Destinatario ' || i, 'd' || i || '@ejemplo.com', i % 4 != 0,
+               strftime('%Y-%m-%dT%H:%M:%S', 'now')
+        FROM n
+    """)
+    conn.execute(f"""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {alertas // 4})
+        INSERT INTO historial_envios (alerta_id, destinatario_id, ubicacion, tipo_alerta, fecha_envio)
+        SELECT i, 1 + i % 3000, 'Zona ' || (i % 300), 'arma',
+               strftime('%Y-%m-%dT%H:%M:%S', 'now', '-' || i || ' seconds')
+        FROM n
+    """)
+    conn.commit()
+
+
+def medir(conn, consulta, parametros, repeticiones=3):
+    """Mejor tiempo (ms) de varias ejecuciones."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        conn.execute(consulta, parametros).fetchall()
+        mejor = min(mejor, (time.perf_counter() - inicio) * 1000)
+    return mejor
+
+
+def plan(conn, consulta, parametros):
+    return [fila[3] for fila in conn.execute("EXPLAIN QUERY PLAN " + consulta, parametros)]
+
+
+def main():
+    alertas = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "alertas.db")
+        sin_indices = [migracion for migracion in MIGRACIONES_ALERTAS if migracion[0] < 4]
+        aplicar(ruta, sin_indices)
+
+        conn = conectar(ruta)
+        inicio = time.perf_counter()
+        llenar(conn, alertas)
+        print(f"Datos sintéticos: {alertas} alertas, {alertas // 10} reportes, 3000 destinatarios, "
+              f"{alertas // 4} envíos ({time.perf_counter() - inicio:.1f} s)\n")
+
+        antes = {nombre: medir(conn, consulta, parametros) for nombre, consulta, parametros in CONSULTAS}
+        conn.close()
+
+        inicio = time.perf_counter()
+        aplicadas = aplicar(ruta, MIGRACIONES_ALERTAS)
+        print(f"Migraciones aplicadas: {aplicadas} ({time.perf_counter() - inicio:.1f} s)")
+        assert aplicar(ruta, MIGRACIONES_ALERTAS) == [], "Las migraciones se repitieron"
+
+        conn = conectar(ruta)
+        print(f"Versión de esquema: {version(conn)}\n")
+        fallidas = []
+        for nombre, consulta, parametros in CONSULTAS:
+            despues = medir(conn, consulta, parametros)
+            detalle = plan(conn, consulta, parametros)
+            completo = [linea for linea in detalle if RECORRIDO_COMPLETO.match(linea)]
+            if completo:
+                fallidas.append(nombre)
+            print(f"{'❌' if completo else '✅'} {nombre:40s} {antes[nombre]:9.2f} ms -> {despues:8.2f} ms "
+                  f"(x{antes[nombre] / max(despues, 1e-3):.0f})")
+            for linea in detalle:
+                print(f"      {linea}")
+        conn.close()
+
+    if fallidas:
+        print(f"\nConsultas que recorren una tabla completa: {', '.join(fallidas)}")
+        sys.exit(1)
+    print("\nTodas las consultas usan índices")
+
+
+if __name__ == "__main__":
+    main()
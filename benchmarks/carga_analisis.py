@@ -0,0 +1,85 @@
+"""
+Prueba de carga de detectar_amenazas sin Google Vision real.
+
+Analiza las imágenes indicadas con N hilos concurrentes y reporta el
+rendimiento y los percentiles de latencia. El backend se elige con las
+variables de entorno de siempre:
+
+    # Respuestas grabadas, sin red (grabar antes con DETECTOR_GRABAR=1)
+    DETECTOR_BACKEND=replay python benchmarks/carga_analisis.py uploads/ --hilos 8
+
+    # Servidor falso con la latencia de producción
+    python servidor_vision_falso.py --perfil latencias_produccion.txt &
+    VISION_ENDPOINT=http://localhost:8089 python benchmarks/carga_analisis.py uploads/ --hilos 8
+
+La caché de análisis se desactiva para que cada imagen recorra el camino completo.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cache_analisis
+
+cache_analisis.CACHE_ACTIVA = False
+
+import analizador
+from analizador import detectar_amenazas, expandir_rutas
+from detectores import obtener_detector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de detectar_amenazas")
+    parser.add_argument('rutas', nargs='+', help="Imágenes, directorios o patrones glob")
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--repeticiones', type=int, default=1, help="Veces que se analiza cada imagen")
+    args = parser.parse_args()
+
+    rutas = expandir_rutas(args.rutas) * args.repeticiones
+    if not rutas:
+        print("❌ No se encontraron imágenes")
+        sys.exit(1)
+
+    # Alertas en una base temporal para no ensuciar alertas.db
+    directorio = tempfile.mkdtemp(prefix="carga_analisis_")
+    analizador.DB_PATH = os.path.join(directorio, "alertas.db")
+    analizador.init_db()
+
+    detector = obtener_detector()
+    detector.calentar(en_segundo_plano=False)
+
+    def analizar(ruta):
+        inicio = time.perf_counter()
+        try:
+            detectar_amenazas(ruta, generar_imagen_anotada=False)
+            error = None
+        except Exception as e:
+            error = str(e)
+        return time.perf_counter() - inicio, error
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as executor:
+        resultados = list(executor.map(analizar, rutas))
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(segundos * 1000 for segundos, error in resultados if error is None)
+    errores = [error for _, error in resultados if error is not None]
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(len(latencias) * p))] if latencias else 0.0
+
+    print("\n" + "=" * 60)
+    print(f"Backend: {detector.nombre} | {len(rutas)} análisis con {args.hilos} hilos en {duracion:.2f}s")
+    print(f"Rendimiento: {len(rutas) / duracion:.2f} imágenes/s | Errores: {len(errores)}")
+    print(f"Latencia: p50 {percentil(0.50):.0f} ms | p95 {percentil(0.95):.0f} ms | p99 {percentil(0.99):.0f} ms")
+    if errores:
+        print(f"Primer error: {errores[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Caché de análisis de imágenes indexada por el SHA-256 de los bytes.
+
+Guarda la respuesta cruda de Vision y las detecciones derivadas en SQLite,
+junto a alertas.db, para no volver a enviar a la API una imagen idéntica.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ------------------ CONFIGURACIÓN ------------------ #
+CACHE_DB_PATH = "cache_analisis.db"
+CACHE_ACTIVA = os.environ.get('CACHE_ANALISIS_ACTIVA', '1') == '1'
+CACHE_MAX_ENTRADAS = int(os.environ.get('CACHE_ANALISIS_MAX_ENTRADAS', 5000))  # Límite LRU
+CACHE_TTL_SEGUNDOS = int(os.environ.get('CACHE_ANALISIS_TTL', 7 * 24 * 3600))  # 7 días
+
+_contadores = {'aciertos': 0, 'fallos': 0}
+_lock_contadores = threading.Lock()
+
+
+def hash_imagen(content):
+    """Devuelve el SHA-256 hexadecimal de los bytes de la imagen."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def init_cache(ruta_db=CACHE_DB_PATH):
+    """Crea la tabla de la caché si no existe."""
+    conn = sqlite3.connect(ruta_db)
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cache_analisis (
+            hash TEXT PRIMARY KEY,
+            respuesta BLOB,
+            detecciones TEXT NOT NULL,
+            creado REAL NOT NULL,
+            ultimo_acceso REAL NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cache_ultimo_acceso ON cache_analisis(ultimo_acceso)")
+    conn.commit()
+    conn.close()
+
+
+def _contar(clave):
+    with _lock_contadores:
+        _contadores[clave] += 1
+
+
+def obtener(hash_contenido, ruta_db=CACHE_DB_PATH, ttl=CACHE_TTL_SEGUNDOS):
+    """
+    Busca un análisis previo de la misma imagen.
+
+    Args:
+        hash_contenido: SHA-256 de los bytes de la imagen
+        ttl: Antigüedad máxima en segundos de una entrada válida
+
+    Returns:
+        (respuesta_bytes, detecciones) si hay acierto, o None
+    """
+    if not CACHE_ACTIVA:
+        return None
+
+    ahora = time.time()
+    conn = sqlite3.connect(ruta_db, timeout=5)
+    cur = conn.cursor()
+    cur.execute("SELECT respuesta, detecciones, creado FROM cache_analisis WHERE hash = ?", (hash_contenido,))
+    fila = cur.fetchone()
+
+    if fila and ahora - fila[2] > ttl:
+        # Entrada vencida: eliminarla y contarla como fallo
+        cur.execute("DELETE FROM cache_analisis WHERE hash = ?", (hash_contenido,))
+        conn.commit()
+        fila = None
+    elif fila:
+        cur.execute("UPDATE cache_analisis SET ultimo_acceso = ? WHERE hash = ?", (ahora, hash_contenido))
+        conn.commit()
+    conn.close()
+
+    if fila is None:
+        _contar('fallos')
+        return None
+
+    _contar('aciertos')
+    detecciones = [tuple(deteccion) for deteccion in json.loads(fila[1])]
+    return fila[0], detecciones
+
+
+def guardar(hash_contenido, respuesta_bytes, detecciones, ruta_db=CACHE_DB_PATH, max_entradas=CACHE_MAX_ENTRADAS):
+    """
+    Guarda el análisis de una imagen y expulsa las entradas menos usadas si se supera el límite.
+
+    Args:
+        hash_contenido: SHA-256 de los bytes de la imagen
+        respuesta_bytes: Respuesta cruda de Vision serializada
+        detecciones: Lista de tuplas (tipo, objeto, confianza, x1, y1, x2, y2)
+    """
+    if not CACHE_ACTIVA:
+        return
+
+    ahora = time.time()
+    conn = sqlite3.connect(ruta_db, timeout=5)
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT OR REPLACE INTO cache_analisis (hash, respuesta, detecciones, creado, ultimo_acceso)
+        VALUES (?, ?, ?, ?, ?)
+    """, (hash_contenido, respuesta_bytes, json.dumps(detecciones), ahora, ahora))
+
+    # Expulsión LRU: conservar solo las max_entradas más recientes
+    cur.execute("SELECT COUNT(*) FROM cache_analisis")
+    exceso = cur.fetchone()[0] - max_entradas
+    if exceso > 0:
+        cur.execute("""
+            DELETE FROM cache_analisis WHERE hash IN (
+                SELECT hash FROM cache_analisis ORDER BY ultimo_acceso ASC LIMIT ?
+            )
+        """, (exceso,))
+    conn.commit()
+    conn.close()
+
+
+def estadisticas(ruta_db=CACHE_DB_PATH):
+    """
+    Devuelve los contadores de aciertos y fallos de la caché.
+
+    Returns:
+        Diccionario con aciertos, fallos, tasa de aciertos y entradas almacenadas
+    """
+    with _lock_contadores:
+        aciertos = _contadores['aciertos']
+        fallos = _contadores['fallos']
+
+    conn = sqlite3.connect(ruta_db, timeout=5)
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM cache_analisis")
+    entradas = cur.fetchone()[0]
+    conn.close()
+
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': (aciertos / total) if total else 0.0,
+        'entradas': entradas,
+        'max_entradas': CACHE_MAX_ENTRADAS,
+        'ttl_segundos': CACHE_TTL_SEGUNDOS
+    }
@@ -0,0 +1,132 @@
+"""
+Caché en memoria de los resultados de las páginas más leídas.
+
+El dashboard, /api/estadisticas y las vistas de usuario (/usuario/alertas,
+/usuario/mapa) muestran lo mismo a todos los que las abren: el resultado de
+sus consultas se guarda por CACHE_CONSULTAS_TTL segundos y se comparte.
+
+- Un solo cálculo por clave: si varias solicitudes encuentran la entrada
+  vencida a la vez, una ejecuta las consultas y las demás esperan su
+  resultado en lugar de repetirlas.
+- Invalidación explícita: el escritor de alertas avisa después de cada
+  transacción (ver escritor_alertas.registrar_oyente) y se descarta todo.
+  Un cálculo que empezó antes de la invalidación entrega su resultado a
+  quienes lo esperaban, pero no se guarda.
+
+Las alertas que escriben otros procesos (cámaras) no invalidan esta caché:
+aparecen cuando vence el TTL.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+# ------------------ CONFIGURACIÓN ------------------ #
+CACHE_CONSULTAS_ACTIVA = os.environ.get('CACHE_CONSULTAS_ACTIVA', '1') == '1'
+CACHE_CONSULTAS_TTL = float(os.environ.get('CACHE_CONSULTAS_TTL', 5))  # Segundos
+
+_entradas = {}  # clave -> (valor, vence)
+_en_curso = {}  # clave -> Future del cálculo en curso
+_generacion = 0  # Aumenta con cada invalidación
+_lock = threading.Lock()
+_contadores = {}  # clave -> {'aciertos', 'compartidos', 'calculos', 'errores'}
+_invalidaciones = 0
+
+
+def _contar(clave, campo):
+    """Suma uno al contador `campo` de la clave (llamar con _lock tomado)."""
+    contadores = _contadores.setdefault(clave, {'aciertos': 0, 'compartidos': 0, 'calculos': 0, 'errores': 0})
+    contadores[campo] += 1
+
+
+def obtener(clave, calcular, ttl=CACHE_CONSULTAS_TTL):
+    """
+    Devuelve el resultado guardado de `clave` o lo calcula una sola vez.
+
+    El valor se comparte entre solicitudes: no hay que modificarlo.
+
+    Args:
+        clave: Nombre del resultado (p. ej. 'dashboard')
+        calcular: Función sin argumentos que ejecuta las consultas
+        ttl: Segundos que el resultado sigue siendo válido
+
+    Returns:
+        El valor de calcular(), nuevo o guardado
+    """
+    if not CACHE_CONSULTAS_ACTIVA:
+        return calcular()
+
+    with _lock:
+        entrada = _entradas.get(clave)
+        if entrada is not None and entrada[1] > time.monotonic():
+            _contar(clave, 'aciertos')
+            return entrada[0]
+        calculo = _en_curso.get(clave)
+        propio = calculo is None
+        if propio:
+            calculo = Future()
+            _en_curso[clave] = calculo
+            generacion = _generacion
+            _contar(clave, 'calculos')
+        else:
+            _contar(clave, 'compartidos')
+
+    if not propio:
+        return calculo.result()  # Relanza el error si el cálculo falló
+
+    try:
+        valor = calcular()
+    except BaseException as e:
+        with _lock:
+            _contar(clave, 'errores')
+            if _en_curso.get(clave) is calculo:
+                del _en_curso[clave]
+        calculo.set_exception(e)
+        raise
+
+    with _lock:
+        if _en_curso.get(clave) is calculo:
+            del _en_curso[clave]
+        # Si hubo una invalidación mientras se calculaba, el valor puede no incluir la última alerta
+        if generacion == _generacion:
+            _entradas[clave] = (valor, time.monotonic() + ttl)
+    calculo.set_result(valor)
+    return valor
+
+
+def invalidar(*_):
+    """
+    Descarta todos los resultados guardados.
+
+    Acepta y descarta argumentos para usarse directamente como oyente del
+    escritor de alertas.
+    """
+    global _generacion, _invalidaciones
+    with _lock:
+        _entradas.clear()
+        # Los cálculos en curso terminan para quienes ya los esperan; las solicitudes nuevas calculan otra vez
+        _en_curso.clear()
+        _generacion += 1
+        _invalidaciones += 1
+
+
+def estadisticas():
+    """Aciertos, cálculos compartidos, cálculos y proporción de aciertos por clave y en total."""
+    with _lock:
+        por_clave = {clave: dict(contadores) for clave, contadores in _contadores.items()}
+        invalidaciones = _invalidaciones
+        entradas = len(_entradas)
+
+    def proporcion(contadores):
+        # Un cálculo compartido también evitó repetir las consultas
+        evitadas = contadores['aciertos'] + contadores['compartidos']
+        total = evitadas + contadores['calculos']
+        return round(evitadas / total, 4) if total else 0.0
+
+    total = {campo: sum(contadores[campo] for contadores in por_clave.values())
+             for campo in ('aciertos', 'compartidos', 'calculos', 'errores')}
+    for contadores in por_clave.values():
+        contadores['proporcion_aciertos'] = proporcion(contadores)
+    return dict(total, proporcion_aciertos=proporcion(total), invalidaciones=invalidaciones,
+                entradas=entradas, ttl=CACHE_CONSULTAS_TTL, activa=CACHE_CONSULTAS_ACTIVA, por_clave=por_clave)
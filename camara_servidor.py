@@ -0,0 +1,251 @@
+"""
+Cámara en vivo sin ventana, para servidores sin pantalla.
+
+Ejecuta el mismo pipeline que camara_vivo.py (captura, puerta de movimiento,
+detector y alertas) sin cv2.imshow ni teclado. Los controles de teclado se
+reemplazan por señales y por una pequeña API HTTP local:
+
+    Tecla  Señal     API local (127.0.0.1:CAMARA_CONTROL_PUERTO)
+    q      SIGTERM   POST /detener
+    s      SIGUSR1   POST /capturar
+    d      SIGUSR2   POST /debug
+    -      SIGHUP    GET  /estado
+
+Los eventos se registran como una línea JSON por evento en la salida
+estándar (CAMARA_LOG_FORMATO=texto para leerlos en consola). Al detenerse
+termina el análisis en curso, guarda sus frames y vacía el escritor de
+alertas antes de salir.
+
+Pensado para correr en primer plano bajo systemd, supervisord o Docker:
+    CAMARA_FUENTE=rtsp://10.0.0.12/stream1 CAMARA_UBICACION="Zona 3 - Patio" python camara_servidor.py
+"""
+
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+import analizador
+from analizador import init_db
+from camara_vivo import FRAME_INTERVAL, MODO_DEBUG, PipelineCamara, dibujar_detecciones
+from detectores import obtener_detector, estadisticas_llamadas_vision
+from escritor_alertas import obtener_escritor, detener_escritores
+from supervisor_camaras import FuenteVideo
+
+# ------------------ CONFIGURACIÓN ------------------ #
+CAMARA_FUENTE = os.environ.get('CAMARA_FUENTE', '0')  # Índice de dispositivo, URL RTSP/HTTP o archivo
+CAMARA_UBICACION = os.environ.get('CAMARA_UBICACION', 'Cámara en Vivo')
+CAMARA_ESPEJO = os.environ.get('CAMARA_ESPEJO', '0') == '1'  # Voltear como en la webcam interactiva
+CAMARA_CONTROL_PUERTO = int(os.environ.get('CAMARA_CONTROL_PUERTO', 8090))  # 0 = sin API de control
+CAMARA_LOG_FORMATO = os.environ.get('CAMARA_LOG_FORMATO', 'json')  # 'json' o 'texto'
+CAMARA_INTERVALO_LOG = float(os.environ.get('CAMARA_INTERVALO_LOG', 60))  # Segundos entre registros de estado
+CAMARA_PID_PATH = os.environ.get('CAMARA_PID_PATH', '')  # Archivo PID opcional
+CAMARA_ESPERA_APAGADO = float(os.environ.get('CAMARA_ESPERA_APAGADO', 30))  # Segundos para terminar el análisis en curso
+CAPTURAS_DIR = os.environ.get('CAMARA_CAPTURAS_DIR', 'capturas')
+
+_lock_log = threading.Lock()
+
+
+def registrar_evento(evento, **campos):
+    """
+    Escribe un evento en la salida estándar (una línea JSON, o texto legible).
+
+    Args:
+        evento: Nombre del evento ('inicio', 'alerta', 'estado', ...)
+        **campos: Datos del evento; deben ser serializables a JSON
+    """
+    if CAMARA_LOG_FORMATO == 'json':
+        linea = json.dumps(dict(ts=datetime.now().isoformat(timespec='milliseconds'), evento=evento, **campos),
+                           ensure_ascii=False, default=str)
+    else:
+        detalle = ' '.join(f"{clave}={valor}" for clave, valor in campos.items())
+        linea = f"[CAMARA] {datetime.now():%H:%M:%S} {evento} {detalle}".rstrip()
+    with _lock_log:
+        print(linea, flush=True)
+
+
+class ServicioCamara:
+    """Pipeline de una cámara sin ventana, controlado por señales y por la API local."""
+
+    def __init__(self, fuente=CAMARA_FUENTE, ubicacion=CAMARA_UBICACION, puerto_control=CAMARA_CONTROL_PUERTO):
+        self.fuente = int(fuente) if str(fuente).isdigit() else fuente
+        self.ubicacion = ubicacion
+        self.puerto_control = puerto_control
+        self.pipeline = None
+        self.cap = None
+        self._servidor = None
+        self._detener = threading.Event()
+        self._inicio = time.monotonic()
+
+    # ---- Acciones (las mismas que las teclas de camara_vivo.py) ---- #
+
+    def capturar(self):
+        """Guarda el último frame con sus detecciones dibujadas (tecla 's')."""
+        frame, frame_id, detecciones = self.pipeline.estado()
+        if frame is None:
+            return None
+        frame = frame.copy()
+        altura_frame, ancho_frame = frame.shape[:2]
+        dibujar_detecciones(frame, detecciones, altura_frame, ancho_frame)
+        os.makedirs(CAPTURAS_DIR, exist_ok=True)
+        ruta = os.path.join(CAPTURAS_DIR, f"captura_{datetime.now():%Y%m%d_%H%M%S_%f}.jpg")
+        cv2.imwrite(ruta, frame)
+        registrar_evento('captura', ruta=ruta, frame=frame_id)
+        return ruta
+
+    def alternar_debug(self):
+        """Activa o desactiva el modo debug (tecla 'd')."""
+        self.pipeline.modo_debug = not self.pipeline.modo_debug
+        registrar_evento('debug', activo=self.pipeline.modo_debug)
+        return self.pipeline.modo_debug
+
+    def detener(self):
+        """Pide la parada (tecla 'q'); el apagado ocurre en el hilo principal."""
+        self._detener.set()
+
+    def estado(self):
+        """
+        Devuelve el estado del pipeline.
+
+        Returns:
+            Diccionario con tasas, latencias, errores, movimiento y llamadas al detector
+        """
+        tasas = self.pipeline.tasas() if self.pipeline else {}
+        return {
+            'ubicacion': self.ubicacion,
+            'fuente': str(self.fuente),
+            'activo': bool(self.pipeline and self.pipeline.activo and not self._detener.is_set()),
+            'segundos_activo': round(time.monotonic() - self._inicio, 1),
+            'modo_debug': bool(self.pipeline and self.pipeline.modo_debug),
+            'pipeline': tasas,
+            'movimiento': self.pipeline.puerta.estadisticas() if self.pipeline else {},
+            'llamadas_detector': estadisticas_llamadas_vision(),
+            'escritor': obtener_escritor(analizador.DB_PATH).estadisticas()
+        }
+
+    # ---- Señales y API local ---- #
+
+    def _instalar_senales(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.detener())
+        signal.signal(signal.SIGINT, lambda *_: self.detener())
+        if hasattr(signal, 'SIGUSR1'):  # No existen en Windows
+            # Las acciones corren en otro hilo: el manejador no debe tomar locks que el hilo principal tenga
+            def en_hilo(accion):
+                return lambda *_: threading.Thread(target=accion, daemon=True).start()
+
+            signal.signal(signal.SIGUSR1, en_hilo(self.capturar))
+            signal.signal(signal.SIGUSR2, en_hilo(self.alternar_debug))
+            signal.signal(signal.SIGHUP, en_hilo(lambda: registrar_evento('estado', **self.estado())))
+
+    def _iniciar_control(self):
+        if not self.puerto_control:
+            return
+        servicio = self
+
+        class ManejadorControl(BaseHTTPRequestHandler):
+            def _responder(self, codigo, cuerpo):
+                datos = json.dumps(cuerpo, ensure_ascii=False, default=str).encode('utf-8')
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def do_GET(self):
+                if self.path == '/estado':
+                    self._responder(200, servicio.estado())
+                else:
+                    self._responder(404, {'error': 'No encontrado'})
+
+            def do_POST(self):
+                if self.path == '/capturar':
+                    ruta = servicio.capturar()
+                    self._responder(200 if ruta else 409, {'ruta': ruta} if ruta else {'error': 'Sin frames todavía'})
+                elif self.path == '/debug':
+                    self._responder(200, {'modo_debug': servicio.alternar_debug()})
+                elif self.path == '/detener':
+                    self._responder(202, {'estado': 'deteniendo'})
+                    servicio.detener()
+                else:
+                    self._responder(404, {'error': 'No encontrado'})
+
+            def log_message(self, formato, *args):
+                pass  # Las acciones se registran como eventos
+
+        # Solo en localhost: la API no tiene autenticación
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', self.puerto_control), ManejadorControl)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="camara-control", daemon=True).start()
+
+    # ---- Ciclo de vida ---- #
+
+    def ejecutar(self):
+        """Arranca la cámara y bloquea hasta recibir la orden de parada o perder la fuente."""
+        init_db()
+        detector = obtener_detector()
+        detector.calentar(en_segundo_plano=False)
+        intervalo = FRAME_INTERVAL if FRAME_INTERVAL is not None else detector.intervalo_camara
+
+        self.cap = FuenteVideo(self.fuente)
+        if not self.cap.isOpened():
+            registrar_evento('error', mensaje=f"No se pudo abrir la fuente {self.fuente}")
+            return 1
+
+        def guardar(**alerta):
+            futuro = analizador.guardar_alerta(**alerta)
+            registrar_evento('alerta', tipo=alerta['tipo'], objeto=alerta['objeto'],
+                             confianza=round(alerta['confianza'], 3), imagen=alerta['imagen'],
+                             ubicacion=alerta['ubicacion'])
+            return futuro
+
+        self.pipeline = PipelineCamara(self.cap, detector, intervalo, modo_debug=MODO_DEBUG,
+                                       ubicacion=self.ubicacion, guardar=guardar, espejo=CAMARA_ESPEJO)
+        self._instalar_senales()
+        self._iniciar_control()
+        self.pipeline.iniciar()
+        registrar_evento('inicio', pid=os.getpid(), fuente=str(self.fuente), ubicacion=self.ubicacion,
+                         detector=detector.nombre, intervalo=intervalo,
+                         control=f"127.0.0.1:{self.puerto_control}" if self.puerto_control else None)
+
+        ultimo_log = time.monotonic()
+        while self.pipeline.activo and not self._detener.wait(1.0):
+            if time.monotonic() - ultimo_log >= CAMARA_INTERVALO_LOG:
+                registrar_evento('estado', **self.estado())
+                ultimo_log = time.monotonic()
+
+        return self.apagar()
+
+    def apagar(self):
+        """Detiene el pipeline, espera el análisis en curso y vacía las alertas pendientes."""
+        registrar_evento('deteniendo', motivo=self.pipeline.error or 'orden de parada')
+        if self._servidor is not None:
+            self._servidor.shutdown()
+        # detener() espera al hilo de análisis: el frame y las alertas en curso se guardan
+        self.pipeline.detener(timeout=CAMARA_ESPERA_APAGADO)
+        self.cap.release()
+        pendientes = obtener_escritor(analizador.DB_PATH).estadisticas()['pendientes']
+        detener_escritores()
+        registrar_evento('detenido', alertas_pendientes_vaciadas=pendientes, **self.pipeline.tasas())
+        return 1 if self.pipeline.error else 0
+
+
+def main():
+    if CAMARA_PID_PATH:
+        with open(CAMARA_PID_PATH, 'w') as f:
+            f.write(str(os.getpid()))
+    try:
+        codigo = ServicioCamara().ejecutar()
+    finally:
+        if CAMARA_PID_PATH and os.path.exists(CAMARA_PID_PATH):
+            os.remove(CAMARA_PID_PATH)
+    sys.exit(codigo)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,73 @@
 import os
+import threading
+import time
+from collections import deque
 import cv2
-import numpy as np
 from datetime import datetime
-from google.cloud import vision
 
 # Ruta al JSON de credenciales
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'hackaton-segiridad-500d3a7a5a64.json'
 
 # Importar funciones del analizador
-from analizador import init_db, guardar_alerta
+from analizador import init_db, guardar_alerta, actualizar_alerta
+from detectores import obtener_detector, estadisticas_llamadas_vision
+from clasificador import Clasificador
+from deteccion_fuego import FUEGO_CONFIRMACION, SIN_FUEGO, ConfirmadorFuego, DetectorFuegoColor
+from deteccion_fuego import detectar_fuego_por_color
+from overlays import CapaOverlay
+from movimiento import crear_puerta
+from deduplicador import DEDUP_ACTIVO, DeduplicadorAlertas
+from seguimiento import SEGUIMIENTO_ACTIVO, SeguidorObjetos
+from grabador_clips import CLIPS_ACTIVOS, CLIPS_TIPOS, GrabadorClips
+import overlays
 
 # ------------------ CONFIGURACIÓN ------------------ #
 DB_PATH = "alertas.db"
-FRAME_INTERVAL = 2  # Analizar cada N segundos (para no saturar la API)
+# Analizar cada N segundos; por defecto el intervalo sugerido por el detector
+# (2 s con Google Vision para no saturar la API, fracciones de segundo con ONNX local)
+FRAME_INTERVAL = float(os.environ['CAMARA_FRAME_INTERVAL']) if os.environ.get('CAMARA_FRAME_INTERVAL') else None
 UMBRAL_CONFIANZA_INCENDIO = 0.50  # Reducido para detectar llamas pequeñas
 UMBRAL_CONFIANZA_ARMA = 0.50
 UMBRAL_CONFIANZA_VEHICULO = 0.60
 UMBRAL_CONFIANZA_AGRESION = 0.50  # Umbral para detectar agresión (reducido para mayor sensibilidad)
 MODO_DEBUG = False  # Activar para ver todas las etiquetas detectadas
 
+# Categoría del clasificador que controla cada umbral de cámara
+CATEGORIAS_UMBRAL = {
+    'arma': 'arma',
+    'vehiculo': 'vehiculo',
+    'incendio': 'incendio_ampliado',
+    'agresion': 'agresion_directa',
+}
+
+
+def crear_clasificador(umbrales=None):
+    """
+    Crea el clasificador de una cámara.
+
+    Args:
+        umbrales: Umbrales por tipo ('arma', 'vehiculo', 'incendio', 'agresion');
+                  los que falten toman los valores de este módulo (agresión mantiene
+                  el umbral propio del clasificador)
+
+    Returns:
+        Clasificador compilado con esos umbrales
+    """
+    combinados = {
+        'arma': UMBRAL_CONFIANZA_ARMA,
+        'vehiculo': UMBRAL_CONFIANZA_VEHICULO,
+        'incendio': UMBRAL_CONFIANZA_INCENDIO,
+    }
+    combinados.update(umbrales or {})
+    desconocidos = set(combinados) - set(CATEGORIAS_UMBRAL)
+    if desconocidos:
+        raise ValueError(f"Umbrales desconocidos: {', '.join(sorted(desconocidos))}")
+    return Clasificador(umbrales={CATEGORIAS_UMBRAL[tipo]: float(valor) for tipo, valor in combinados.items()})
+
+
+# Clasificador de etiquetas con los umbrales de la cámara (compilado una sola vez)
+CLASIFICADOR = crear_clasificador()
+
 # Colores para dibujar en el video
 COLORES = {
     'arma': (0, 0, 255),        # Rojo (BGR)
@@ -27,285 +76,144 @@ COLORES = {
     'agresion': (255, 0, 255),  # Magenta
     'persona': (0, 255, 0)       # Verde
 }
+CAPA_OVERLAY = CapaOverlay(COLORES)
 
 # ------------------ FUNCIONES DE DETECCIÓN ------------------ #
 
-def detectar_fuego_por_color(frame_rgb, umbral_pixeles=150, umbral_porcentaje=0.3):
-    """
-    Detecta fuego analizando colores rojo/naranja/amarillo brillantes en el frame.
-    Versión balanceada: detecta fuego real pero evita falsos positivos.
-    
-    Args:
-        frame_rgb: Frame en formato RGB
-        umbral_pixeles: Número mínimo de píxeles de color fuego (ajustado para llamas pequeñas)
-        umbral_porcentaje: Porcentaje mínimo del frame que debe ser fuego
-    
-    Returns:
-        (detectado, porcentaje, bbox) o (False, 0, None)
-    """
-    # Convertir RGB a HSV para mejor detección de color
-    hsv = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2HSV)
-    
-    # Rangos de color balanceados: detectan fuego real pero filtran piel/objetos amarillos
-    # Saturación y brillo moderados para detectar llamas pequeñas
-    
-    # Rojo brillante (fuego intenso)
-    lower_red1 = np.array([0, 120, 180])  # Saturación y brillo moderados
-    upper_red1 = np.array([10, 255, 255])
-    lower_red2 = np.array([170, 120, 180])
-    upper_red2 = np.array([180, 255, 255])
-    
-    # Naranja brillante (llamas)
-    lower_orange = np.array([10, 120, 180])  # Saturación y brillo moderados
-    upper_orange = np.array([25, 255, 255])
-    
-    # Amarillo brillante (llamas intensas)
-    lower_yellow = np.array([25, 120, 180])  # Saturación y brillo moderados
-    upper_yellow = np.array([35, 255, 255])
-    
-    # Crear máscaras
-    mask_red1 = cv2.inRange(hsv, lower_red1, upper_red1)
-    mask_red2 = cv2.inRange(hsv, lower_red2, upper_red2)
-    mask_orange = cv2.inRange(hsv, lower_orange, upper_orange)
-    mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow)
-    
-    # Combinar máscaras
-    mask_fuego = cv2.bitwise_or(mask_red1, mask_red2)
-    mask_fuego = cv2.bitwise_or(mask_fuego, mask_orange)
-    mask_fuego = cv2.bitwise_or(mask_fuego, mask_yellow)
-    
-    # Aplicar filtro morfológico para eliminar ruido
-    kernel = np.ones((5, 5), np.uint8)
-    mask_fuego = cv2.morphologyEx(mask_fuego, cv2.MORPH_CLOSE, kernel)
-    mask_fuego = cv2.morphologyEx(mask_fuego, cv2.MORPH_OPEN, kernel)
-    
-    # Contar píxeles de fuego
-    pixeles_fuego = cv2.countNonZero(mask_fuego)
-    total_pixeles = frame_rgb.shape[0] * frame_rgb.shape[1]
-    porcentaje = (pixeles_fuego / total_pixeles) * 100
-    
-    # Validaciones balanceadas: detecta fuego real pero evita ruido
-    # 1. Debe haber suficientes píxeles
-    # 2. Debe ser al menos un porcentaje mínimo del frame
-    # 3. El área detectada debe ser razonable (no muy pequeña)
-    if pixeles_fuego >= umbral_pixeles and porcentaje >= umbral_porcentaje:
-        # Encontrar contornos
-        contours, _ = cv2.findContours(mask_fuego, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if contours:
-            # Encontrar el contorno más grande
-            largest_contour = max(contours, key=cv2.contourArea)
-            area = cv2.contourArea(largest_contour)
-            
-            # Validar que el área sea razonable (ajustado para llamas pequeñas)
-            if area < 300:  # Área mínima de 300 píxeles (reducido para detectar llamas pequeñas)
-                return False, porcentaje, None
-            
-            x, y, w, h = cv2.boundingRect(largest_contour)
-            
-            # Validar que el bounding box tenga un tamaño razonable (ajustado para llamas pequeñas)
-            if w < 20 or h < 20:  # Mínimo 20x20 píxeles (reducido para detectar llamas pequeñas)
-                return False, porcentaje, None
-            
-            # Normalizar coordenadas
-            altura, ancho = frame_rgb.shape[:2]
-            x1_norm = x / ancho
-            y1_norm = y / altura
-            x2_norm = (x + w) / ancho
-            y2_norm = (y + h) / altura
-            
-            return True, porcentaje, (x1_norm, y1_norm, x2_norm, y2_norm)
-    
-    return False, porcentaje, None
-
-
-def detectar_amenazas_frame(cliente, frame_rgb, modo_debug=False):
+def detectar_amenazas_frame(detector, frame_rgb, modo_debug=False, clasificador=None, estado_fuego=None):
     """
     Detecta amenazas en un frame de video.
     
     Args:
-        cliente: Cliente de Google Vision
+        detector: Backend de detección (detectores.obtener_detector())
         frame_rgb: Frame en formato RGB
         modo_debug: Si True, muestra información de debug
+        clasificador: Clasificador con los umbrales de la cámara (CLASIFICADOR por defecto)
+        estado_fuego: EstadoFuego de la confirmación temporal; sin él se usa solo el color
+                      de este frame
     
     Returns:
         Lista de detecciones: [(tipo, objeto, confianza, x1, y1, x2, y2), ...]
     """
     detecciones = []
+    clasificador = clasificador or CLASIFICADOR
     
-    # Convertir frame a formato para Google Vision
-    _, buffer = cv2.imencode('.jpg', frame_rgb)
-    content = buffer.tobytes()
-    
-    image = vision.Image(content=content)
+    # Preparar el frame para el backend (JPEG reducido en Vision, array RGB en ONNX)
+    entrada, _ = detector.preparar_frame(frame_rgb)
     
-    # Detección de objetos
-    respuesta = cliente.object_localization(image=image)
+    # Una sola detección: objetos + etiquetas (el backend ONNX no devuelve etiquetas)
+    objetos, etiquetas, _ = detector.detectar(entrada)
     
-    OBJETOS_PELIGROSOS = [
-        "gun", "knife", "weapon", "firearm", "rifle", "pistol", "sword",
-        "blade", "cutting tool", "kitchen knife", "dagger", "machete",
-        "scalpel", "razor", "bayonet"
-    ]
-    VEHICULOS_SOSPECHOSOS = ["truck", "van", "suv", "vehicle", "car", "automobile"]
-    OBJETOS_FUEGO = ["lighter", "match", "torch", "candle", "flame"]  # Objetos relacionados con fuego
-    
-    # Lista de objetos que NO queremos detectar (falsos positivos)
-    OBJETOS_IGNORAR = [
-        "finger", "thumb", "nail", "hand", "glove", "medical glove",
-        "safety glove", "plastic", "person", "human", "skin", "science",
-        "medical", "body part", "anatomy"
-    ]
+    objetos_clasificados = clasificador.clasificar([(nombre, score) for nombre, score, *_ in objetos])
+    etiquetas_clasificadas = clasificador.clasificar(etiquetas)
     
     # Procesar objetos detectados
-    for obj in respuesta.localized_object_annotations:
-        nombre = obj.name.lower()
-        score = obj.score
-        box = obj.bounding_poly.normalized_vertices
-        
-        if len(box) < 4:
+    for (nombre, score, x1, y1, x2, y2), clasificado in zip(objetos, objetos_clasificados):
+        if x1 is None:
             continue
-            
-        x1, y1 = box[0].x, box[0].y
-        x2, y2 = box[2].x, box[2].y
         
         # Ignorar objetos no relevantes
-        if any(ignorar in nombre for ignorar in OBJETOS_IGNORAR):
+        if 'ignorar_objeto' in clasificado.coincidencias:
             if modo_debug:
                 print(f"[DEBUG] Objeto ignorado: {nombre} (score: {score:.3f})")
             continue
         
         # Detectar armas
-        for peligro in OBJETOS_PELIGROSOS:
-            if peligro in nombre and score >= UMBRAL_CONFIANZA_ARMA:
-                detecciones.append(("arma", nombre, score, x1, y1, x2, y2))
-                break
+        if 'arma' in clasificado.activas:
+            detecciones.append(("arma", nombre, score, x1, y1, x2, y2))
         
         # Detectar vehículos
-        for vehiculo in VEHICULOS_SOSPECHOSOS:
-            if vehiculo in nombre and score >= UMBRAL_CONFIANZA_VEHICULO:
-                detecciones.append(("vehiculo", nombre, score, x1, y1, x2, y2))
-                break
+        if 'vehiculo' in clasificado.activas:
+            detecciones.append(("vehiculo", nombre, score, x1, y1, x2, y2))
         
         # Detectar objetos relacionados con fuego (encendedores, velas, etc.)
-        for objeto_fuego in OBJETOS_FUEGO:
-            if objeto_fuego in nombre and score >= 0.55:
-                # Si detecta un encendedor o similar, también es alerta de incendio
-                detecciones.append(("incendio", f"{nombre} (objeto)", score, x1, y1, x2, y2))
-                break
+        if 'objeto_fuego' in clasificado.activas:
+            # Si detecta un encendedor o similar, también es alerta de incendio
+            detecciones.append(("incendio", f"{nombre} (objeto)", score, x1, y1, x2, y2))
     
     # ============================================
     # DETECCIÓN DE INCENDIO - MÉTODO 1: Por color
     # ============================================
-    # Usar umbrales balanceados: detecta fuego real pero evita falsos positivos
-    fuego_por_color, porcentaje_color, bbox_color = detectar_fuego_por_color(
-        frame_rgb, 
-        umbral_pixeles=150,  # Ajustado para detectar llamas pequeñas (encendedor)
-        umbral_porcentaje=0.3  # Mínimo 0.3% del frame (más sensible)
-    )
-    
-    if fuego_por_color and porcentaje_color >= 0.3:  # Si es al menos 0.3% del frame
-        # Si detectamos fuego por color, agregarlo a las detecciones
-        detecciones.append(("incendio", f"fuego_detectado_por_color ({porcentaje_color:.1f}%)", 
-                           min(0.95, porcentaje_color / 100.0), 
-                           bbox_color[0], bbox_color[1], bbox_color[2], bbox_color[3]))
-        if modo_debug:
-            print(f"[DEBUG] ✅ Fuego detectado por COLOR: {porcentaje_color:.2f}% del frame")
-    elif modo_debug and porcentaje_color > 0.1:
-        print(f"[DEBUG] Fuego por color descartado (muy poco): {porcentaje_color:.2f}%")
+    if estado_fuego is not None:
+        # Confirmación temporal: el color de fuego debe persistir y parpadear en varios frames
+        if estado_fuego.confirmado:
+            detecciones.append(("incendio", f"fuego_confirmado ({estado_fuego.porcentaje:.1f}%, "
+                                            f"parpadeo {estado_fuego.parpadeo:.2f})",
+                               estado_fuego.confianza, *estado_fuego.bbox))
+            if modo_debug:
+                print(f"[DEBUG] ✅ Fuego confirmado: persistencia {estado_fuego.persistencia:.2f}, "
+                      f"parpadeo {estado_fuego.parpadeo:.2f}, cambio de forma {estado_fuego.cambio_forma:.2f}")
+        elif modo_debug and estado_fuego.persistencia > 0:
+            print(f"[DEBUG] Fuego por color sin confirmar: persistencia {estado_fuego.persistencia:.2f}, "
+                  f"parpadeo {estado_fuego.parpadeo:.2f}")
+    else:
+        # Usar umbrales balanceados: detecta fuego real pero evita falsos positivos
+        fuego_por_color, porcentaje_color, bbox_color = detectar_fuego_por_color(
+            frame_rgb, 
+            umbral_pixeles=150,  # Ajustado para detectar llamas pequeñas (encendedor)
+            umbral_porcentaje=0.3  # Mínimo 0.3% del frame (más sensible)
+        )
     
-    # ============================================
-    # DETECCIÓN DE INCENDIO - MÉTODO 2: Google Vision Labels
-    # ============================================
-    resp_labels = cliente.label_detection(image=image)
-    PATRONES_INCENDIO = [
-        "fire", "flames", "flame", "smoke", "smoking",
-        "wildfire", "conflagration", "explosion", "burning",
-        "lighter", "match", "torch", "candle", "spark",
-        "ignition", "combustion", "blaze", "ember", "flame"
-    ]
-    
-    # Patrones de agresión directos
-    PATRONES_AGRESION_DIRECTOS = [
-        "violence", "aggression", "aggressive", "fight", "fighting",
-        "assault", "attack", "conflict", "combat", "brawl",
-        "altercation", "struggle", "hostility", "hostile",
-        "physical violence", "physical altercation", "physical conflict",
-        "punch", "punching", "hitting", "striking", "kicking",
-        "wrestling", "grappling", "scuffle", "tussle", "melee"
-    ]
-    
-    PATRONES_POSTURAS_AGRESIVAS = [
-        "lying", "lying down", "on ground", "ground", "floor",
-        "standing", "over", "above", "leaning", "bending"
-    ]
+        if fuego_por_color and porcentaje_color >= 0.3:  # Si es al menos 0.3% del frame
+            # Si detectamos fuego por color, agregarlo a las detecciones
+            detecciones.append(("incendio", f"fuego_detectado_por_color ({porcentaje_color:.1f}%)", 
+                               min(0.95, porcentaje_color / 100.0), 
+                               bbox_color[0], bbox_color[1], bbox_color[2], bbox_color[3]))
+            if modo_debug:
+                print(f"[DEBUG] ✅ Fuego detectado por COLOR: {porcentaje_color:.2f}% del frame")
+        elif modo_debug and porcentaje_color > 0.1:
+            print(f"[DEBUG] Fuego por color descartado (muy poco): {porcentaje_color:.2f}%")
     
     # Contar personas detectadas y sus posturas
     personas_detectadas = 0
     personas_en_suelo = 0
     personas_de_pie = 0
     
-    for obj in respuesta.localized_object_annotations:
-        nombre_obj = obj.name.lower()
-        if "person" in nombre_obj:
+    for (_, _, _, obj_y1, _, obj_y2), clasificado in zip(objetos, objetos_clasificados):
+        if 'persona' in clasificado.coincidencias:
             personas_detectadas += 1
             # Intentar detectar postura
-            box = obj.bounding_poly.normalized_vertices
-            if len(box) >= 4:
-                posicion_y = (box[0].y + box[2].y) / 2
+            if obj_y1 is not None:
+                posicion_y = (obj_y1 + obj_y2) / 2
                 # Si está en la parte inferior de la imagen, probablemente está en el suelo
                 if posicion_y > 0.7:
                     personas_en_suelo += 1
                 else:
                     personas_de_pie += 1
     
-    # Lista de etiquetas a ignorar (falsos positivos)
-    ETIQUETAS_IGNORAR = [
-        "finger", "thumb", "nail", "hand", "glove", "medical",
-        "plastic", "science", "anatomy", "body part"
-    ]
-    
     # Modo debug: mostrar todas las etiquetas detectadas
     if modo_debug:
         print("\n[DEBUG] Etiquetas detectadas:")
-        for label in resp_labels.label_annotations[:10]:  # Primeras 10
-            print(f"  - {label.description}: {label.score:.3f}")
+        for desc, score in etiquetas[:10]:  # Primeras 10
+            print(f"  - {desc}: {score:.3f}")
     
-    for label in resp_labels.label_annotations:
-        desc = label.description.lower()
-        score = label.score
-        
+    # ============================================
+    # DETECCIÓN DE AGRESIÓN (MEJORADA)
+    # ============================================
+    for desc, score, encontradas, activas in etiquetas_clasificadas:
         # Ignorar etiquetas no relevantes
-        if any(ignorar in desc for ignorar in ETIQUETAS_IGNORAR):
+        if 'ignorar_etiqueta' in encontradas:
             continue
         
-        # ============================================
-        # DETECCIÓN DE AGRESIÓN (MEJORADA)
-        # ============================================
         # Estrategia 1: Detección directa (umbral bajo: 0.40)
-        if score >= 0.40:
-            for palabra in PATRONES_AGRESION_DIRECTOS:
-                if palabra in desc:
-                    detecciones.append(("agresion", desc, score, 0.0, 0.0, 1.0, 1.0))
-                    if modo_debug:
-                        print(f"[DEBUG] ✅ Agresión detectada: {desc} (confianza: {score:.3f}, personas: {personas_detectadas})")
-                    break
+        if 'agresion_directa' in activas:
+            detecciones.append(("agresion", desc, score, 0.0, 0.0, 1.0, 1.0))
+            if modo_debug:
+                print(f"[DEBUG] ✅ Agresión detectada: {desc} (confianza: {score:.3f}, personas: {personas_detectadas})")
         
         # Estrategia 2: Múltiples personas con contexto de conflicto
-        if personas_detectadas >= 2 and score >= 0.35:
-            palabras_conflicto = ["struggle", "conflict", "tension", "action", "drama", "movement", "motion"]
-            if any(palabra in desc for palabra in palabras_conflicto):
-                # Evitar falsos positivos de deportes
-                if "sport" not in desc and "competition" not in desc and "game" not in desc:
-                    detecciones.append(("agresion", f"{desc} (múltiples personas)", min(0.75, score + 0.15), 0.0, 0.0, 1.0, 1.0))
-                    if modo_debug:
-                        print(f"[DEBUG] ✅ Agresión detectada (múltiples personas): {desc} (confianza: {min(0.75, score + 0.15):.3f})")
+        if personas_detectadas >= 2 and 'conflicto' in activas:
+            # Evitar falsos positivos de deportes
+            if 'deporte' not in encontradas:
+                detecciones.append(("agresion", f"{desc} (múltiples personas)", min(0.75, score + 0.15), 0.0, 0.0, 1.0, 1.0))
+                if modo_debug:
+                    print(f"[DEBUG] ✅ Agresión detectada (múltiples personas): {desc} (confianza: {min(0.75, score + 0.15):.3f})")
         
         # Estrategia 3: Posturas agresivas
-        if any(palabra in desc for palabra in PATRONES_POSTURAS_AGRESIVAS) and score >= 0.40:
-            if personas_detectadas >= 2:
-                detecciones.append(("agresion", f"{desc} (postura agresiva)", min(0.70, score + 0.1), 0.0, 0.0, 1.0, 1.0))
-                if modo_debug:
-                    print(f"[DEBUG] ✅ Agresión detectada (postura): {desc} (confianza: {min(0.70, score + 0.1):.3f})")
+        if 'postura' in activas and personas_detectadas >= 2:
+            detecciones.append(("agresion", f"{desc} (postura agresiva)", min(0.70, score + 0.1), 0.0, 0.0, 1.0, 1.0))
+            if modo_debug:
+                print(f"[DEBUG] ✅ Agresión detectada (postura): {desc} (confianza: {min(0.70, score + 0.1):.3f})")
     
     # Estrategia 4: Detección por posturas (persona en suelo + persona de pie)
     if personas_en_suelo >= 1 and personas_de_pie >= 1:
@@ -315,29 +223,21 @@ def detectar_amenazas_frame(cliente, frame_rgb, modo_debug=False):
             print(f"[DEBUG] ✅ Agresión detectada (posturas): persona en suelo ({personas_en_suelo}) + persona de pie ({personas_de_pie})")
     
     # ============================================
-    # DETECCIÓN DE INCENDIO
+    # DETECCIÓN DE INCENDIO - MÉTODO 2: Google Vision Labels
     # ============================================
-    for label in resp_labels.label_annotations:
-        desc = label.description.lower()
-        score = label.score
-        
+    for desc, score, encontradas, activas in etiquetas_clasificadas:
         # Ignorar etiquetas no relevantes
-        if any(ignorar in desc for ignorar in ETIQUETAS_IGNORAR):
+        if 'ignorar_etiqueta' in encontradas:
             continue
         
-        # Bajar umbral para detectar llamas pequeñas
-        if score < UMBRAL_CONFIANZA_INCENDIO:
-            if modo_debug and any(palabra in desc for palabra in PATRONES_INCENDIO):
-                print(f"[DEBUG] Incendio descartado (confianza baja): {desc} ({score:.3f})")
-            continue
-        
-        for palabra in PATRONES_INCENDIO:
-            if palabra in desc:
-                # Para incendios no hay bounding box específico, usamos toda la imagen
-                detecciones.append(("incendio", desc, score, 0.0, 0.0, 1.0, 1.0))
-                if modo_debug:
-                    print(f"[DEBUG] ✅ Incendio detectado por LABEL: {desc} (confianza: {score:.3f})")
-                break
+        if 'incendio_ampliado' in activas:
+            # Para incendios no hay bounding box específico, usamos toda la imagen
+            detecciones.append(("incendio", desc, score, 0.0, 0.0, 1.0, 1.0))
+            if modo_debug:
+                print(f"[DEBUG] ✅ Incendio detectado por LABEL: {desc} (confianza: {score:.3f})")
+        elif modo_debug and 'incendio_ampliado' in encontradas:
+            # Bajar umbral para detectar llamas pequeñas
+            print(f"[DEBUG] Incendio descartado (confianza baja): {desc} ({score:.3f})")
     
     return detecciones
 
@@ -345,74 +245,18 @@ def detectar_amenazas_frame(cliente, frame_rgb, modo_debug=False):
 def dibujar_detecciones(frame, detecciones, altura_frame, ancho_frame):
     """
     Dibuja bounding boxes y etiquetas en el frame.
-    """
-    alerta_detectada = False
     
-    for tipo, objeto, confianza, x1, y1, x2, y2 in detecciones:
-        if x1 is None or y1 is None or x2 is None or y2 is None:
-            continue
-        
-        # Convertir coordenadas normalizadas a píxeles
-        x1_px = int(x1 * ancho_frame)
-        y1_px = int(y1 * altura_frame)
-        x2_px = int(x2 * ancho_frame)
-        y2_px = int(y2 * altura_frame)
-        
-        color = COLORES.get(tipo, (255, 255, 255))
-        
-        # Dibujar rectángulo
-        cv2.rectangle(frame, (x1_px, y1_px), (x2_px, y2_px), color, 3)
-        
-        # Preparar texto
-        etiqueta = f"{objeto} ({confianza:.2f})"
-        tipo_texto = tipo.upper()
-        
-        # Fondo para el texto
-        (text_width, text_height), baseline = cv2.getTextSize(
-            etiqueta, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-        )
-        
-        # Dibujar fondo del texto
-        cv2.rectangle(
-            frame,
-            (x1_px, y1_px - text_height - 10),
-            (x1_px + text_width + 10, y1_px),
-            color,
-            -1
-        )
-        
-        # Dibujar texto
-        cv2.putText(
-            frame,
-            etiqueta,
-            (x1_px + 5, y1_px - 5),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.6,
-            (255, 255, 255),
-            2
-        )
-        
-        # Indicador de alerta
-        if tipo in ['arma', 'incendio', 'agresion']:
-            alerta_detectada = True
-            cv2.putText(
-                frame,
-                f"ALERTA: {tipo_texto}",
-                (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1.0,
-                (0, 0, 255),
-                3
-            )
-    
-    return alerta_detectada
+    La capa de overlays se compone solo cuando cambian las detecciones; en el
+    resto de los frames se copian las etiquetas ya renderizadas.
+    """
+    return CAPA_OVERLAY.dibujar(frame, detecciones)
 
 
 def guardar_frame_con_alerta(frame, detecciones, ruta_base="alertas_camara"):
     """
     Guarda el frame cuando se detecta una alerta crítica.
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     ruta_imagen = f"{ruta_base}_{timestamp}.jpg"
     
     # Crear directorio si no existe
@@ -423,6 +267,398 @@ def guardar_frame_con_alerta(frame, detecciones, ruta_base="alertas_camara"):
     return ruta_completa
 
 
+# ------------------ PIPELINE DE CÁMARA ------------------ #
+
+class MedidorTasa:
+    """Cuenta eventos y calcula su tasa por segundo en una ventana reciente."""
+
+    def __init__(self, ventana=5.0):
+        self.ventana = ventana
+        self.total = 0
+        self._marcas = deque()
+        self._lock = threading.Lock()
+
+    def registrar(self):
+        ahora = time.monotonic()
+        with self._lock:
+            self.total += 1
+            self._marcas.append(ahora)
+            while self._marcas and ahora - self._marcas[0] > self.ventana:
+                self._marcas.popleft()
+
+    def tasa(self):
+        """Eventos por segundo en la última ventana."""
+        ahora = time.monotonic()
+        with self._lock:
+            recientes = [marca for marca in self._marcas if ahora - marca <= self.ventana]
+        if len(recientes) < 2:
+            return 0.0
+        return (len(recientes) - 1) / max(recientes[-1] - recientes[0], 1e-9)
+
+
+def procesar_alertas(frame, detecciones, ubicacion="Cámara en Vivo", guardar=guardar_alerta,
+                     ruta_base="alertas_camara", deduplicador=None, actualizar=actualizar_alerta, clips=None,
+                     capturado=None):
+    """
+    Guarda las alertas críticas de un ciclo de análisis y un solo frame de evidencia.
+
+    Con deduplicador, solo los incidentes nuevos generan alerta; los que siguen
+    a la vista actualizan la confianza de su alerta cuando mejora, y si no hay
+    nada nuevo ni mejor no se guarda nada.
+
+    Con grabador de clips, las alertas nuevas de CLIPS_TIPOS guardan además la
+    ruta del video de los segundos anteriores y posteriores (un clip por ciclo).
+
+    Args:
+        frame: Frame BGR en el que se detectaron las amenazas
+        detecciones: Lista de tuplas (tipo, objeto, confianza, x1, y1, x2, y2)
+        ubicacion: Ubicación de la cámara que se guarda con la alerta
+        guardar: Función que recibe los campos de la alerta (guardar_alerta por defecto)
+                 y devuelve una referencia a ella
+        ruta_base: Prefijo del nombre de los frames guardados
+        deduplicador: DeduplicadorAlertas de la cámara, o None para alertar cada detección
+        actualizar: Función (referencia, confianza, imagen, objeto) que actualiza una alerta guardada
+        clips: GrabadorClips de la cámara, o None para no guardar video
+        capturado: Momento (time.monotonic()) en que se capturó el frame; centra el clip
+                   en la captura y no en el fin del análisis (ahora por defecto)
+    """
+    criticas = [deteccion for deteccion in detecciones if deteccion[0] in ['arma', 'incendio', 'agresion']]
+    if not criticas:
+        return
+    
+    if deduplicador is None:
+        nuevas, mejoradas = [(None, deteccion) for deteccion in criticas], []
+    else:
+        nuevas, mejoradas = deduplicador.asociar(criticas)
+    if not nuevas and not mejoradas:
+        return
+    
+    # Un frame por ciclo, compartido por todas sus alertas
+    ruta_frame = guardar_frame_con_alerta(frame, detecciones, ruta_base)
+    
+    # Un clip por ciclo, solo si alguna alerta nueva lo necesita (se escribe en segundo plano)
+    ruta_clip = None
+    if clips is not None and any(deteccion[0] in CLIPS_TIPOS for _, deteccion in nuevas):
+        ruta_clip = clips.solicitar_clip(ruta_base, capturado)
+    
+    for incidente, (tipo, objeto, confianza, x1, y1, x2, y2) in nuevas:
+        if incidente is not None:
+            objeto, confianza = incidente.objeto, incidente.confianza
+        
+        # Guardar en BD
+        alerta = guardar(
+            imagen=ruta_frame,
+            tipo=tipo,
+            objeto=objeto,
+            confianza=confianza,
+            x1=x1 if x1 != 0.0 else None,
+            y1=y1 if y1 != 0.0 else None,
+            x2=x2 if x2 != 1.0 else None,
+            y2=y2 if y2 != 1.0 else None,
+            ubicacion=ubicacion,
+            clip=ruta_clip if tipo in CLIPS_TIPOS else None
+        )
+        if incidente is not None:
+            incidente.alerta = alerta
+        
+        # Mensaje especial para cuchillos
+        if "knife" in objeto.lower() or "blade" in objeto.lower():
+            print(f"\n🔪🚨 ALERTA: CUCHILLO DETECTADO 🚨🔪")
+            print(f"   Objeto: {objeto.upper()}")
+            print(f"   Confianza: {confianza:.2f}")
+        else:
+            print(f"\n🚨 ALERTA {tipo.upper()} DETECTADA: {objeto} (confianza: {confianza:.2f})")
+        print(f"   Frame guardado en: {ruta_frame}")
+        if ruta_clip and tipo in CLIPS_TIPOS:
+            print(f"   Clip: {ruta_clip} (se completa en {clips.despues:.0f} s)")
+    
+    for incidente, _ in mejoradas:
+        if incidente.alerta is not None:
+            actualizar(incidente.alerta, incidente.confianza, ruta_frame, incidente.objeto)
+            print(f"\n🔁 Incidente {incidente.tipo} #{incidente.id}: confianza actualizada a {incidente.confianza:.2f}")
+
+
+class PipelineCamara:
+    """
+    Captura, análisis y visualización desacoplados.
+
+    - El hilo de captura lee la cámara sin parar y conserva solo el frame más
+      reciente, así el buffer del driver nunca acumula frames viejos.
+    - El hilo de análisis toma el último frame cuando queda libre (y pasó el
+      intervalo mínimo), lo pasa por la puerta de movimiento y, si hay
+      actividad o venció el intervalo máximo, publica sus detecciones.
+    - La visualización (hilo principal, como exige cv2.imshow) lee el último
+      frame y las últimas detecciones sin esperar al detector.
+    - El hilo de fuego (FUEGO_CONFIRMACION) evalúa el color de fuego en cada
+      frame nuevo y lo confirma por persistencia y parpadeo; el análisis
+      usa ese estado en lugar del color de un solo frame.
+    - El hilo de seguimiento (SEGUIMIENTO_ACTIVO) mueve las cajas del último
+      análisis en cada frame con flujo óptico; si una pista deriva o se
+      pierde, el próximo análisis no espera a que haya movimiento suficiente.
+    - El hilo de clips (CLIPS_ACTIVOS) guarda los últimos segundos de video
+      comprimidos en memoria; las alertas de arma o agresión reservan un clip
+      que otro hilo codifica cuando pasan los segundos posteriores.
+
+    Con varias cámaras (supervisor_camaras.py) cada pipeline recibe su
+    ubicación, su clasificador, el destino de sus alertas y un presupuesto
+    compartido de llamadas al detector.
+    """
+
+    def __init__(self, cap, detector, intervalo, modo_debug=False, ubicacion="Cámara en Vivo",
+                 clasificador=None, guardar=guardar_alerta, presupuesto=None, espejo=True,
+                 ruta_base="alertas_camara", actualizar=actualizar_alerta):
+        self.cap = cap
+        self.detector = detector
+        self.intervalo = intervalo
+        self.puerta = crear_puerta(intervalo)
+        self.modo_debug = modo_debug
+        self.ubicacion = ubicacion
+        self.clasificador = clasificador or CLASIFICADOR
+        self.guardar = guardar
+        self.actualizar = actualizar
+        self.deduplicador = DeduplicadorAlertas() if DEDUP_ACTIVO else None
+        self.seguidor = SeguidorObjetos() if SEGUIMIENTO_ACTIVO else None
+        self.clips = GrabadorClips(ruta_base) if CLIPS_ACTIVOS else None
+        self.presupuesto = presupuesto  # Objeto con tomar() -> bool, o None sin límite
+        self.espejo = espejo
+        self.ruta_base = ruta_base
+        self.confirmador = ConfirmadorFuego(detector=DetectorFuegoColor(bgr=True)) if FUEGO_CONFIRMACION else None
+        self.error = None
+        self.errores = {'deteccion': 0, 'alertas': 0}
+        self.sin_presupuesto = 0
+        
+        self._lock = threading.Lock()
+        self._nuevo_frame = threading.Condition(self._lock)
+        self._frame = None
+        self._frame_id = 0
+        self._frame_tiempo = 0.0
+        self._detecciones = []
+        self._estado_fuego = SIN_FUEGO
+        self._detecciones_seguidas = []
+        self._reanalisis = threading.Event()  # Pedido del seguimiento: analizar sin esperar movimiento
+        self._detener = threading.Event()
+        self._hilos = []
+        
+        self.tasa_captura = MedidorTasa()
+        self.tasa_analisis = MedidorTasa()
+        self.tasa_visualizacion = MedidorTasa()
+        self.tasa_fuego = MedidorTasa()
+        self._ms_analisis = 0.0
+        self._ms_antiguedad = 0.0
+
+    def iniciar(self):
+        bucles = [(self._bucle_captura, "camara-captura"), (self._bucle_analisis, "camara-analisis")]
+        if self.confirmador is not None:
+            bucles.append((self._bucle_fuego, "camara-fuego"))
+        if self.seguidor is not None:
+            bucles.append((self._bucle_seguimiento, "camara-seguimiento"))
+        if self.clips is not None:
+            bucles.append((self._bucle_clips, "camara-clips"))
+        for objetivo, nombre in bucles:
+            hilo = threading.Thread(target=objetivo, name=nombre, daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self, timeout=5):
+        """Detiene los hilos; espera hasta `timeout` s a que termine el análisis en curso."""
+        self._detener.set()
+        with self._nuevo_frame:
+            self._nuevo_frame.notify_all()
+        for hilo in self._hilos:
+            hilo.join(timeout=timeout)
+        if self.clips is not None:
+            self.clips.detener(timeout=timeout)
+
+    @property
+    def activo(self):
+        return not self._detener.is_set()
+
+    def _bucle_captura(self):
+        while not self._detener.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                self.error = "No se pudo leer el frame"
+                self._detener.set()
+                break
+            
+            # Voltear frame horizontalmente (espejo de la webcam)
+            if self.espejo:
+                frame = cv2.flip(frame, 1)
+            with self._nuevo_frame:
+                self._frame = frame
+                self._frame_id += 1
+                self._frame_tiempo = time.monotonic()
+                self._nuevo_frame.notify_all()
+            self.tasa_captura.registrar()
+        
+        with self._nuevo_frame:
+            self._nuevo_frame.notify_all()
+
+    def _bucle_analisis(self):
+        ultimo_id = 0
+        ultima_analisis = 0.0
+        while not self._detener.is_set():
+            # Respetar el intervalo mínimo entre análisis (para no saturar la API)
+            espera = self.puerta.intervalo_min - (time.monotonic() - ultima_analisis)
+            if espera > 0 and self._detener.wait(espera):
+                break
+            
+            # Tomar el frame más reciente que aún no se evaluó
+            with self._nuevo_frame:
+                while self._frame_id == ultimo_id and not self._detener.is_set():
+                    self._nuevo_frame.wait(timeout=1)
+                if self._detener.is_set():
+                    break
+                frame, ultimo_id, capturado = self._frame, self._frame_id, self._frame_tiempo
+            
+            # Solo se analiza si hubo movimiento, lo pidió el seguimiento o venció el intervalo máximo
+            forzar = self._reanalisis.is_set()
+            analizar, motivo = self.puerta.debe_analizar(frame, forzar=forzar)
+            if not analizar:
+                continue
+            
+            # Presupuesto de llamadas compartido entre cámaras: sin cupo, se salta este frame
+            # sin contarlo como analizado y conservando el pedido del seguimiento
+            if self.presupuesto is not None and not self.presupuesto.tomar():
+                self.puerta.devolver(motivo)
+                with self._lock:
+                    self.sin_presupuesto += 1
+                continue
+            self._reanalisis.clear()
+            
+            ultima_analisis = time.monotonic()
+            try:
+                # Convertir BGR a RGB para el detector
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                with self._lock:
+                    estado_fuego = self._estado_fuego if self.confirmador is not None else None
+                detecciones = detectar_amenazas_frame(self.detector, frame_rgb, self.modo_debug, self.clasificador,
+                                                      estado_fuego)
+            except Exception as e:
+                print(f"\n⚠️ Error en detección ({self.ubicacion}): {e}")
+                with self._lock:
+                    self.errores['deteccion'] += 1
+                detecciones = []
+            
+            if self.seguidor is not None:
+                self.seguidor.sembrar(frame, detecciones)
+            with self._lock:
+                self._detecciones = detecciones
+                self._ms_analisis = (time.monotonic() - ultima_analisis) * 1000
+                self._ms_antiguedad = (ultima_analisis - capturado) * 1000
+            self.tasa_analisis.registrar()
+            
+            # Guardar alertas críticas en BD (el frame no se modifica al dibujar: se dibuja sobre una copia)
+            try:
+                procesar_alertas(frame, detecciones, self.ubicacion, self.guardar, self.ruta_base,
+                                 self.deduplicador, self.actualizar, self.clips, capturado)
+            except Exception as e:
+                print(f"\n⚠️ Error guardando alertas ({self.ubicacion}): {e}")
+                with self._lock:
+                    self.errores['alertas'] += 1
+
+    def _bucle_fuego(self):
+        ultimo_id = 0
+        while not self._detener.is_set():
+            with self._nuevo_frame:
+                while self._frame_id == ultimo_id and not self._detener.is_set():
+                    self._nuevo_frame.wait(timeout=1)
+                if self._detener.is_set():
+                    break
+                frame, ultimo_id = self._frame, self._frame_id
+            
+            try:
+                estado_fuego = self.confirmador.actualizar(frame)
+            except Exception as e:
+                print(f"\n⚠️ Error en confirmación de fuego ({self.ubicacion}): {e}")
+                with self._lock:
+                    self.errores['fuego'] = self.errores.get('fuego', 0) + 1
+                self._detener.wait(1)
+                continue
+            with self._lock:
+                self._estado_fuego = estado_fuego
+            self.tasa_fuego.registrar()
+
+    def _bucle_seguimiento(self):
+        ultimo_id = 0
+        while not self._detener.is_set():
+            with self._nuevo_frame:
+                while self._frame_id == ultimo_id and not self._detener.is_set():
+                    self._nuevo_frame.wait(timeout=1)
+                if self._detener.is_set():
+                    break
+                frame, ultimo_id = self._frame, self._frame_id
+            
+            try:
+                detecciones, pedir_analisis = self.seguidor.actualizar(frame)
+            except Exception as e:
+                print(f"\n⚠️ Error en seguimiento ({self.ubicacion}): {e}")
+                with self._lock:
+                    self.errores['seguimiento'] = self.errores.get('seguimiento', 0) + 1
+                self._detener.wait(1)
+                continue
+            with self._lock:
+                self._detecciones_seguidas = detecciones
+            if pedir_analisis:
+                self._reanalisis.set()
+
+    def _bucle_clips(self):
+        ultimo_id = 0
+        while not self._detener.is_set():
+            with self._nuevo_frame:
+                while self._frame_id == ultimo_id and not self._detener.is_set():
+                    self._nuevo_frame.wait(timeout=1)
+                if self._detener.is_set():
+                    break
+                frame, ultimo_id, capturado = self._frame, self._frame_id, self._frame_tiempo
+            
+            try:
+                self.clips.agregar(frame, capturado)
+            except Exception as e:
+                print(f"\n⚠️ Error guardando frames del clip ({self.ubicacion}): {e}")
+                with self._lock:
+                    self.errores['clips'] = self.errores.get('clips', 0) + 1
+                self._detener.wait(1)
+
+    def estado(self):
+        """
+        Devuelve el último frame capturado y las últimas detecciones.
+
+        Con seguimiento, las cajas son las del último análisis movidas hasta el
+        frame actual.
+
+        Returns:
+            (frame, frame_id, detecciones); frame es None hasta la primera captura
+        """
+        with self._lock:
+            detecciones = self._detecciones_seguidas if self.seguidor is not None else self._detecciones
+            return self._frame, self._frame_id, detecciones
+
+    def tasas(self):
+        """Devuelve las tasas de captura, análisis y visualización y la latencia del análisis."""
+        with self._lock:
+            ms_analisis, ms_antiguedad = self._ms_analisis, self._ms_antiguedad
+            errores, sin_presupuesto = dict(self.errores), self.sin_presupuesto
+        return {
+            'captura_fps': self.tasa_captura.tasa(),
+            'analisis_por_segundo': self.tasa_analisis.tasa(),
+            'visualizacion_fps': self.tasa_visualizacion.tasa(),
+            'ms_analisis': ms_analisis,
+            'ms_antiguedad_frame': ms_antiguedad,
+            'frames_capturados': self.tasa_captura.total,
+            'frames_analizados': self.tasa_analisis.total,
+            'frames_mostrados': self.tasa_visualizacion.total,
+            'analisis_suprimidos': self.puerta.estadisticas()['suprimidos'],
+            'analisis_sin_presupuesto': sin_presupuesto,
+            'fuego_fps': self.tasa_fuego.tasa(),
+            'fuego': self.confirmador.estadisticas() if self.confirmador is not None else None,
+            'incidentes': self.deduplicador.estadisticas() if self.deduplicador is not None else None,
+            'seguimiento': self.seguidor.estadisticas() if self.seguidor is not None else None,
+            'clips': self.clips.estadisticas() if self.clips is not None else None,
+            'errores': errores
+        }
+
+
 # ------------------ FUNCIÓN PRINCIPAL ------------------ #
 
 def iniciar_camara_vivo():
@@ -443,8 +679,11 @@ def iniciar_camara_vivo():
     # Inicializar base de datos
     init_db()
     
-    # Inicializar cliente de Vision
-    cliente = vision.ImageAnnotatorClient()
+    # Detector configurado (DETECTOR_BACKEND), listo antes del primer frame
+    detector = obtener_detector()
+    detector.calentar(en_segundo_plano=False)
+    intervalo = FRAME_INTERVAL if FRAME_INTERVAL is not None else detector.intervalo_camara
+    print(f"[DETECTOR] Backend: {detector.nombre} | Análisis con movimiento, como mucho cada {intervalo:.2f} s")
     
     # Inicializar cámara
     cap = cv2.VideoCapture(0)
@@ -453,124 +692,119 @@ def iniciar_camara_vivo():
         print("❌ Error: No se pudo abrir la cámara")
         return
     
-    # Configurar resolución (opcional)
+    # Configurar resolución (opcional) y pedir al driver el buffer mínimo
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     
-    frame_count = 0
-    ultima_analisis = 0
-    detecciones_actuales = []
-    modo_debug_activo = MODO_DEBUG
+    pipeline = PipelineCamara(cap, detector, intervalo, modo_debug=MODO_DEBUG)
+    pipeline.iniciar()
+    ultimo_mostrado = 0
     
     try:
-        while True:
-            ret, frame = cap.read()
-            
-            if not ret:
-                print("❌ Error: No se pudo leer el frame")
-                break
-            
-            # Voltear frame horizontalmente (espejo)
-            frame = cv2.flip(frame, 1)
+        while pipeline.activo:
+            frame, frame_id, detecciones_actuales = pipeline.estado()
             
-            altura_frame, ancho_frame = frame.shape[:2]
-            
-            # Analizar frame cada N segundos (para no saturar la API)
-            frame_count += 1
-            tiempo_actual = datetime.now().timestamp()
-            
-            if tiempo_actual - ultima_analisis >= FRAME_INTERVAL:
-                # Convertir BGR a RGB para Google Vision
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # Sin frame nuevo no hay nada que redibujar; solo atender el teclado
+            if frame is None or frame_id == ultimo_mostrado:
+                key = cv2.waitKey(5) & 0xFF
+            else:
+                ultimo_mostrado = frame_id
+                frame = frame.copy()
+                altura_frame, ancho_frame = frame.shape[:2]
                 
-                print(f"[Frame {frame_count}] Analizando...", end="\r")
+                # Dibujar detecciones en el frame
+                alerta = dibujar_detecciones(frame, detecciones_actuales, altura_frame, ancho_frame)
                 
-                try:
-                    detecciones_actuales = detectar_amenazas_frame(cliente, frame_rgb, modo_debug_activo)
-                    ultima_analisis = tiempo_actual
-                    
-                    # Guardar alertas críticas en BD
-                    for tipo, objeto, confianza, x1, y1, x2, y2 in detecciones_actuales:
-                        if tipo in ['arma', 'incendio', 'agresion']:
-                            # Guardar frame
-                            ruta_frame = guardar_frame_con_alerta(frame, detecciones_actuales)
-                            
-                            # Guardar en BD (ubicación por defecto para cámara en vivo)
-                            guardar_alerta(
-                                imagen=ruta_frame,
-                                tipo=tipo,
-                                objeto=objeto,
-                                confianza=confianza,
-                                x1=x1 if x1 != 0.0 else None,
-                                y1=y1 if y1 != 0.0 else None,
-                                x2=x2 if x2 != 1.0 else None,
-                                y2=y2 if y2 != 1.0 else None,
-                                ubicacion="Cámara en Vivo"
-                            )
-                            
-                            # Mensaje especial para cuchillos
-                            if "knife" in objeto.lower() or "blade" in objeto.lower():
-                                print(f"\n🔪🚨 ALERTA: CUCHILLO DETECTADO 🚨🔪")
-                                print(f"   Objeto: {objeto.upper()}")
-                                print(f"   Confianza: {confianza:.2f}")
-                            else:
-                                print(f"\n🚨 ALERTA {tipo.upper()} DETECTADA: {objeto} (confianza: {confianza:.2f})")
-                            print(f"   Frame guardado en: {ruta_frame}")
+                # Información en pantalla
+                estado = "🔴 ALERTA ACTIVA" if alerta else "🟢 MONITOREO"
+                cv2.putText(
+                    frame,
+                    estado,
+                    (10, altura_frame - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.7,
+                    (0, 255, 0) if not alerta else (0, 0, 255),
+                    2
+                )
                 
-                except Exception as e:
-                    print(f"\n⚠️ Error en detección: {e}")
-                    detecciones_actuales = []
-            
-            # Dibujar detecciones en el frame
-            alerta = dibujar_detecciones(frame, detecciones_actuales, altura_frame, ancho_frame)
-            
-            # Información en pantalla
-            estado = "🔴 ALERTA ACTIVA" if alerta else "🟢 MONITOREO"
-            cv2.putText(
-                frame,
-                estado,
-                (10, altura_frame - 20),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (0, 255, 0) if not alerta else (0, 0, 255),
-                2
-            )
-            
-            cv2.putText(
-                frame,
-                f"Frame: {frame_count} | Detecciones: {len(detecciones_actuales)}",
-                (10, altura_frame - 50),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                (255, 255, 255),
-                1
-            )
-            
-            # Mostrar frame
-            cv2.imshow('Ojo de Dios - Detección en Vivo', frame)
+                tasas = pipeline.tasas()
+                cv2.putText(
+                    frame,
+                    f"Frame: {frame_id} | Detecciones: {len(detecciones_actuales)} | "
+                    f"Captura {tasas['captura_fps']:.0f} fps | Analisis {tasas['analisis_por_segundo']:.2f}/s | "
+                    f"Vista {tasas['visualizacion_fps']:.0f} fps",
+                    (10, altura_frame - 50),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5,
+                    (255, 255, 255),
+                    1
+                )
+                
+                # Mostrar frame
+                cv2.imshow('Ojo de Dios - Detección en Vivo', frame)
+                pipeline.tasa_visualizacion.registrar()
+                key = cv2.waitKey(1) & 0xFF
             
             # Controles
-            key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
                 break
-            elif key == ord('s'):
+            elif key == ord('s') and frame is not None:
                 # Guardar frame actual
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
                 ruta = f"captura_{timestamp}.jpg"
                 cv2.imwrite(ruta, frame)
                 print(f"\n📸 Frame guardado: {ruta}")
             elif key == ord('d'):
                 # Activar/desactivar modo debug
-                modo_debug_activo = not modo_debug_activo
-                estado = "ACTIVADO" if modo_debug_activo else "DESACTIVADO"
+                pipeline.modo_debug = not pipeline.modo_debug
+                estado = "ACTIVADO" if pipeline.modo_debug else "DESACTIVADO"
                 print(f"\n🔍 Modo debug {estado}")
+        
+        if pipeline.error:
+            print(f"❌ Error: {pipeline.error}")
     
     except KeyboardInterrupt:
         print("\n\n⚠️ Interrupción del usuario")
     
     finally:
+        pipeline.detener()
         cap.release()
         cv2.destroyAllWindows()
+        tasas = pipeline.tasas()
+        print(f"\n[PIPELINE] Captura: {tasas['frames_capturados']} frames ({tasas['captura_fps']:.1f} fps) | "
+              f"Análisis: {tasas['frames_analizados']} ({tasas['analisis_por_segundo']:.2f}/s, "
+              f"{tasas['ms_analisis']:.0f} ms, frame de {tasas['ms_antiguedad_frame']:.0f} ms de antigüedad) | "
+              f"Visualización: {tasas['frames_mostrados']} ({tasas['visualizacion_fps']:.1f} fps)")
+        movimiento = pipeline.puerta.estadisticas()
+        print(f"[MOVIMIENTO] Análisis: {movimiento['analisis']} (movimiento {movimiento['por_movimiento']}, "
+              f"intervalo máximo {movimiento['por_maximo']}) | Suprimidos: {movimiento['suprimidos']} de "
+              f"{movimiento['analisis_intervalo_fijo']} con intervalo fijo ({movimiento['ahorro']:.0%} de ahorro)")
+        if tasas['fuego']:
+            print(f"[FUEGO] Frames evaluados: {tasas['fuego']['frames']} ({tasas['fuego_fps']:.1f} fps) | "
+                  f"Descartados sin parpadeo: {tasas['fuego']['descartados']} | "
+                  f"Confirmación: {tasas['fuego']['ms_promedio']:.3f} ms por frame")
+        if tasas['incidentes']:
+            print(f"[INCIDENTES] Detecciones críticas: {tasas['incidentes']['detecciones']} | "
+                  f"Incidentes (alertas): {tasas['incidentes']['incidentes']} | "
+                  f"Confianza actualizada: {tasas['incidentes']['actualizaciones']} | "
+                  f"Suprimidas: {tasas['incidentes']['suprimidas']}")
+        if tasas['seguimiento']:
+            print(f"[SEGUIMIENTO] Pistas: {tasas['seguimiento']['pistas']} (perdidas {tasas['seguimiento']['perdidas']}) | "
+                  f"Análisis pedidos por el seguimiento: {movimiento['por_seguimiento']}")
+        if tasas['clips']:
+            print(f"[CLIPS] Clips escritos: {tasas['clips']['clips']} (errores {tasas['clips']['errores']}) | "
+                  f"Buffer: {tasas['clips']['memoria_mb']:.1f} de {tasas['clips']['memoria_max_mb']:.0f} MB, "
+                  f"{tasas['clips']['segundos_en_memoria']:.0f} s")
+        llamadas = estadisticas_llamadas_vision()
+        print(f"\n[VISION] Frames analizados: {llamadas['imagenes']} | "
+              f"Llamadas a la API: {llamadas['llamadas']} "
+              f"({llamadas['llamadas_por_imagen']:.2f} por frame)")
+        dibujo = overlays.estadisticas()['dibujo'].get('video')
+        if dibujo:
+            print(f"[OVERLAYS] Dibujo por frame: {dibujo['ms_promedio']:.2f} ms promedio, "
+                  f"{dibujo['ms_maximo']:.2f} ms máximo | Capas compuestas: {dibujo['capas_compuestas']}, "
+                  f"reutilizadas: {dibujo['capas_reutilizadas']}")
         print("\n✔️ Cámara cerrada correctamente\n")
 
 
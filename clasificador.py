@@ -0,0 +1,183 @@
+"""
+Clasificador de etiquetas por palabras clave, compartido por analizador y camara_vivo.
+
+Todas las categorías se compilan al importar el módulo en una única expresión
+regular, de modo que cada etiqueta se recorre una sola vez para saber qué
+categorías contiene, en lugar de probar cada palabra con bucles anidados.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# ------------------ CATEGORÍAS ------------------ #
+
+OBJETOS_PELIGROSOS = [
+    "gun", "knife", "weapon", "firearm", "rifle", "pistol", "sword",
+    "blade", "cutting tool", "kitchen knife", "dagger", "machete",
+    "scalpel", "razor", "bayonet"
+]
+
+# Vehículos sospechosos (pueden ser usados para ataques)
+VEHICULOS_SOSPECHOSOS = ["truck", "van", "suv", "vehicle", "car", "automobile"]
+
+# Objetos relacionados con fuego
+OBJETOS_FUEGO = ["lighter", "match", "torch", "candle", "flame"]
+
+# Patrones de incendio usados en imágenes subidas
+PATRONES_INCENDIO = [
+    "fire", "flames", "flame", "smoke",
+    "wildfire", "conflagration", "explosion", "burning"
+]
+
+# Patrones de incendio usados en la cámara (más sensibles, incluye llamas pequeñas)
+PATRONES_INCENDIO_AMPLIADO = PATRONES_INCENDIO + [
+    "smoking", "lighter", "match", "torch", "candle", "spark",
+    "ignition", "combustion", "blaze", "ember"
+]
+
+PATRONES_AGRESION_DIRECTOS = [
+    "violence", "aggression", "aggressive", "fight", "fighting",
+    "assault", "attack", "conflict", "combat", "brawl",
+    "altercation", "struggle", "hostility", "hostile",
+    "physical violence", "physical altercation", "physical conflict",
+    "punch", "punching", "hitting", "striking", "kicking",
+    "wrestling", "grappling", "scuffle", "tussle", "melee"
+]
+
+PATRONES_AGRESION_CONTEXTO = [
+    "action", "tension", "drama", "martial arts", "boxing",
+    "self defense", "defense", "street", "urban", "outdoor",
+    "person", "people", "crowd", "group", "gathering"
+]
+
+# Etiquetas de acción/tensión que, con varias personas, sugieren conflicto
+PATRONES_ACCION = ["action", "tension", "drama", "movement", "motion"]
+PATRONES_CONFLICTO = ["struggle", "conflict"] + PATRONES_ACCION
+
+# Etiquetas deportivas que descartan un conflicto (falsos positivos)
+PATRONES_DEPORTE = ["sport", "competition", "game"]
+
+PATRONES_POSTURAS_AGRESIVAS = [
+    "lying", "lying down", "on ground", "ground", "floor",
+    "standing", "over", "above", "leaning", "bending"
+]
+PATRONES_POSTURAS_AMPLIADAS = PATRONES_POSTURAS_AGRESIVAS + [
+    "arm", "arms", "raised", "extended", "outstretched"
+]
+
+# Objetos y etiquetas que NO queremos detectar (falsos positivos)
+OBJETOS_IGNORAR = [
+    "finger", "thumb", "nail", "hand", "glove", "medical glove",
+    "safety glove", "plastic", "person", "human", "skin", "science",
+    "medical", "body part", "anatomy"
+]
+ETIQUETAS_IGNORAR = [
+    "finger", "thumb", "nail", "hand", "glove", "medical",
+    "plastic", "science", "anatomy", "body part"
+]
+
+# Categoría -> (términos, umbral de confianza por defecto)
+CATEGORIAS = {
+    'persona': (["person"], 0.0),
+    'arma': (OBJETOS_PELIGROSOS, 0.50),
+    'vehiculo': (VEHICULOS_SOSPECHOSOS, 0.60),
+    'objeto_fuego': (OBJETOS_FUEGO, 0.55),
+    'incendio': (PATRONES_INCENDIO, 0.70),
+    'incendio_ampliado': (PATRONES_INCENDIO_AMPLIADO, 0.50),
+    'agresion_directa': (PATRONES_AGRESION_DIRECTOS, 0.40),
+    'agresion_contexto': (PATRONES_AGRESION_CONTEXTO, 0.0),
+    'accion': (PATRONES_ACCION, 0.35),
+    'conflicto': (PATRONES_CONFLICTO, 0.35),
+    'deporte': (PATRONES_DEPORTE, 0.0),
+    'postura': (PATRONES_POSTURAS_AGRESIVAS, 0.40),
+    'postura_ampliada': (PATRONES_POSTURAS_AMPLIADAS, 0.35),
+    'ignorar_objeto': (OBJETOS_IGNORAR, 0.0),
+    'ignorar_etiqueta': (ETIQUETAS_IGNORAR, 0.0),
+}
+
+# ------------------ COMPILACIÓN ------------------ #
+
+def _compilar(categorias):
+    """
+    Compila todas las categorías en una sola expresión regular.
+
+    La búsqueda usa un lookahead para que finditer revise cada posición del
+    texto. Como en una misma posición solo se captura el término más largo,
+    cada término arrastra también las categorías de los términos que son
+    prefijo suyo ("firearm" cuenta como "fire"), con lo que el resultado
+    coincide exactamente con la semántica de `palabra in texto`.
+
+    Returns:
+        (patron, mapa) donde mapa[termino] = {categoria: termino_reportado}
+    """
+    categorias_por_termino = {}
+    for categoria, (terminos, _) in categorias.items():
+        for termino in terminos:
+            categorias_por_termino.setdefault(termino, set()).add(categoria)
+
+    terminos = sorted(categorias_por_termino, key=len, reverse=True)
+    mapa = {}
+    for termino in terminos:
+        encontradas = {}
+        # Prefijos del término, del más corto al más largo: el más largo gana
+        for prefijo in sorted((t for t in terminos if termino.startswith(t)), key=len):
+            for categoria in categorias_por_termino[prefijo]:
+                encontradas[categoria] = prefijo
+        mapa[termino] = encontradas
+
+    patron = re.compile("(?=(" + "|".join(re.escape(t) for t in terminos) + "))")
+    return patron, mapa
+
+
+_PATRON, _MAPA_TERMINOS = _compilar(CATEGORIAS)
+UMBRALES = {categoria: umbral for categoria, (_, umbral) in CATEGORIAS.items()}
+
+EtiquetaClasificada = namedtuple('EtiquetaClasificada', ['descripcion', 'score', 'coincidencias', 'activas'])
+
+
+@lru_cache(maxsize=4096)
+def coincidencias(texto):
+    """
+    Devuelve las categorías presentes en un texto, sin aplicar umbrales.
+
+    Args:
+        texto: Descripción en minúsculas (nombre de objeto o etiqueta)
+
+    Returns:
+        Diccionario {categoria: termino} con el primer término encontrado de cada categoría
+    """
+    resultado = {}
+    for match in _PATRON.finditer(texto):
+        for categoria, termino in _MAPA_TERMINOS[match.group(1)].items():
+            resultado.setdefault(categoria, termino)
+    return resultado
+
+
+class Clasificador:
+    """Clasifica listas de etiquetas aplicando los umbrales de cada categoría."""
+
+    def __init__(self, umbrales=None):
+        self.umbrales = dict(UMBRALES)
+        if umbrales:
+            self.umbrales.update(umbrales)
+
+    def clasificar(self, etiquetas):
+        """
+        Clasifica etiquetas en una sola pasada.
+
+        Args:
+            etiquetas: Lista [(descripcion, score), ...]
+
+        Returns:
+            Lista de EtiquetaClasificada en el mismo orden. `coincidencias` trae
+            todas las categorías encontradas ({categoria: termino}) y `activas`
+            solo las que superan su umbral con el score de la etiqueta.
+        """
+        umbrales = self.umbrales
+        resultado = []
+        for descripcion, score in etiquetas:
+            encontradas = coincidencias(descripcion)
+            activas = frozenset(c for c in encontradas if score >= umbrales[c])
+            resultado.append(EtiquetaClasificada(descripcion, score, encontradas, activas))
+        return resultado
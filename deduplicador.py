@@ -0,0 +1,143 @@
+"""
+Deduplicación de alertas de cámara por incidente.
+
+Mientras un arma o un fuego siguen a la vista, cada ciclo de análisis vuelve
+a detectarlos. El deduplicador asocia las detecciones de un ciclo con los
+incidentes abiertos del mismo tipo cuya caja se superpone (IoU); solo una
+detección sin incidente abre uno nuevo y genera alerta. Un incidente que
+sigue a la vista solo actualiza su confianza cuando mejora, y se cierra
+cuando pasa el tiempo de enfriamiento sin volver a verse.
+
+Así los frames guardados, las filas de alertas y las notificaciones crecen
+con la cantidad de incidentes y no con el tiempo que la amenaza sigue en
+cámara.
+"""
+
+import itertools
+import os
+import threading
+import time
+
+# ------------------ CONFIGURACIÓN ------------------ #
+DEDUP_ACTIVO = os.environ.get('DEDUP_ACTIVO', '1') == '1'
+DEDUP_IOU = float(os.environ.get('DEDUP_IOU', 0.3))  # Superposición mínima para ser el mismo incidente
+DEDUP_ENFRIAMIENTO = float(os.environ.get('DEDUP_ENFRIAMIENTO', 60))  # Segundos sin verse para cerrar un incidente
+DEDUP_MEJORA_CONFIANZA = float(os.environ.get('DEDUP_MEJORA_CONFIANZA', 0.05))  # Mejora mínima para actualizar
+
+# Detecciones sin caja (etiquetas de escena) ocupan el frame completo
+CAJA_COMPLETA = (0.0, 0.0, 1.0, 1.0)
+
+_ids = itertools.count(1)
+
+
+def iou(caja_a, caja_b):
+    """Intersección sobre unión de dos cajas normalizadas (x1, y1, x2, y2)."""
+    ancho = min(caja_a[2], caja_b[2]) - max(caja_a[0], caja_b[0])
+    alto = min(caja_a[3], caja_b[3]) - max(caja_a[1], caja_b[1])
+    if ancho <= 0 or alto <= 0:
+        return 0.0
+    interseccion = ancho * alto
+    area_a = (caja_a[2] - caja_a[0]) * (caja_a[3] - caja_a[1])
+    area_b = (caja_b[2] - caja_b[0]) * (caja_b[3] - caja_b[1])
+    return interseccion / (area_a + area_b - interseccion)
+
+
+def caja_de(deteccion):
+    """Caja normalizada de una detección (tipo, objeto, confianza, x1, y1, x2, y2)."""
+    _, _, _, x1, y1, x2, y2 = deteccion
+    if x1 is None or y1 is None or x2 is None or y2 is None:
+        return CAJA_COMPLETA
+    return (x1, y1, x2, y2)
+
+
+class Incidente:
+    """Una amenaza seguida entre ciclos de análisis."""
+
+    __slots__ = ('id', 'tipo', 'objeto', 'caja', 'confianza', 'inicio', 'ultima_vez', 'ciclos', 'alerta')
+
+    def __init__(self, deteccion, ahora):
+        self.id = next(_ids)
+        self.tipo, self.objeto, self.confianza = deteccion[:3]
+        self.caja = caja_de(deteccion)
+        self.inicio = ahora
+        self.ultima_vez = ahora
+        self.ciclos = 1
+        self.alerta = None  # Lo que devolvió la función de guardado (Future o clave de la alerta)
+
+
+class DeduplicadorAlertas:
+    """Agrupa detecciones en incidentes por tipo e IoU, con enfriamiento."""
+
+    def __init__(self, iou_min=DEDUP_IOU, enfriamiento=DEDUP_ENFRIAMIENTO, mejora_min=DEDUP_MEJORA_CONFIANZA):
+        self.iou_min = iou_min
+        self.enfriamiento = enfriamiento
+        self.mejora_min = mejora_min
+        self._incidentes = []
+        self._lock = threading.Lock()
+        self._contadores = {'detecciones': 0, 'incidentes': 0, 'actualizaciones': 0, 'suprimidas': 0,
+                            'cerrados': 0}
+
+    def asociar(self, detecciones, ahora=None):
+        """
+        Asocia las detecciones de un ciclo con los incidentes abiertos.
+
+        Args:
+            detecciones: Lista de tuplas (tipo, objeto, confianza, x1, y1, x2, y2)
+            ahora: Marca de tiempo (time.monotonic() por defecto)
+
+        Returns:
+            (nuevos, mejorados): listas de (incidente, deteccion). Los nuevos deben
+            generar una alerta; los mejorados, actualizar la confianza y el objeto de la suya.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        nuevos, mejorados = [], []
+        with self._lock:
+            self._cerrar_vencidos(ahora)
+            for deteccion in detecciones:
+                self._contadores['detecciones'] += 1
+                tipo, objeto, confianza = deteccion[:3]
+                caja = caja_de(deteccion)
+
+                mejor, mejor_iou = None, self.iou_min
+                for incidente in self._incidentes:
+                    if incidente.tipo == tipo:
+                        superposicion = iou(incidente.caja, caja)
+                        if superposicion >= mejor_iou:
+                            mejor, mejor_iou = incidente, superposicion
+
+                if mejor is None:
+                    incidente = Incidente(deteccion, ahora)
+                    self._incidentes.append(incidente)
+                    self._contadores['incidentes'] += 1
+                    nuevos.append((incidente, deteccion))
+                    continue
+
+                # Mismo incidente: seguir su caja y subir la confianza solo si mejora lo suficiente
+                if mejor.ultima_vez != ahora:
+                    mejor.ciclos += 1
+                mejor.caja = caja
+                mejor.ultima_vez = ahora
+                if confianza >= mejor.confianza + self.mejora_min:
+                    mejor.confianza = confianza
+                    mejor.objeto = objeto
+                    if all(incidente is not mejor for incidente, _ in nuevos + mejorados):
+                        mejorados.append((mejor, deteccion))
+                    self._contadores['actualizaciones'] += 1
+                else:
+                    self._contadores['suprimidas'] += 1
+        return nuevos, mejorados
+
+    def _cerrar_vencidos(self, ahora):
+        abiertos = [incidente for incidente in self._incidentes if ahora - incidente.ultima_vez <= self.enfriamiento]
+        self._contadores['cerrados'] += len(self._incidentes) - len(abiertos)
+        self._incidentes = abiertos
+
+    def abiertos(self):
+        """Incidentes abiertos (no vencidos todavía)."""
+        with self._lock:
+            return list(self._incidentes)
+
+    def estadisticas(self):
+        """Detecciones recibidas, incidentes abiertos y totales, actualizaciones y detecciones suprimidas."""
+        with self._lock:
+            return dict(self._contadores, abiertos=len(self._incidentes))
@@ -0,0 +1,332 @@
+"""
+Detección de fuego por color sobre una copia reducida del frame.
+
+La máscara de fuego (rojo, naranja y amarillo brillantes) se arma con una
+sola pasada de tabla de búsqueda (cv2.LUT) sobre los planos H, S y V, en
+lugar de cuatro cv2.inRange y tres bitwise_or. Cada plano marca un bit
+(H en rango = 1, S suficiente = 2, V suficiente = 4) y un píxel es fuego
+cuando suma 7.
+
+Los buffers intermedios y el kernel morfológico se crean una vez por
+tamaño de frame y se reutilizan, así el costo por frame es bajo y
+constante y se puede evaluar cada frame capturado, no solo los que van al
+detector.
+"""
+
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+# ------------------ CONFIGURACIÓN ------------------ #
+FUEGO_ANCHO = int(os.environ.get('FUEGO_ANCHO', 640))  # Ancho de la copia reducida (px); 0 = resolución completa
+
+# Rangos HSV de OpenCV (H de 0 a 179): rojo 0-10 y 170-179, naranja 10-25, amarillo 25-35
+FUEGO_RANGOS_H = ((0, 35), (170, 179))
+FUEGO_S_MIN = 120  # Saturación moderada: filtra piel y objetos amarillos pálidos
+FUEGO_V_MIN = 180  # Brillo moderado: detecta llamas pequeñas
+
+# Tamaños mínimos en píxeles del frame original (se escalan a la copia reducida)
+FUEGO_KERNEL = 5
+FUEGO_AREA_MIN = 300
+FUEGO_LADO_MIN = 20
+
+# Confirmación temporal (ConfirmadorFuego)
+FUEGO_CONFIRMACION = os.environ.get('FUEGO_CONFIRMACION', '1') == '1'
+FUEGO_HISTORIA = int(os.environ.get('FUEGO_HISTORIA', 16))  # Frames en la ventana deslizante
+FUEGO_HISTORIA_ANCHO = int(os.environ.get('FUEGO_HISTORIA_ANCHO', 160))  # Ancho de las máscaras guardadas (px)
+FUEGO_PERSISTENCIA = float(os.environ.get('FUEGO_PERSISTENCIA', 0.6))  # Fracción de frames con fuego
+FUEGO_PARPADEO_MIN = float(os.environ.get('FUEGO_PARPADEO_MIN', 0.10))  # Fracción de la región que cambia por frame
+FUEGO_CAMBIO_FORMA_MIN = float(os.environ.get('FUEGO_CAMBIO_FORMA_MIN', 0.05))  # Variación relativa del área que suma confianza
+
+_BIT_H, _BIT_S, _BIT_V = 1, 2, 4
+
+
+def _tabla_hsv():
+    """Tabla de 256 x 3: el bit de cada canal cuando su valor está en rango."""
+    tabla = np.zeros((1, 256, 3), dtype=np.uint8)
+    for inicio, fin in FUEGO_RANGOS_H:
+        tabla[0, inicio:fin + 1, 0] = _BIT_H
+    tabla[0, FUEGO_S_MIN:, 1] = _BIT_S
+    tabla[0, FUEGO_V_MIN:, 2] = _BIT_V
+    return tabla
+
+
+def _tabla_mascara():
+    """Convierte la suma de bits en máscara: 255 solo si los tres canales están en rango."""
+    tabla = np.zeros((1, 256), dtype=np.uint8)
+    tabla[0, _BIT_H + _BIT_S + _BIT_V] = 255
+    return tabla
+
+
+class DetectorFuegoColor:
+    """
+    Detector de fuego por color con buffers reutilizables.
+
+    No es seguro entre hilos: cada hilo usa su propia instancia
+    (detectar_fuego_por_color lo resuelve con una instancia por hilo).
+    Con bgr=True recibe los frames de OpenCV sin convertirlos antes a RGB.
+    """
+
+    TABLA_HSV = _tabla_hsv()
+    TABLA_MASCARA = _tabla_mascara()
+    SUMA_CANALES = np.ones((1, 3), dtype=np.float32)
+
+    def __init__(self, ancho=FUEGO_ANCHO, bgr=False):
+        self.ancho = ancho
+        self._conversion = cv2.COLOR_BGR2HSV if bgr else cv2.COLOR_RGB2HSV
+        self._forma = None
+
+    def _preparar(self, altura, ancho):
+        """Reserva los buffers y el kernel para un tamaño de frame."""
+        escala = min(1.0, self.ancho / ancho) if self.ancho else 1.0
+        ancho_reducido = max(1, round(ancho * escala))
+        altura_reducida = max(1, round(altura * escala))
+
+        self.escala = escala
+        self._tamano = (ancho_reducido, altura_reducida)
+        self._reducido = np.empty((altura_reducida, ancho_reducido, 3), dtype=np.uint8) if escala < 1 else None
+        self._hsv = np.empty((altura_reducida, ancho_reducido, 3), dtype=np.uint8)
+        self._bits = np.empty((altura_reducida, ancho_reducido, 3), dtype=np.uint8)
+        self._suma = np.empty((altura_reducida, ancho_reducido), dtype=np.uint8)
+        self._mascara = np.empty((altura_reducida, ancho_reducido), dtype=np.uint8)
+        self._auxiliar = np.empty((altura_reducida, ancho_reducido), dtype=np.uint8)
+
+        lado_kernel = max(3, round(FUEGO_KERNEL * escala)) | 1
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (lado_kernel, lado_kernel))
+        self._area_min = FUEGO_AREA_MIN * escala * escala
+        self._lado_min = FUEGO_LADO_MIN * escala
+        self._forma = (altura, ancho)
+
+    def mascara(self, frame_rgb):
+        """
+        Calcula la máscara de fuego de la copia reducida (0 o 255 por píxel).
+
+        El array devuelto es un buffer interno: se sobrescribe en la siguiente llamada.
+        """
+        altura, ancho = frame_rgb.shape[:2]
+        if self._forma != (altura, ancho):
+            self._preparar(altura, ancho)
+
+        imagen = frame_rgb
+        if self._reducido is not None:
+            cv2.resize(frame_rgb, self._tamano, dst=self._reducido, interpolation=cv2.INTER_AREA)
+            imagen = self._reducido
+
+        cv2.cvtColor(imagen, self._conversion, dst=self._hsv)
+        cv2.LUT(self._hsv, self.TABLA_HSV, dst=self._bits)
+        cv2.transform(self._bits, self.SUMA_CANALES, dst=self._suma)
+        cv2.LUT(self._suma, self.TABLA_MASCARA, dst=self._mascara)
+
+        # Filtro morfológico para eliminar ruido
+        cv2.morphologyEx(self._mascara, cv2.MORPH_CLOSE, self._kernel, dst=self._auxiliar)
+        cv2.morphologyEx(self._auxiliar, cv2.MORPH_OPEN, self._kernel, dst=self._mascara)
+        return self._mascara
+
+    @property
+    def mascara_actual(self):
+        """Máscara del último frame evaluado (buffer interno)."""
+        return self._mascara
+
+    def detectar(self, frame_rgb, umbral_pixeles=150, umbral_porcentaje=0.3):
+        """
+        Detecta fuego analizando colores rojo/naranja/amarillo brillantes en el frame.
+
+        Args:
+            frame_rgb: Frame en formato RGB
+            umbral_pixeles: Número mínimo de píxeles de color fuego (del frame original)
+            umbral_porcentaje: Porcentaje mínimo del frame que debe ser fuego
+
+        Returns:
+            (detectado, porcentaje, bbox) con bbox normalizado (x1, y1, x2, y2) o None
+        """
+        mascara = self.mascara(frame_rgb)
+
+        pixeles_fuego = cv2.countNonZero(mascara)
+        porcentaje = (pixeles_fuego / mascara.size) * 100
+
+        if pixeles_fuego < umbral_pixeles * self.escala * self.escala or porcentaje < umbral_porcentaje:
+            return False, porcentaje, None
+
+        contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contornos:
+            return False, porcentaje, None
+
+        # El contorno más grande debe tener un área y un tamaño razonables
+        mayor = max(contornos, key=cv2.contourArea)
+        if cv2.contourArea(mayor) < self._area_min:
+            return False, porcentaje, None
+
+        x, y, w, h = cv2.boundingRect(mayor)
+        if w < self._lado_min or h < self._lado_min:
+            return False, porcentaje, None
+
+        ancho_reducido, altura_reducida = self._tamano
+        return True, porcentaje, (x / ancho_reducido, y / altura_reducida,
+                                  (x + w) / ancho_reducido, (y + h) / altura_reducida)
+
+
+_local = threading.local()
+
+
+def detectar_fuego_por_color(frame_rgb, umbral_pixeles=150, umbral_porcentaje=0.3):
+    """
+    Detecta fuego por color con el detector del hilo actual (FUEGO_ANCHO).
+
+    Returns:
+        (detectado, porcentaje, bbox) o (False, porcentaje, None)
+    """
+    detector = getattr(_local, 'detector', None)
+    if detector is None:
+        detector = _local.detector = DetectorFuegoColor()
+    return detector.detectar(frame_rgb, umbral_pixeles, umbral_porcentaje)
+
+
+# ------------------ CONFIRMACIÓN TEMPORAL ------------------ #
+
+class EstadoFuego(NamedTuple):
+    """Resultado de la confirmación temporal de un frame."""
+    confirmado: bool
+    confianza: float
+    persistencia: float   # Fracción de la ventana con fuego por color
+    parpadeo: float       # Fracción media de la región que cambia entre frames consecutivos
+    cambio_forma: float   # Desvío relativo del área de fuego en la ventana
+    porcentaje: float     # Porcentaje del frame actual con color de fuego
+    bbox: Optional[tuple]
+
+
+# Estado antes del primer frame evaluado
+SIN_FUEGO = EstadoFuego(False, 0.0, 0.0, 0.0, 0.0, 0.0, None)
+
+
+class ConfirmadorFuego:
+    """
+    Confirma el fuego por color solo si persiste y parpadea a lo largo de varios frames.
+
+    Una camiseta naranja o un atardecer tienen el color del fuego pero son
+    estables: su máscara casi no cambia de un frame a otro. Las llamas
+    cambian de forma constantemente. Se guarda una ventana circular de
+    máscaras reducidas (memoria fija) y se calcula:
+
+    - persistencia: fracción de frames de la ventana con fuego por color
+    - parpadeo: píxeles que cambian entre frames consecutivos, respecto a la
+      región que fue fuego en algún frame de la ventana
+    - cambio de forma: desvío estándar del área respecto a su media
+
+    El fuego se confirma cuando la persistencia y el parpadeo superan sus
+    umbrales; el cambio de forma sube la confianza.
+    """
+
+    def __init__(self, historia=FUEGO_HISTORIA, ancho=FUEGO_HISTORIA_ANCHO, persistencia=FUEGO_PERSISTENCIA,
+                 parpadeo_min=FUEGO_PARPADEO_MIN, cambio_forma_min=FUEGO_CAMBIO_FORMA_MIN, detector=None):
+        self.historia = historia
+        self.ancho = ancho
+        self.persistencia_min = persistencia
+        self.parpadeo_min = parpadeo_min
+        self.cambio_forma_min = cambio_forma_min
+        self.detector = detector or DetectorFuegoColor()
+
+        self._mascaras = None
+        self._reducida = None
+        self._region = None
+        self._presente = np.zeros(historia, dtype=bool)
+        self._areas = np.zeros(historia, dtype=np.float32)
+        self._cambios = np.zeros(historia, dtype=np.float32)  # Píxeles que cambiaron respecto al frame anterior
+        self._bboxes = [None] * historia
+        self._indice = 0
+        self._llenos = 0
+        self.frames = 0
+        self.ms_total = 0.0
+        self.descartados = 0  # Frames con fuego por color que la confirmación rechazó
+
+    def _preparar(self, mascara):
+        altura, ancho = mascara.shape
+        escala = min(1.0, self.ancho / ancho)
+        self._tamano = (max(1, round(ancho * escala)), max(1, round(altura * escala)))
+        forma = (self._tamano[1], self._tamano[0])
+        self._mascaras = np.zeros((self.historia,) + forma, dtype=np.uint8)
+        self._reducida = np.empty(forma, dtype=np.uint8)
+        self._region = np.empty(forma, dtype=np.uint8)
+        self._diferencia = np.empty(forma, dtype=np.uint8)
+        self._forma_origen = mascara.shape
+        self._llenos = 0
+
+    def actualizar(self, frame_rgb):
+        """
+        Agrega un frame a la ventana y evalúa si hay fuego confirmado.
+
+        Args:
+            frame_rgb: Frame en formato RGB (o BGR si el detector se creó con bgr=True)
+
+        Returns:
+            EstadoFuego del frame
+        """
+        detectado, porcentaje, bbox = self.detector.detectar(frame_rgb)
+        inicio = time.perf_counter()
+        mascara = self.detector.mascara_actual
+        if self._mascaras is None or self._forma_origen != mascara.shape:
+            self._preparar(mascara)
+
+        # Máscara reducida a 0/1 en la posición actual de la ventana circular; una celda
+        # con cualquier píxel de fuego cuenta, para no perder llamas pequeñas
+        cv2.resize(mascara, self._tamano, dst=self._reducida, interpolation=cv2.INTER_AREA)
+        actual = self._mascaras[self._indice]
+        cv2.threshold(self._reducida, 0, 1, cv2.THRESH_BINARY, dst=actual)
+
+        anterior = self._mascaras[(self._indice - 1) % self.historia]
+        cv2.bitwise_xor(actual, anterior, dst=self._diferencia)
+        self._cambios[self._indice] = cv2.countNonZero(self._diferencia) if self._llenos else 0
+        self._areas[self._indice] = cv2.countNonZero(actual)
+        self._presente[self._indice] = detectado
+        self._bboxes[self._indice] = bbox
+        self._indice = (self._indice + 1) % self.historia
+        self._llenos = min(self._llenos + 1, self.historia)
+
+        estado = self._evaluar(porcentaje)
+        if detectado and not estado.confirmado:
+            self.descartados += 1
+        self.frames += 1
+        self.ms_total += (time.perf_counter() - inicio) * 1000
+        return estado
+
+    def _evaluar(self, porcentaje):
+        llenos = self._llenos
+        persistencia = float(self._presente[:llenos].sum()) / self.historia
+        if llenos < 2 or persistencia < self.persistencia_min:
+            return EstadoFuego(False, 0.0, persistencia, 0.0, 0.0, porcentaje, None)
+
+        # Región: píxeles que fueron fuego en algún frame de la ventana
+        np.max(self._mascaras[:llenos], axis=0, out=self._region)
+        region = cv2.countNonZero(self._region)
+        if region == 0:
+            return EstadoFuego(False, 0.0, persistencia, 0.0, 0.0, porcentaje, None)
+        # El cambio del frame más viejo se midió contra uno que ya salió de la ventana
+        mas_viejo = self._indice if llenos == self.historia else 0
+        transiciones = float(self._cambios[:llenos].sum() - self._cambios[mas_viejo])
+        parpadeo = transiciones / ((llenos - 1) * region)
+
+        areas = self._areas[:llenos]
+        media = float(areas.mean())
+        cambio_forma = float(areas.std()) / media if media else 0.0
+
+        if parpadeo < self.parpadeo_min:
+            return EstadoFuego(False, 0.0, persistencia, parpadeo, cambio_forma, porcentaje, None)
+
+        confianza = 0.4 * persistencia + 0.4 * min(1.0, parpadeo / (2 * self.parpadeo_min))
+        if cambio_forma >= self.cambio_forma_min:
+            confianza += 0.15
+        confianza = min(0.95, confianza)
+        bbox = next((self._bboxes[(self._indice - 1 - i) % self.historia] for i in range(llenos)
+                     if self._bboxes[(self._indice - 1 - i) % self.historia] is not None), None)
+        return EstadoFuego(bbox is not None, confianza, persistencia, parpadeo, cambio_forma, porcentaje, bbox)
+
+    def estadisticas(self):
+        """Frames evaluados, frames descartados y costo promedio de la confirmación (ms)."""
+        return {
+            'frames': self.frames,
+            'descartados': self.descartados,
+            'ms_promedio': self.ms_total / self.frames if self.frames else 0.0
+        }
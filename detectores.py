@@ -0,0 +1,486 @@
+"""
+Backends de detección de objetos intercambiables.
+
+`detectar_amenazas` y `detectar_amenazas_frame` no hablan con Google Vision
+directamente: piden el detector configurado con DETECTOR_BACKEND y reciben
+objetos y etiquetas en el mismo formato, sea cual sea el backend.
+
+- 'vision': Google Vision (objetos + etiquetas, por red).
+- 'onnx': modelo de detección ONNX (YOLOv5/YOLOv8 exportado) ejecutado en CPU
+  con cv2.dnn, sin conexión. Solo devuelve objetos; sus clases COCO se
+  traducen a los nombres que ya reconoce el clasificador.
+- 'replay': respuestas de Vision grabadas con DETECTOR_GRABAR=1, sin red ni
+  credenciales, para pruebas de carga y de regresión.
+"""
+
+import glob
+import hashlib
+import itertools
+import os
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from google.cloud import vision
+
+from vision_cliente import obtener_cliente, calentar_clientes
+from normalizacion import normalizar_bytes, normalizar_frame
+
+# ------------------ CONFIGURACIÓN ------------------ #
+DETECTOR_BACKEND = os.environ.get('DETECTOR_BACKEND', 'vision')  # 'vision', 'onnx' o 'replay'
+
+ONNX_MODELO = os.environ.get('DETECTOR_ONNX_MODELO', os.path.join('modelos', 'detector.onnx'))
+ONNX_CLASES = os.environ.get('DETECTOR_ONNX_CLASES', '')  # Archivo con una clase por línea ('' = COCO)
+ONNX_TAMANO_ENTRADA = int(os.environ.get('DETECTOR_ONNX_TAMANO', 640))  # Lado de la entrada del modelo
+ONNX_CONFIANZA = float(os.environ.get('DETECTOR_ONNX_CONFIANZA', 0.25))
+ONNX_NMS = float(os.environ.get('DETECTOR_ONNX_NMS', 0.45))
+ONNX_INTERVALO = float(os.environ.get('DETECTOR_ONNX_INTERVALO', 0.25))  # Segundos entre análisis en la cámara
+
+GRABACIONES_DIR = os.environ.get('DETECTOR_GRABACIONES_DIR', 'grabaciones_vision')
+GRABAR = os.environ.get('DETECTOR_GRABAR', '0') == '1'  # Guardar cada respuesta de Vision en GRABACIONES_DIR
+# Qué hace 'replay' con una imagen sin grabación: 'ciclo' (siguiente grabación), 'vacio' o 'error'
+REPLAY_SIN_GRABACION = os.environ.get('DETECTOR_REPLAY_SIN_GRABACION', 'ciclo')
+
+ResultadoDeteccion = namedtuple('ResultadoDeteccion', ['objetos', 'etiquetas', 'crudo'])
+
+
+# ------------------ GOOGLE VISION ------------------ #
+
+# Límites de la API para batch_annotate_images
+MAX_IMAGENES_POR_SOLICITUD = 16
+MAX_BYTES_POR_SOLICITUD = 8 * 1024 * 1024  # Margen bajo el límite de ~10 MB por solicitud
+
+# Una sola solicitud annotate con ambas features: localización de objetos y etiquetas
+FEATURES_VISION = [
+    vision.Feature(type_=vision.Feature.Type.OBJECT_LOCALIZATION),
+    vision.Feature(type_=vision.Feature.Type.LABEL_DETECTION),
+]
+
+# Contadores globales de llamadas (compartidos por la web y la cámara)
+_contadores_vision = {'imagenes': 0, 'llamadas': 0}
+_lock_contadores = threading.Lock()
+
+
+def registrar_llamadas_vision(imagenes, llamadas):
+    """Acumula el número de imágenes analizadas y de llamadas hechas a la API."""
+    with _lock_contadores:
+        _contadores_vision['imagenes'] += imagenes
+        _contadores_vision['llamadas'] += llamadas
+
+
+def estadisticas_llamadas_vision():
+    """
+    Devuelve los contadores de llamadas a Google Vision.
+
+    Returns:
+        Diccionario con imágenes analizadas, llamadas realizadas y llamadas por imagen
+    """
+    with _lock_contadores:
+        imagenes = _contadores_vision['imagenes']
+        llamadas = _contadores_vision['llamadas']
+    return {
+        'imagenes': imagenes,
+        'llamadas': llamadas,
+        'llamadas_por_imagen': (llamadas / imagenes) if imagenes else 0.0
+    }
+
+
+def anotar_imagen(cliente, content):
+    """
+    Envía una única solicitud annotate con localización de objetos y etiquetas.
+
+    Args:
+        cliente: Cliente de Google Vision
+        content: Bytes de la imagen (JPEG/PNG)
+
+    Returns:
+        AnnotateImageResponse con localized_object_annotations y label_annotations
+    """
+    solicitud = vision.AnnotateImageRequest(
+        image=vision.Image(content=content),
+        features=FEATURES_VISION
+    )
+    respuesta = cliente.annotate_image(solicitud)
+    registrar_llamadas_vision(imagenes=1, llamadas=1)
+
+    if respuesta.error.message:
+        raise RuntimeError(f"Error de Google Vision: {respuesta.error.message}")
+
+    return respuesta
+
+
+def anotar_lote(cliente, contenidos):
+    """
+    Envía varias imágenes en una sola solicitud batch_annotate_images.
+
+    Args:
+        cliente: Cliente de Google Vision
+        contenidos: Lista de bytes de imágenes (máximo MAX_IMAGENES_POR_SOLICITUD)
+
+    Returns:
+        Lista de AnnotateImageResponse en el mismo orden que contenidos
+    """
+    solicitudes = [
+        vision.AnnotateImageRequest(image=vision.Image(content=content), features=FEATURES_VISION)
+        for content in contenidos
+    ]
+    respuesta = cliente.batch_annotate_images(requests=solicitudes)
+    registrar_llamadas_vision(imagenes=len(contenidos), llamadas=1)
+    return list(respuesta.responses)
+
+
+def parsear_respuesta(respuesta):
+    """
+    Convierte la respuesta de Vision en listas simples de objetos y etiquetas.
+
+    Args:
+        respuesta: AnnotateImageResponse devuelta por anotar_imagen
+
+    Returns:
+        (objetos, etiquetas) donde
+        objetos = [(nombre, score, x1, y1, x2, y2), ...] (coordenadas normalizadas o None)
+        etiquetas = [(descripcion, score), ...]
+    """
+    objetos = []
+    for obj in respuesta.localized_object_annotations:
+        box = obj.bounding_poly.normalized_vertices
+        if len(box) >= 4:
+            x1, y1 = box[0].x, box[0].y
+            x2, y2 = box[2].x, box[2].y
+        else:
+            x1 = y1 = x2 = y2 = None
+        objetos.append((obj.name.lower(), obj.score, x1, y1, x2, y2))
+
+    etiquetas = [(label.description.lower(), label.score) for label in respuesta.label_annotations]
+    return objetos, etiquetas
+
+
+# ------------------ GRABACIÓN ------------------ #
+
+def hash_solicitud(content):
+    """SHA-256 de los bytes exactos enviados a Vision: clave de las grabaciones."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def guardar_grabacion(content, respuesta, directorio=GRABACIONES_DIR):
+    """
+    Guarda la respuesta cruda de Vision como JSON, indexada por el hash de la imagen enviada.
+
+    El JSON es el mismo formato que devuelve la API REST, así que lo pueden
+    servir tanto el backend 'replay' como servidor_vision_falso.py.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"{hash_solicitud(content)}.json")
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(vision.AnnotateImageResponse.to_json(respuesta))
+
+
+# ------------------ INTERFAZ DE BACKEND ------------------ #
+
+class Detector:
+    """
+    Interfaz común de los backends de detección.
+
+    Cada backend prepara la entrada a partir de bytes o de un frame RGB y
+    devuelve un ResultadoDeteccion con objetos [(nombre, score, x1, y1, x2, y2)]
+    en coordenadas normalizadas y etiquetas [(descripcion, score)].
+    """
+
+    nombre = None
+    usa_cache = False  # Si los resultados se guardan en cache_analisis
+    tam_lote = 1  # Imágenes que conviene analizar juntas
+    intervalo_camara = 2.0  # Segundos sugeridos entre análisis en la cámara en vivo
+
+    def calentar(self, en_segundo_plano=True):
+        """Prepara el backend antes de la primera detección (conexiones, modelo)."""
+
+    def preparar_bytes(self, content):
+        """
+        Convierte los bytes de una imagen subida en la entrada del backend.
+
+        Returns:
+            (entrada, metricas) con las métricas de la normalización
+        """
+        raise NotImplementedError
+
+    def preparar_frame(self, frame_rgb):
+        """Convierte un frame RGB de la cámara en la entrada del backend."""
+        raise NotImplementedError
+
+    def detectar(self, entrada):
+        """Analiza una entrada y devuelve un ResultadoDeteccion."""
+        raise NotImplementedError
+
+    def detectar_lote(self, entradas):
+        """
+        Analiza varias entradas.
+
+        Returns:
+            Lista en el mismo orden con un ResultadoDeteccion o la excepción de cada entrada
+        """
+        resultados = []
+        for entrada in entradas:
+            try:
+                resultados.append(self.detectar(entrada))
+            except Exception as e:
+                resultados.append(e)
+        return resultados
+
+
+class DetectorVision(Detector):
+    """Google Vision: una solicitud annotate por imagen o batch_annotate_images por lote."""
+
+    nombre = 'vision'
+    usa_cache = True
+    tam_lote = MAX_IMAGENES_POR_SOLICITUD
+    intervalo_camara = 2.0  # Para no saturar la API
+
+    def calentar(self, en_segundo_plano=True):
+        calentar_clientes(en_segundo_plano=en_segundo_plano)
+
+    def preparar_bytes(self, content):
+        # Reducir y recodificar antes de subir (las coordenadas normalizadas siguen valiendo)
+        return normalizar_bytes(content)
+
+    def preparar_frame(self, frame_rgb):
+        return normalizar_frame(frame_rgb)
+
+    def detectar(self, entrada):
+        respuesta = anotar_imagen(obtener_cliente(), entrada)
+        if GRABAR:
+            guardar_grabacion(entrada, respuesta)
+        objetos, etiquetas = parsear_respuesta(respuesta)
+        return ResultadoDeteccion(objetos, etiquetas, vision.AnnotateImageResponse.serialize(respuesta))
+
+    def detectar_lote(self, entradas):
+        resultados = []
+        for entrada, respuesta in zip(entradas, anotar_lote(obtener_cliente(), entradas)):
+            if GRABAR and not respuesta.error.message:
+                guardar_grabacion(entrada, respuesta)
+            if respuesta.error.message:
+                resultados.append(RuntimeError(f"Error de Google Vision: {respuesta.error.message}"))
+                continue
+            objetos, etiquetas = parsear_respuesta(respuesta)
+            resultados.append(ResultadoDeteccion(objetos, etiquetas,
+                                                 vision.AnnotateImageResponse.serialize(respuesta)))
+        return resultados
+
+
+class DetectorReplay(DetectorVision):
+    """
+    Sirve respuestas de Vision grabadas, sin red ni credenciales.
+
+    Prepara las imágenes igual que DetectorVision, así que una imagen grabada
+    produce la misma clave al reproducirla. Los frames de cámara nunca se
+    repiten, por eso con REPLAY_SIN_GRABACION='ciclo' se devuelven las
+    grabaciones en orden.
+    """
+
+    nombre = 'replay'
+    usa_cache = False  # Cada análisis debe recorrer el camino completo
+
+    def __init__(self, directorio=GRABACIONES_DIR, sin_grabacion=REPLAY_SIN_GRABACION):
+        self.directorio = directorio
+        self.sin_grabacion = sin_grabacion
+        self.grabaciones = {}
+        for ruta in sorted(glob.glob(os.path.join(directorio, '*.json'))):
+            with open(ruta, encoding='utf-8') as f:
+                self.grabaciones[os.path.splitext(os.path.basename(ruta))[0]] = \
+                    vision.AnnotateImageResponse.from_json(f.read(), ignore_unknown_fields=True)
+        if not self.grabaciones and sin_grabacion == 'ciclo':
+            raise FileNotFoundError(f"No hay grabaciones en {directorio} (grabar con DETECTOR_GRABAR=1)")
+        self._ciclo = itertools.cycle(list(self.grabaciones.values()))
+        self._lock = threading.Lock()
+        self.contadores = {'aciertos': 0, 'sin_grabacion': 0}
+
+    def calentar(self, en_segundo_plano=True):
+        print(f"[DETECTOR] Reproduciendo {len(self.grabaciones)} grabación(es) de {self.directorio}")
+
+    def _respuesta(self, entrada):
+        with self._lock:
+            respuesta = self.grabaciones.get(hash_solicitud(entrada))
+            if respuesta is not None:
+                self.contadores['aciertos'] += 1
+                return respuesta
+            self.contadores['sin_grabacion'] += 1
+            if self.sin_grabacion == 'ciclo':
+                return next(self._ciclo)
+        if self.sin_grabacion == 'vacio':
+            return vision.AnnotateImageResponse()
+        raise KeyError(f"Imagen sin grabación ({hash_solicitud(entrada)[:12]})")
+
+    def detectar(self, entrada):
+        respuesta = self._respuesta(entrada)
+        objetos, etiquetas = parsear_respuesta(respuesta)
+        return ResultadoDeteccion(objetos, etiquetas, vision.AnnotateImageResponse.serialize(respuesta))
+
+    def detectar_lote(self, entradas):
+        return Detector.detectar_lote(self, entradas)
+
+
+# ------------------ ONNX (cv2.dnn) ------------------ #
+
+CLASES_COCO = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog",
+    "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella",
+    "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball", "kite",
+    "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle",
+    "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch", "potted plant",
+    "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase", "scissors",
+    "teddy bear", "hair drier", "toothbrush"
+]
+
+# Clases del modelo -> nombre con el que las reconoce el clasificador (arma, vehiculo, persona).
+# Las clases que no aparecen aquí se descartan.
+MAPA_CLASES = {
+    'person': 'person',
+    'knife': 'knife',
+    'scissors': 'blade',
+    'car': 'car',
+    'truck': 'truck',
+    'bus': 'vehicle',
+    'motorcycle': 'vehicle',
+    # Modelos entrenados con clases propias
+    'gun': 'gun',
+    'pistol': 'pistol',
+    'rifle': 'rifle',
+    'weapon': 'weapon',
+}
+
+
+def cargar_clases(ruta_clases=ONNX_CLASES):
+    """Lee los nombres de clase del modelo (una por línea) o devuelve las 80 clases COCO."""
+    if not ruta_clases:
+        return list(CLASES_COCO)
+    with open(ruta_clases, encoding='utf-8') as f:
+        return [linea.strip() for linea in f if linea.strip()]
+
+
+class DetectorOnnx(Detector):
+    """
+    Detector local con un modelo ONNX tipo YOLO en cv2.dnn (CPU).
+
+    Cada hilo carga su propia red, porque cv2.dnn.Net no es seguro entre hilos.
+    """
+
+    nombre = 'onnx'
+    intervalo_camara = ONNX_INTERVALO
+
+    def __init__(self, ruta_modelo=ONNX_MODELO, ruta_clases=ONNX_CLASES, tamano=ONNX_TAMANO_ENTRADA,
+                 confianza=ONNX_CONFIANZA, nms=ONNX_NMS):
+        if not os.path.exists(ruta_modelo):
+            raise FileNotFoundError(f"No se encontró el modelo ONNX: {ruta_modelo} (DETECTOR_ONNX_MODELO)")
+        self.ruta_modelo = ruta_modelo
+        self.clases = cargar_clases(ruta_clases)
+        self.tamano = tamano
+        self.confianza = confianza
+        self.nms = nms
+        self._local = threading.local()
+
+    def _red(self):
+        red = getattr(self._local, 'red', None)
+        if red is None:
+            red = cv2.dnn.readNetFromONNX(self.ruta_modelo)
+            red.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            red.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            self._local.red = red
+        return red
+
+    def calentar(self, en_segundo_plano=True):
+        # Cargar la red y hacer una inferencia en vacío: la primera pasada reserva memoria
+        self.detectar(np.zeros((self.tamano, self.tamano, 3), dtype=np.uint8))
+        print(f"[DETECTOR] Modelo ONNX cargado: {self.ruta_modelo} ({len(self.clases)} clases)")
+
+    def preparar_bytes(self, content):
+        frame_bgr = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame_bgr is None:
+            raise ValueError("No se pudo decodificar la imagen")
+        return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB), {}
+
+    def preparar_frame(self, frame_rgb):
+        return frame_rgb, {}
+
+    def detectar(self, entrada):
+        """
+        Ejecuta el modelo sobre un frame RGB.
+
+        Returns:
+            ResultadoDeteccion con los objetos mapeados por MAPA_CLASES y sin etiquetas
+        """
+        altura, ancho = entrada.shape[:2]
+
+        # Letterbox: escalar conservando la relación de aspecto y rellenar hasta el cuadrado
+        escala = min(self.tamano / altura, self.tamano / ancho)
+        nuevo_ancho, nueva_altura = round(ancho * escala), round(altura * escala)
+        lienzo = np.full((self.tamano, self.tamano, 3), 114, dtype=np.uint8)
+        lienzo[:nueva_altura, :nuevo_ancho] = cv2.resize(entrada, (nuevo_ancho, nueva_altura),
+                                                         interpolation=cv2.INTER_LINEAR)
+
+        blob = cv2.dnn.blobFromImage(lienzo, 1 / 255.0, (self.tamano, self.tamano), swapRB=False, crop=False)
+        red = self._red()
+        red.setInput(blob)
+        salida = red.forward()[0]
+
+        # YOLOv8 exporta (4 + clases, N); YOLOv5 exporta (N, 5 + clases) con objectness
+        if salida.shape[0] < salida.shape[1]:
+            salida = salida.T
+            cajas, puntajes = salida[:, :4], salida[:, 4:]
+        else:
+            cajas, puntajes = salida[:, :4], salida[:, 5:] * salida[:, 4:5]
+
+        clases = np.argmax(puntajes, axis=1)
+        confianzas = puntajes[np.arange(len(clases)), clases]
+        validas = confianzas >= self.confianza
+        cajas, clases, confianzas = cajas[validas], clases[validas], confianzas[validas]
+
+        # (cx, cy, w, h) del lienzo -> (x, y, w, h) para NMS
+        rects = np.column_stack([cajas[:, 0] - cajas[:, 2] / 2, cajas[:, 1] - cajas[:, 3] / 2,
+                                 cajas[:, 2], cajas[:, 3]])
+        indices = cv2.dnn.NMSBoxes(rects.tolist(), confianzas.tolist(), self.confianza, self.nms)
+
+        objetos = []
+        for indice in np.array(indices).flatten():
+            clase = self.clases[clases[indice]] if clases[indice] < len(self.clases) else None
+            nombre = MAPA_CLASES.get(clase)
+            if nombre is None:
+                continue
+            x, y, w, h = rects[indice] / escala
+            objetos.append((
+                nombre, float(confianzas[indice]),
+                float(np.clip(x / ancho, 0, 1)), float(np.clip(y / altura, 0, 1)),
+                float(np.clip((x + w) / ancho, 0, 1)), float(np.clip((y + h) / altura, 0, 1))
+            ))
+        return ResultadoDeteccion(objetos, [], None)
+
+
+# ------------------ SELECCIÓN ------------------ #
+
+BACKENDS = {
+    'vision': DetectorVision,
+    'onnx': DetectorOnnx,
+    'replay': DetectorReplay,
+}
+
+_detector = None
+_lock_detector = threading.Lock()
+
+
+def obtener_detector():
+    """
+    Devuelve el detector del proceso según DETECTOR_BACKEND, creándolo la primera vez.
+
+    Raises:
+        ValueError: si DETECTOR_BACKEND no es un backend conocido
+    """
+    global _detector
+    with _lock_detector:
+        if _detector is None:
+            if DETECTOR_BACKEND not in BACKENDS:
+                raise ValueError(f"DETECTOR_BACKEND desconocido: {DETECTOR_BACKEND} "
+                                 f"(opciones: {', '.join(BACKENDS)})")
+            _detector = BACKENDS[DETECTOR_BACKEND]()
+        return _detector
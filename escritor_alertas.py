@@ -0,0 +1,309 @@
+"""
+Escritor único de alertas con inserciones por lotes (write-behind).
+
+Cualquier hilo encola registros de alerta; un solo hilo escritor los agrupa
+y los inserta con INSERT multi-fila en una transacción: cada lote reúne lo
+que se encoló mientras se escribía el anterior, hasta un máximo de filas.
+Cada llamada recibe un Future que se resuelve con el id de la fila insertada.
+Si el lote falla, sus filas se reintentan una por una: solo fallan los
+Futures cuya propia fila no se pudo insertar.
+
+También actualiza alertas ya encoladas (por ejemplo la confianza de un
+incidente que sigue a la vista): la actualización se escribe en el mismo
+orden de la cola, después de la inserción de su alerta.
+
+Después de cada transacción confirmada avisa a los oyentes registrados con
+registrar_oyente() (p. ej. para invalidar la caché de consultas del portal).
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple
+
+from base_datos import conectar
+
+# ------------------ CONFIGURACIÓN ------------------ #
+ESCRITOR_MAX_LOTE = int(os.environ.get('ESCRITOR_MAX_LOTE', 64))  # Filas por transacción
+ESCRITOR_INTERVALO_MS = int(os.environ.get('ESCRITOR_INTERVALO_MS', 0))  # Espera extra para juntar más filas
+
+COLUMNAS_ALERTA = ('fecha_hora', 'imagen', 'tipo', 'objeto', 'confianza',
+                   'x1', 'y1', 'x2', 'y2', 'ubicacion', 'clip')
+
+# SQLite admite 999 parámetros por sentencia en versiones antiguas
+_FILAS_POR_SENTENCIA = 999 // len(COLUMNAS_ALERTA)
+_SOPORTA_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+_DETENER = object()
+
+_oyentes = []
+
+
+def registrar_oyente(funcion):
+    """
+    Registra funcion(ruta_db), que se llama después de cada transacción de alertas confirmada.
+
+    Corre en el hilo escritor: debe ser rápida y no escribir alertas.
+    """
+    _oyentes.append(funcion)
+
+
+def _notificar(ruta_db):
+    for funcion in list(_oyentes):
+        try:
+            funcion(ruta_db)
+        except Exception as e:
+            print(f"[ESCRITOR] ⚠️ Error en un oyente de {os.path.basename(ruta_db)}: {e}")
+
+
+class _Actualizacion(NamedTuple):
+    alerta: object  # id de la alerta o Future devuelto por encolar()
+    cambios: dict
+
+
+class EscritorAlertas:
+    """Hilo escritor único para la tabla alertas de una base de datos."""
+
+    def __init__(self, ruta_db, max_lote=ESCRITOR_MAX_LOTE, intervalo_ms=ESCRITOR_INTERVALO_MS):
+        self.ruta_db = ruta_db
+        self.max_lote = max(1, max_lote)
+        self.intervalo = intervalo_ms / 1000
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, name=f"escritor-{os.path.basename(ruta_db)}",
+                                      daemon=True)
+        self._contadores = {'filas': 0, 'transacciones': 0, 'actualizaciones': 0, 'errores': 0}
+        self._hilo.start()
+
+    def encolar(self, registro):
+        """
+        Encola una alerta para escribirla en el próximo lote.
+
+        Args:
+            registro: Tupla con los valores de COLUMNAS_ALERTA, en ese orden
+
+        Returns:
+            Future que se resuelve con el id de la alerta insertada
+        """
+        futuro = Future()
+        self._cola.put((tuple(registro), futuro))
+        return futuro
+
+    def actualizar(self, alerta, **cambios):
+        """
+        Encola la actualización de columnas de una alerta.
+
+        Args:
+            alerta: id de la alerta o el Future que devolvió encolar()
+            **cambios: Columnas de COLUMNAS_ALERTA y sus nuevos valores
+
+        Returns:
+            Future que se resuelve con el id de la alerta actualizada (None si no existe)
+        """
+        desconocidas = set(cambios) - set(COLUMNAS_ALERTA)
+        if desconocidas or not cambios:
+            raise ValueError(f"Columnas no válidas para actualizar: {', '.join(sorted(desconocidas)) or 'ninguna'}")
+        futuro = Future()
+        self._cola.put((_Actualizacion(alerta, cambios), futuro))
+        return futuro
+
+    def _bucle(self):
+        conn = conectar(self.ruta_db, timeout=30, isolation_level=None)
+        try:
+            while True:
+                item = self._cola.get()
+                if item is _DETENER:
+                    break
+
+                # Juntar lo que se acumuló mientras se escribía el lote anterior (group commit),
+                # esperando como máximo `intervalo` si la cola se vacía antes de max_lote
+                lote = [item]
+                limite = time.monotonic() + self.intervalo
+                detener = False
+                while len(lote) < self.max_lote:
+                    try:
+                        item = self._cola.get_nowait()
+                    except queue.Empty:
+                        restante = limite - time.monotonic()
+                        if restante <= 0:
+                            break
+                        try:
+                            item = self._cola.get(timeout=restante)
+                        except queue.Empty:
+                            break
+                    if item is _DETENER:
+                        detener = True
+                        break
+                    lote.append(item)
+
+                self._escribir(conn, lote)
+                if detener:
+                    break
+
+            # Vaciar lo que quede antes de salir
+            pendientes = []
+            while True:
+                try:
+                    item = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _DETENER:
+                    pendientes.append(item)
+            for inicio in range(0, len(pendientes), self.max_lote):
+                self._escribir(conn, pendientes[inicio:inicio + self.max_lote])
+        finally:
+            conn.close()
+
+    def _escribir(self, conn, lote):
+        """Inserta un lote en una sola transacción, aplica las actualizaciones y resuelve sus futures."""
+        actualizaciones = [(item, futuro) for item, futuro in lote if isinstance(item, _Actualizacion)]
+        lote = [(item, futuro) for item, futuro in lote if not isinstance(item, _Actualizacion)]
+        registros = [registro for registro, _ in lote if registro]
+        futuros = [futuro for registro, futuro in lote if registro]
+        marcas = [futuro for registro, futuro in lote if not registro]
+
+        if registros:
+            try:
+                ids = []
+                cur = conn.cursor()
+                cur.execute("BEGIN")
+                for inicio in range(0, len(registros), _FILAS_POR_SENTENCIA):
+                    ids.extend(self._insertar(cur, registros[inicio:inicio + _FILAS_POR_SENTENCIA]))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"[ESCRITOR] ⚠️ Error al guardar {len(registros)} alerta(s), reintentando una por una: {e}")
+                self._insertar_por_fila(conn, registros, futuros)
+            else:
+                self._contadores['filas'] += len(registros)
+                self._contadores['transacciones'] += 1
+                _notificar(self.ruta_db)
+                for futuro, alerta_id in zip(futuros, ids):
+                    futuro.set_result(alerta_id)
+
+        # Después de las inserciones: una actualización puede referirse a una alerta de este mismo lote
+        if actualizaciones:
+            self._actualizar(conn, actualizaciones)
+
+        for futuro in marcas:
+            futuro.set_result(None)
+
+    def _insertar_por_fila(self, conn, registros, futuros):
+        """Inserta cada registro en su propia transacción; una fila inválida no arrastra a las demás."""
+        confirmadas = []
+        for registro, futuro in zip(registros, futuros):
+            try:
+                cur = conn.cursor()
+                cur.execute("BEGIN")
+                alerta_id, = self._insertar(cur, [registro])
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                self._contadores['errores'] += 1
+                print(f"[ESCRITOR] ❌ Error al guardar una alerta: {e}")
+                futuro.set_exception(e)
+            else:
+                self._contadores['filas'] += 1
+                self._contadores['transacciones'] += 1
+                confirmadas.append((futuro, alerta_id))
+
+        if confirmadas:
+            _notificar(self.ruta_db)
+        for futuro, alerta_id in confirmadas:
+            futuro.set_result(alerta_id)
+
+    def _actualizar(self, conn, actualizaciones):
+        """Aplica las actualizaciones en una transacción y resuelve sus futures."""
+        aplicadas = []
+        try:
+            cur = conn.cursor()
+            cur.execute("BEGIN")
+            for (alerta, cambios), futuro in actualizaciones:
+                try:
+                    alerta_id = alerta.result(timeout=0) if isinstance(alerta, Future) else alerta
+                except Exception as e:
+                    futuro.set_exception(e)  # La inserción falló: no hay fila que actualizar
+                    continue
+                asignaciones = ", ".join(f"{columna} = ?" for columna in cambios)
+                cur.execute(f"UPDATE alertas SET {asignaciones} WHERE id = ?", (*cambios.values(), alerta_id))
+                aplicadas.append((futuro, alerta_id if cur.rowcount else None))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._contadores['errores'] += 1
+            print(f"[ESCRITOR] ❌ Error al actualizar {len(actualizaciones)} alerta(s): {e}")
+            for _, futuro in actualizaciones:
+                if not futuro.done():
+                    futuro.set_exception(e)
+        else:
+            self._contadores['actualizaciones'] += sum(1 for _, alerta_id in aplicadas if alerta_id is not None)
+            _notificar(self.ruta_db)
+            for futuro, alerta_id in aplicadas:
+                futuro.set_result(alerta_id)
+
+    def _insertar(self, cur, registros):
+        """Inserta registros con una sentencia multi-fila y devuelve sus ids en orden."""
+        columnas = ", ".join(COLUMNAS_ALERTA)
+        marcadores = "(" + ", ".join("?" * len(COLUMNAS_ALERTA)) + ")"
+        parametros = [valor for registro in registros for valor in registro]
+
+        if _SOPORTA_RETURNING:
+            cur.execute(
+                f"INSERT INTO alertas ({columnas}) VALUES {', '.join([marcadores] * len(registros))} RETURNING id",
+                parametros
+            )
+            # Los ids se asignan en el orden de VALUES; RETURNING no garantiza el orden de salida
+            return sorted(fila[0] for fila in cur.fetchall())
+
+        ids = []
+        for registro in registros:
+            cur.execute(f"INSERT INTO alertas ({columnas}) VALUES {marcadores}", registro)
+            ids.append(cur.lastrowid)
+        return ids
+
+    def vaciar(self, timeout=5):
+        """Espera a que todo lo encolado hasta ahora esté escrito."""
+        # Una marca sin datos se resuelve cuando se escribe el lote que la contiene
+        marca = Future()
+        self._cola.put(((), marca))
+        marca.result(timeout=timeout)
+
+    def detener(self, timeout=5):
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        if self._hilo.is_alive():
+            self._cola.put(_DETENER)
+            self._hilo.join(timeout)
+
+    def estadisticas(self):
+        """Devuelve filas escritas, transacciones, actualizaciones, errores y alertas pendientes."""
+        return dict(self._contadores, pendientes=self._cola.qsize())
+
+
+_escritores = {}
+_lock_escritores = threading.Lock()
+
+
+def obtener_escritor(ruta_db):
+    """Devuelve el escritor del proceso para una base de datos, creándolo si no existe."""
+    ruta = os.path.abspath(ruta_db)
+    with _lock_escritores:
+        escritor = _escritores.get(ruta)
+        if escritor is None:
+            escritor = EscritorAlertas(ruta)
+            _escritores[ruta] = escritor
+        return escritor
+
+
+def detener_escritores():
+    """Vacía y detiene todos los escritores (se registra con atexit)."""
+    with _lock_escritores:
+        escritores = list(_escritores.values())
+        _escritores.clear()
+    for escritor in escritores:
+        escritor.detener()
+
+
+atexit.register(detener_escritores)
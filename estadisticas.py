@@ -0,0 +1,287 @@
+"""
+Estadísticas agregadas de las páginas del portal.
+
+Los conteos de alertas se leen de tablas de resumen que SQLite mantiene al
+día con triggers en cada INSERT, DELETE o UPDATE de la tabla alertas:
+
+- resumen_tipo: alertas por tipo
+- resumen_ubicacion: alertas por ubicación
+- resumen_hora: alertas por hora ('YYYY-MM-DDTHH') y nivel de confianza
+
+Así el costo del dashboard, /api/estadisticas y el perfil no crece con el
+historial: leen unas pocas filas de resumen (24 horas, 7 días) en lugar de
+contar millones de alertas. La migración 5 de alertas.db crea las tablas y
+los triggers y las llena; para recalcularlas a mano:
+
+    python estadisticas.py reconstruir [alertas.db]
+
+Cada función devuelve todas las cifras de una página con una sola consulta.
+Donde no hay resumen (reportes, patrullas), cada cifra es un conteo sobre el
+rango de su índice o un solo recorrido con SUM(CASE ...).
+
+Reciben la conexión de la solicitud (base_datos.obtener_conexion) con filas
+sqlite3.Row y devuelven diccionarios con los nombres que usan las plantillas.
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+# Niveles de confianza del dashboard: las mismas condiciones en las consultas,
+# los triggers de los resúmenes y su reconstrucción
+NIVEL_CRITICO = "confianza >= 0.50 OR (confianza IS NULL AND tipo IN ('arma', 'incendio', 'agresion'))"
+NIVEL_INTERMEDIO = "confianza >= 0.20 AND confianza < 0.50"
+NIVEL_BAJO = "confianza < 0.20"
+
+TABLAS_RESUMEN = ('resumen_tipo', 'resumen_ubicacion', 'resumen_hora')
+
+
+def resumen_alertas(conn, desde, por_tipo=True):
+    """
+    Total de alertas, totales por tipo y alertas desde `desde` por nivel de confianza.
+
+    Los totales salen de resumen_tipo. La ventana se parte en las horas
+    completas, que se suman de resumen_hora, y el resto de la hora de inicio,
+    que se cuenta en idx_alertas_fecha: el resultado es exacto al segundo.
+
+    Args:
+        conn: Conexión a alertas.db
+        desde: Fecha ISO de inicio de la ventana reciente (p. ej. hace 24 horas)
+        por_tipo: Si es False omite los totales por tipo (el perfil no los muestra)
+
+    Returns:
+        Diccionario con total_alertas, total_armas, total_incendios,
+        total_agresiones, total_vehiculos (si por_tipo), alertas_24h,
+        alertas_criticas_24h, alertas_intermedias_24h y alertas_bajas_24h
+    """
+    siguiente_hora = (datetime.strptime(desde[:13], '%Y-%m-%dT%H') + timedelta(hours=1)).isoformat()
+    totales_por_tipo = """
+            (SELECT cantidad FROM resumen_tipo WHERE tipo = 'arma') as total_armas,
+            (SELECT cantidad FROM resumen_tipo WHERE tipo = 'incendio') as total_incendios,
+            (SELECT cantidad FROM resumen_tipo WHERE tipo = 'agresion') as total_agresiones,
+            (SELECT cantidad FROM resumen_tipo WHERE tipo = 'vehiculo') as total_vehiculos,""" if por_tipo else ""
+    fila = conn.execute(f"""
+        SELECT
+            (SELECT SUM(cantidad) FROM resumen_tipo) as total_alertas,{totales_por_tipo}
+            SUM(total) as alertas_24h,
+            SUM(criticas) as alertas_criticas_24h,
+            SUM(intermedias) as alertas_intermedias_24h,
+            SUM(bajas) as alertas_bajas_24h
+        FROM (
+            SELECT total, criticas, intermedias, bajas
+            FROM resumen_hora
+            WHERE hora >= ?
+            UNION ALL
+            SELECT
+                COUNT(*),
+                SUM(CASE WHEN {NIVEL_CRITICO} THEN 1 ELSE 0 END),
+                SUM(CASE WHEN {NIVEL_INTERMEDIO} THEN 1 ELSE 0 END),
+                SUM(CASE WHEN {NIVEL_BAJO} THEN 1 ELSE 0 END)
+            FROM alertas
+            WHERE fecha_hora >= ? AND fecha_hora < ?
+        )
+    """, (siguiente_hora[:13], desde, siguiente_hora)).fetchone()
+    # SUM sobre cero filas es NULL
+    return {clave: fila[clave] or 0 for clave in fila.keys()}
+
+
+def alertas_por_tipo(conn):
+    """Diccionario tipo -> cantidad de alertas (los tipos sin alertas no aparecen)."""
+    return {fila['tipo']: fila['cantidad']
+            for fila in conn.execute("SELECT tipo, cantidad FROM resumen_tipo WHERE cantidad > 0")}
+
+
+def alertas_por_dia(conn, dias=7):
+    """
+    Alertas por día desde hace `dias` días, para el gráfico del dashboard.
+
+    Returns:
+        Lista de {'fecha': 'YYYY-MM-DD', 'cantidad': n} en orden de fecha
+    """
+    return [dict(fila) for fila in conn.execute("""
+        SELECT substr(hora, 1, 10) as fecha, SUM(total) as cantidad
+        FROM resumen_hora
+        WHERE hora >= date('now', ?)
+        GROUP BY fecha
+        HAVING cantidad > 0
+        ORDER BY fecha
+    """, (f"-{int(dias)} days",))]
+
+
+def ubicaciones_con_alertas(conn):
+    """Ubicaciones que tienen al menos una alerta, en orden alfabético."""
+    return [fila[0] for fila in conn.execute(
+        "SELECT ubicacion FROM resumen_ubicacion WHERE cantidad > 0 ORDER BY ubicacion")]
+
+
+def resumen_reportes_usuarios(conn, usuario_id=None):
+    """
+    Reportes de usuarios autorizados por estado, de todos o de un usuario.
+
+    Sin usuario, cada estado es un conteo sobre su rango de
+    idx_reportes_usuarios_estado; con usuario, un recorrido de sus reportes en
+    idx_reportes_usuarios_usuario.
+
+    Returns:
+        Diccionario con total_reportes, reportes_pendientes,
+        reportes_en_revision y reportes_resueltos
+    """
+    if usuario_id is None:
+        fila = conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM reportes_usuarios) as total_reportes,
+                (SELECT COUNT(*) FROM reportes_usuarios WHERE estado = 'pendiente') as reportes_pendientes,
+                (SELECT COUNT(*) FROM reportes_usuarios WHERE estado = 'en_revision') as reportes_en_revision,
+                (SELECT COUNT(*) FROM reportes_usuarios WHERE estado = 'resuelto') as reportes_resueltos
+        """).fetchone()
+    else:
+        fila = conn.execute("""
+            SELECT
+                COUNT(*) as total_reportes,
+                SUM(CASE WHEN estado = 'pendiente' THEN 1 ELSE 0 END) as reportes_pendientes,
+                SUM(CASE WHEN estado = 'en_revision' THEN 1 ELSE 0 END) as reportes_en_revision,
+                SUM(CASE WHEN estado = 'resuelto' THEN 1 ELSE 0 END) as reportes_resueltos
+            FROM reportes_usuarios
+            WHERE usuario_id = ?
+        """, (usuario_id,)).fetchone()
+    return {clave: fila[clave] or 0 for clave in fila.keys()}
+
+
+def resumen_patrullas(conn):
+    """
+    Patrullas en total y por estado, en un solo recorrido de la tabla.
+
+    Returns:
+        Diccionario con total_patrullas, patrullas_activas,
+        patrullas_disponibles y patrullas_en_ruta
+    """
+    fila = conn.execute("""
+        SELECT
+            COUNT(*) as total_patrullas,
+            SUM(CASE WHEN estado = 'activa' THEN 1 ELSE 0 END) as patrullas_activas,
+            SUM(CASE WHEN estado = 'disponible' THEN 1 ELSE 0 END) as patrullas_disponibles,
+            SUM(CASE WHEN estado = 'en_ruta' THEN 1 ELSE 0 END) as patrullas_en_ruta
+        FROM patrullas
+    """).fetchone()
+    return {clave: fila[clave] or 0 for clave in fila.keys()}
+
+
+# ------------------ TABLAS DE RESUMEN ------------------ #
+
+def _sumar_resumenes(origen, signo):
+    """
+    Sentencias que suman (signo 1) o restan (signo -1) las alertas de `origen` a los resúmenes.
+
+    `origen` es la tabla alertas (reconstrucción) o la fila NEW/OLD de un
+    trigger como subconsulta. El "WHERE true" evita que SQLite lea el
+    ON CONFLICT como parte del SELECT.
+    """
+    return [
+        f"""INSERT INTO resumen_tipo (tipo, cantidad)
+            SELECT tipo, {signo} * COUNT(*) FROM {origen} WHERE true GROUP BY tipo
+            ON CONFLICT (tipo) DO UPDATE SET cantidad = cantidad + excluded.cantidad""",
+        f"""INSERT INTO resumen_ubicacion (ubicacion, cantidad)
+            SELECT ubicacion, {signo} * COUNT(*) FROM {origen} WHERE ubicacion IS NOT NULL GROUP BY ubicacion
+            ON CONFLICT (ubicacion) DO UPDATE SET cantidad = cantidad + excluded.cantidad""",
+        f"""INSERT INTO resumen_hora (hora, total, criticas, intermedias, bajas)
+            SELECT substr(fecha_hora, 1, 13) as hora,
+                   {signo} * COUNT(*),
+                   {signo} * SUM(CASE WHEN {NIVEL_CRITICO} THEN 1 ELSE 0 END),
+                   {signo} * SUM(CASE WHEN {NIVEL_INTERMEDIO} THEN 1 ELSE 0 END),
+                   {signo} * SUM(CASE WHEN {NIVEL_BAJO} THEN 1 ELSE 0 END)
+            FROM {origen} WHERE true GROUP BY hora
+            ON CONFLICT (hora) DO UPDATE SET
+                total = total + excluded.total,
+                criticas = criticas + excluded.criticas,
+                intermedias = intermedias + excluded.intermedias,
+                bajas = bajas + excluded.bajas""",
+    ]
+
+
+def _fila_trigger(fila):
+    """La fila NEW u OLD de un trigger como subconsulta con las columnas que usan los resúmenes."""
+    return (f"(SELECT {fila}.fecha_hora as fecha_hora, {fila}.tipo as tipo, "
+            f"{fila}.confianza as confianza, {fila}.ubicacion as ubicacion)")
+
+
+def instalar_resumenes(conn):
+    """
+    Crea las tablas de resumen y los triggers que las mantienen (si faltan).
+
+    Las filas con cantidad 0 (todas sus alertas se borraron) se conservan y
+    las consultas las filtran.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_tipo (
+            tipo TEXT PRIMARY KEY,
+            cantidad INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_ubicacion (
+            ubicacion TEXT PRIMARY KEY,
+            cantidad INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_hora (
+            hora TEXT PRIMARY KEY,
+            total INTEGER NOT NULL,
+            criticas INTEGER NOT NULL,
+            intermedias INTEGER NOT NULL,
+            bajas INTEGER NOT NULL
+        )
+    """)
+    nueva, vieja = _fila_trigger('NEW'), _fila_trigger('OLD')
+    triggers = [
+        ('resumen_alertas_insertar', "AFTER INSERT ON alertas", _sumar_resumenes(nueva, 1)),
+        ('resumen_alertas_borrar', "AFTER DELETE ON alertas", _sumar_resumenes(vieja, -1)),
+        # El deduplicador de incidentes sube la confianza de alertas ya guardadas
+        ('resumen_alertas_actualizar', "AFTER UPDATE OF fecha_hora, tipo, confianza, ubicacion ON alertas",
+         _sumar_resumenes(vieja, -1) + _sumar_resumenes(nueva, 1)),
+    ]
+    for nombre, evento, sentencias in triggers:
+        cuerpo = "".join(f"{sentencia};\n" for sentencia in sentencias)
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {nombre} {evento} BEGIN\n{cuerpo}END")
+
+
+def reconstruir_resumenes(conn):
+    """
+    Recalcula las tablas de resumen desde la tabla alertas.
+
+    Para el llenado inicial o para repararlas; la transacción la maneja el
+    llamador (ver main()).
+    """
+    for tabla in TABLAS_RESUMEN:
+        conn.execute(f"DELETE FROM {tabla}")
+    for sentencia in _sumar_resumenes('alertas', 1):
+        conn.execute(sentencia)
+
+
+def main():
+    from base_datos import conectar
+
+    parser = argparse.ArgumentParser(description="Tablas de resumen de alertas.db")
+    parser.add_argument('accion', choices=['reconstruir'], help="Recalcular los resúmenes desde la tabla alertas")
+    parser.add_argument('db', nargs='?', default='alertas.db', help="Archivo de la base de alertas")
+    args = parser.parse_args()
+
+    conn = conectar(args.db, isolation_level=None)
+    try:
+        # IMMEDIATE: las alertas que lleguen mientras tanto esperan y entran ya con los triggers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            instalar_resumenes(conn)
+            reconstruir_resumenes(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for tabla in TABLAS_RESUMEN:
+            filas = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+            print(f"[RESUMENES] {args.db}: {tabla} reconstruida ({filas} filas)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Clips de video antes y después de una alerta de cámara.
+
+Cada cámara guarda en memoria los últimos segundos de video como JPEG
+reducidos en un buffer circular limitado en bytes (CLIPS_MEMORIA_MB). Cuando
+se dispara una alerta, se reserva la ruta del clip (que se guarda con la
+alerta) y, cuando pasaron los segundos posteriores, un hilo en segundo plano
+codifica los frames anteriores y posteriores en un MP4. La captura nunca
+espera a la codificación.
+
+El MP4 se codifica con el primer códec de CLIPS_CODECS que acepte OpenCV:
+H.264 (avc1) se reproduce en el navegador; mp4v queda como respaldo para
+instalaciones sin H.264, pero esos clips solo se pueden descargar.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# ------------------ CONFIGURACIÓN ------------------ #
+CLIPS_ACTIVOS = os.environ.get('CLIPS_ACTIVOS', '1') == '1'
+CLIPS_DIR = os.environ.get('CLIPS_DIR', 'alertas_clips')
+CLIPS_SEGUNDOS_ANTES = float(os.environ.get('CLIPS_SEGUNDOS_ANTES', 10))
+CLIPS_SEGUNDOS_DESPUES = float(os.environ.get('CLIPS_SEGUNDOS_DESPUES', 10))
+CLIPS_FPS = float(os.environ.get('CLIPS_FPS', 10))  # Frames por segundo guardados en el buffer
+CLIPS_ANCHO = int(os.environ.get('CLIPS_ANCHO', 640))  # Ancho de los frames guardados (px)
+CLIPS_CALIDAD_JPEG = int(os.environ.get('CLIPS_CALIDAD_JPEG', 70))
+CLIPS_MEMORIA_MB = float(os.environ.get('CLIPS_MEMORIA_MB', 32))  # Memoria máxima del buffer por cámara
+# Tipos de alerta que generan clip (separados por comas)
+CLIPS_TIPOS = tuple(tipo.strip() for tipo in os.environ.get('CLIPS_TIPOS', 'arma,agresion').split(',') if tipo.strip())
+# Códecs FourCC en orden de preferencia (separados por comas)
+CLIPS_CODECS = tuple(codec.strip() for codec in os.environ.get('CLIPS_CODECS', 'avc1,mp4v').split(',') if codec.strip())
+
+
+class GrabadorClips:
+    """
+    Buffer circular de frames comprimidos y codificador de clips en segundo plano.
+
+    agregar() se llama desde el hilo que recibe los frames; solicitar_clip()
+    desde el que procesa las alertas. Los MP4 los escribe un hilo propio.
+    """
+
+    def __init__(self, nombre="camara", fps=CLIPS_FPS, ancho=CLIPS_ANCHO, calidad=CLIPS_CALIDAD_JPEG,
+                 memoria_mb=CLIPS_MEMORIA_MB, antes=CLIPS_SEGUNDOS_ANTES, despues=CLIPS_SEGUNDOS_DESPUES,
+                 directorio=CLIPS_DIR, codecs=CLIPS_CODECS):
+        self.nombre = nombre
+        self.fps = fps
+        self.ancho = ancho
+        self.calidad = calidad
+        self.memoria_max = int(memoria_mb * 1024 * 1024)
+        self.antes = antes
+        self.despues = despues
+        self.directorio = directorio
+        self.codecs = codecs
+        self._codec = None  # El primero que abrió OpenCV; se reutiliza en los clips siguientes
+
+        self._lock = threading.Lock()
+        self._frames = deque()  # (marca de tiempo, JPEG)
+        self._bytes = 0
+        self._ultimo = 0.0
+        self._pendientes = []  # (ruta, inicio, fin) esperando los segundos posteriores
+        self._cola = queue.Queue()
+        self._contadores = {'frames': 0, 'descartados_memoria': 0, 'clips': 0, 'errores': 0}
+        self._hilo = threading.Thread(target=self._bucle_escritura, name=f"clips-{nombre}", daemon=True)
+        self._hilo.start()
+
+    def agregar(self, frame_bgr, ahora=None):
+        """
+        Guarda el frame en el buffer (como mucho `fps` por segundo) y entrega
+        al escritor los clips cuyo tiempo posterior ya pasó.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        if ahora - self._ultimo < 1.0 / self.fps:
+            self._entregar_listos(ahora)
+            return
+        self._ultimo = ahora
+
+        altura, ancho = frame_bgr.shape[:2]
+        if ancho > self.ancho:
+            frame_bgr = cv2.resize(frame_bgr, (self.ancho, round(altura * self.ancho / ancho)),
+                                   interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode('.jpg', frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, self.calidad])
+        if not ok:
+            return
+        datos = jpeg.tobytes()
+
+        with self._lock:
+            self._frames.append((ahora, datos))
+            self._bytes += len(datos)
+            self._contadores['frames'] += 1
+            # Límite de memoria y de antigüedad: no hace falta más que antes + después
+            while self._frames and (self._bytes > self.memoria_max
+                                    or ahora - self._frames[0][0] > self.antes + self.despues):
+                marca, viejo = self._frames.popleft()
+                self._bytes -= len(viejo)
+                if ahora - marca <= self.antes + self.despues:
+                    self._contadores['descartados_memoria'] += 1
+        self._entregar_listos(ahora)
+
+    def solicitar_clip(self, prefijo="clip", ahora=None):
+        """
+        Reserva un clip alrededor de este momento.
+
+        Returns:
+            Ruta del MP4 que se escribirá cuando pasen CLIPS_SEGUNDOS_DESPUES
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f"{prefijo}_{datetime.now():%Y%m%d_%H%M%S_%f}.mp4")
+        with self._lock:
+            self._pendientes.append((ruta, ahora - self.antes, ahora + self.despues))
+        return ruta
+
+    def _entregar_listos(self, ahora):
+        with self._lock:
+            if not self._pendientes:
+                return
+            listos = [clip for clip in self._pendientes if clip[2] <= ahora]
+            if not listos:
+                return
+            self._pendientes = [clip for clip in self._pendientes if clip[2] > ahora]
+            for ruta, inicio, fin in listos:
+                frames = [datos for marca, datos in self._frames if inicio <= marca <= fin]
+                self._cola.put((ruta, frames))
+
+    def _bucle_escritura(self):
+        while True:
+            item = self._cola.get()
+            if item is None:
+                break
+            ruta, frames = item
+            try:
+                self._escribir_mp4(ruta, frames)
+                self._contadores['clips'] += 1
+            except Exception as e:
+                self._contadores['errores'] += 1
+                print(f"[CLIPS] ❌ No se pudo escribir {ruta}: {e}")
+
+    def _escribir_mp4(self, ruta, frames):
+        if not frames:
+            raise ValueError("no hay frames en el buffer para ese momento")
+        primero = cv2.imdecode(np.frombuffer(frames[0], dtype=np.uint8), cv2.IMREAD_COLOR)
+        altura, ancho = primero.shape[:2]
+        escritor = self._abrir_escritor(ruta, ancho, altura)
+        try:
+            escritor.write(primero)
+            for datos in frames[1:]:
+                escritor.write(cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR))
+        finally:
+            escritor.release()
+        print(f"[CLIPS] 🎞️ Clip guardado: {ruta} ({len(frames)} frames)")
+
+    def _abrir_escritor(self, ruta, ancho, altura):
+        """Abre el VideoWriter con el primer códec de self.codecs que acepte esta instalación de OpenCV."""
+        codecs = (self._codec,) if self._codec else self.codecs
+        for codec in codecs:
+            escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*codec), self.fps, (ancho, altura))
+            if escritor.isOpened():
+                if self._codec is None:
+                    self._codec = codec
+                    if codec != 'avc1':
+                        print(f"[CLIPS] ⚠️ H.264 (avc1) no disponible en OpenCV: los clips se guardan con {codec} "
+                              f"y el navegador los descarga en vez de reproducirlos")
+                return escritor
+            escritor.release()
+        raise RuntimeError(f"OpenCV no pudo abrir ningún códec MP4 ({', '.join(codecs)})")
+
+    def detener(self, timeout=30):
+        """Escribe los clips pendientes con los frames que haya y detiene el escritor."""
+        self._entregar_listos(float('inf'))
+        self._cola.put(None)
+        self._hilo.join(timeout)
+
+    def estadisticas(self):
+        """
+        Devuelve el uso de memoria del buffer y los clips escritos.
+
+        Returns:
+            Diccionario con frames y MB en memoria, límite, segundos cubiertos,
+            frames descartados por memoria, clips escritos, pendientes, errores y códec
+        """
+        with self._lock:
+            segundos = self._frames[-1][0] - self._frames[0][0] if len(self._frames) > 1 else 0.0
+            return dict(
+                self._contadores,
+                frames_en_memoria=len(self._frames),
+                memoria_mb=round(self._bytes / (1024 * 1024), 2),
+                memoria_max_mb=round(self.memoria_max / (1024 * 1024), 2),
+                segundos_en_memoria=round(segundos, 1),
+                clips_pendientes=len(self._pendientes) + self._cola.qsize(),
+                codec=self._codec
+            )
@@ -0,0 +1,277 @@
+"""
+Migraciones versionadas de las bases SQLite (alertas.db, usuarios.db, poblacion.db).
+
+Cada base guarda su versión de esquema en PRAGMA user_version. aplicar()
+ejecuta solo las migraciones con número mayor, cada una en su transacción
+junto con el cambio de versión, así una base al día no repite ningún
+CREATE ni ALTER al importar app.py o analizador.py.
+
+Las primeras migraciones de cada base reproducen el esquema que antes se
+creaba en cada arranque y son idempotentes: una base existente en versión 0
+queda igual y solo gana lo que le falte.
+
+Para agregar un cambio de esquema, agregar una migración al final de la lista
+de su base con el número siguiente; nunca modificar una ya publicada.
+"""
+
+from base_datos import conectar
+from estadisticas import instalar_resumenes, reconstruir_resumenes
+
+
+def _columnas(conn, tabla):
+    return {fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")}
+
+
+def _agregar_columna(conn, tabla, columna, tipo):
+    """Agrega la columna si falta. Devuelve True si la agregó."""
+    if columna in _columnas(conn, tabla):
+        return False
+    conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+    return True
+
+
+# ------------------ alertas.db ------------------ #
+
+def _alertas_tabla(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alertas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha_hora TEXT NOT NULL,
+            imagen TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            objeto TEXT NOT NULL,
+            confianza REAL NOT NULL,
+            x1 REAL,
+            y1 REAL,
+            x2 REAL,
+            y2 REAL,
+            ubicacion TEXT
+        )
+    """)
+    # Bases anteriores a la columna 'tipo': deducirlo del objeto
+    if _agregar_columna(conn, 'alertas', 'tipo', 'TEXT'):
+        conn.execute("""
+            UPDATE alertas
+            SET tipo = CASE
+                WHEN objeto LIKE 'incendio:%' THEN 'incendio'
+                WHEN objeto IN ('gun', 'knife', 'weapon', 'firearm', 'rifle')
+                     OR objeto LIKE '%gun%' OR objeto LIKE '%knife%'
+                     OR objeto LIKE '%weapon%' OR objeto LIKE '%firearm%'
+                     OR objeto LIKE '%rifle%' THEN 'arma'
+                ELSE 'otro'
+            END
+            WHERE tipo IS NULL
+        """)
+    _agregar_columna(conn, 'alertas', 'ubicacion', 'TEXT')
+
+
+def _alertas_clip(conn):
+    # Ruta del video antes/después de las alertas de cámara (grabador_clips.py)
+    _agregar_columna(conn, 'alertas', 'clip', 'TEXT')
+
+
+def _alertas_tablas_portal(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS patrullas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_patrulla TEXT UNIQUE NOT NULL,
+            tipo TEXT NOT NULL,
+            zona TEXT NOT NULL,
+            municipio TEXT NOT NULL,
+            departamento TEXT NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'disponible',
+            latitud REAL,
+            longitud REAL,
+            oficial_encargado TEXT,
+            telefono TEXT,
+            ultima_actualizacion TEXT,
+            observaciones TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reportes_usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            imagen TEXT NOT NULL,
+            descripcion TEXT,
+            ubicacion TEXT,
+            tipo_reporte TEXT,
+            fecha_hora TEXT NOT NULL,
+            estado TEXT DEFAULT 'pendiente',
+            FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS destinatarios_alertas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ubicacion TEXT NOT NULL,
+            nombre TEXT NOT NULL,
+            email TEXT,
+            telefono TEXT,
+            activo INTEGER DEFAULT 1,
+            fecha_creacion TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS historial_envios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            alerta_id INTEGER,
+            destinatario_id INTEGER,
+            ubicacion TEXT NOT NULL,
+            tipo_alerta TEXT NOT NULL,
+            fecha_envio TEXT NOT NULL,
+            estado TEXT DEFAULT 'enviado',
+            FOREIGN KEY (destinatario_id) REFERENCES destinatarios_alertas(id)
+        )
+    """)
+
+
+def _alertas_indices(conn):
+    # Ventanas de tiempo del dashboard, perfil y portal (últimas 24 h por nivel de
+    # confianza, alertas graves con ubicación): el índice cubre la consulta completa
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alertas_fecha "
+                 "ON alertas (fecha_hora, confianza, tipo, ubicacion)")
+    # Conteos y filtros por tipo (dashboard, /api/estadisticas, /alertas?tipo=): dentro de
+    # un tipo las entradas quedan ordenadas por id, como el ORDER BY id DESC de los listados
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alertas_tipo ON alertas (tipo)")
+    # Ubicaciones existentes (configurar_alertas)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alertas_ubicacion ON alertas (ubicacion)")
+    # Reportes del usuario ordenados por fecha (perfil) y conteos por estado (admin)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reportes_usuarios_usuario "
+                 "ON reportes_usuarios (usuario_id, fecha_hora)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reportes_usuarios_estado ON reportes_usuarios (estado)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reportes_usuarios_imagen ON reportes_usuarios (imagen)")
+    # Destinatarios activos de una ubicación (envío de cada alerta crítica)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_destinatarios_ubicacion "
+                 "ON destinatarios_alertas (ubicacion, activo)")
+    # Historial de envíos recientes
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_historial_fecha ON historial_envios (fecha_envio)")
+
+
+def _alertas_resumenes(conn):
+    # Conteos por tipo, ubicación, hora y nivel de confianza mantenidos por triggers
+    # (estadisticas.py); el llenado inicial recorre una vez las alertas existentes
+    instalar_resumenes(conn)
+    reconstruir_resumenes(conn)
+
+
+MIGRACIONES_ALERTAS = [
+    (1, "tabla alertas con columnas tipo y ubicacion", _alertas_tabla),
+    (2, "columna clip de alertas", _alertas_clip),
+    (3, "tablas de patrullas, reportes, destinatarios e historial de envíos", _alertas_tablas_portal),
+    (4, "índices secundarios de las consultas del portal", _alertas_indices),
+    (5, "tablas de resumen de alertas con triggers", _alertas_resumenes),
+]
+
+
+# ------------------ usuarios.db ------------------ #
+
+def _usuarios_tabla(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            correo TEXT UNIQUE NOT NULL,
+            contraseña TEXT NOT NULL,
+            nombre TEXT NOT NULL,
+            fecha_registro TEXT NOT NULL,
+            rol TEXT DEFAULT 'usuario'
+        )
+    """)
+    _agregar_columna(conn, 'usuarios', 'rol', "TEXT DEFAULT 'usuario'")
+
+
+MIGRACIONES_USUARIOS = [
+    (1, "tabla usuarios con rol", _usuarios_tabla),
+]
+
+
+# ------------------ poblacion.db ------------------ #
+
+def _poblacion_tablas(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios_poblacion (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            correo TEXT UNIQUE NOT NULL,
+            contraseña TEXT NOT NULL,
+            nombre TEXT NOT NULL,
+            telefono TEXT,
+            fecha_registro TEXT NOT NULL,
+            ultima_sesion TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reportes_poblacion (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            imagen TEXT NOT NULL,
+            descripcion TEXT,
+            ubicacion TEXT,
+            tipo_reporte TEXT,
+            fecha_hora TEXT NOT NULL,
+            estado TEXT DEFAULT 'pendiente',
+            FOREIGN KEY (usuario_id) REFERENCES usuarios_poblacion(id)
+        )
+    """)
+
+
+def _poblacion_indices(conn):
+    # Reportes del usuario ordenados por fecha y sus conteos (poblacion_perfil)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reportes_poblacion_usuario "
+                 "ON reportes_poblacion (usuario_id, fecha_hora)")
+
+
+MIGRACIONES_POBLACION = [
+    (1, "tablas de usuarios y reportes de la población", _poblacion_tablas),
+    (2, "índice de reportes por usuario", _poblacion_indices),
+]
+
+
+# ------------------ EJECUCIÓN ------------------ #
+
+def version(conn):
+    """Versión de esquema de la base (PRAGMA user_version)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aplicar(ruta, migraciones):
+    """
+    Lleva la base a la última versión de `migraciones`.
+
+    Cada migración pendiente corre en una transacción IMMEDIATE junto con el
+    cambio de user_version; si otro proceso migró primero, la versión se
+    vuelve a leer dentro de la transacción y no se repite nada.
+
+    Args:
+        ruta: Archivo de la base de datos
+        migraciones: Lista de (número, descripción, función(conn)) en orden
+
+    Returns:
+        Números de las migraciones aplicadas (vacía si la base ya estaba al día)
+    """
+    ultima = migraciones[-1][0]
+    conn = conectar(ruta, isolation_level=None)
+    aplicadas = []
+    try:
+        if version(conn) >= ultima:
+            return aplicadas
+        for numero, descripcion, funcion in migraciones:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version(conn) >= numero:
+                    conn.execute("COMMIT")
+                    continue
+                funcion(conn)
+                conn.execute(f"PRAGMA user_version = {int(numero)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            aplicadas.append(numero)
+            print(f"[MIGRACIONES] {ruta}: v{numero} {descripcion}")
+        if aplicadas:
+            # Estadísticas (por muestreo) para que el planificador elija los índices nuevos
+            conn.execute("PRAGMA analysis_limit = 1000")
+            conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return aplicadas
@@ -0,0 +1,183 @@
+"""
+Detector local de movimiento para decidir cuándo vale la pena analizar un frame.
+
+Compara cada frame, reducido y en escala de grises, con un fondo que se
+actualiza como media móvil (cv2.accumulateWeighted). La fracción de píxeles
+que cambiaron es la "actividad" de la escena: si supera el umbral se analiza
+el frame; si no, la llamada al detector se suprime. Siempre se respeta un
+intervalo mínimo entre análisis y se fuerza uno cada intervalo máximo, para
+que una escena quieta no quede sin revisar indefinidamente.
+"""
+
+import os
+import threading
+import time
+
+import cv2
+
+# ------------------ CONFIGURACIÓN ------------------ #
+MOVIMIENTO_ACTIVO = os.environ.get('MOVIMIENTO_ACTIVO', '1') == '1'
+MOVIMIENTO_ANCHO = int(os.environ.get('MOVIMIENTO_ANCHO', 160))  # Ancho del frame reducido (px)
+MOVIMIENTO_DIFERENCIA = int(os.environ.get('MOVIMIENTO_DIFERENCIA', 25))  # Cambio de gris que cuenta como movimiento
+MOVIMIENTO_UMBRAL = float(os.environ.get('MOVIMIENTO_UMBRAL', 0.02))  # Fracción de píxeles en movimiento
+MOVIMIENTO_APRENDIZAJE = float(os.environ.get('MOVIMIENTO_APRENDIZAJE', 0.05))  # Peso de cada frame en el fondo
+# Intervalos entre análisis en segundos ('' = el intervalo del detector como mínimo, 30 s como máximo)
+MOVIMIENTO_INTERVALO_MIN = os.environ.get('MOVIMIENTO_INTERVALO_MIN', '')
+MOVIMIENTO_INTERVALO_MAX = float(os.environ.get('MOVIMIENTO_INTERVALO_MAX', 30))
+
+
+class DetectorMovimiento:
+    """Fondo por media móvil sobre frames reducidos en escala de grises."""
+
+    def __init__(self, ancho=MOVIMIENTO_ANCHO, diferencia=MOVIMIENTO_DIFERENCIA, aprendizaje=MOVIMIENTO_APRENDIZAJE):
+        self.ancho = ancho
+        self.diferencia = diferencia
+        self.aprendizaje = aprendizaje
+        self._fondo = None
+
+    def actividad(self, frame_bgr):
+        """
+        Calcula la actividad del frame respecto al fondo y actualiza el fondo.
+
+        Returns:
+            Fracción (0-1) de píxeles que cambiaron; 1.0 en el primer frame
+        """
+        altura, ancho = frame_bgr.shape[:2]
+        escala = self.ancho / ancho
+        pequeno = cv2.resize(frame_bgr, (self.ancho, max(1, round(altura * escala))), interpolation=cv2.INTER_AREA)
+        gris = cv2.GaussianBlur(cv2.cvtColor(pequeno, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self._fondo is None or self._fondo.shape != gris.shape:
+            self._fondo = gris.astype('float32')
+            return 1.0
+
+        cambio = cv2.absdiff(gris, cv2.convertScaleAbs(self._fondo))
+        _, mascara = cv2.threshold(cambio, self.diferencia, 255, cv2.THRESH_BINARY)
+        cv2.accumulateWeighted(gris, self._fondo, self.aprendizaje)
+        return cv2.countNonZero(mascara) / mascara.size
+
+
+class PuertaMovimiento:
+    """
+    Decide si un frame se analiza según la actividad y los intervalos mínimo y máximo.
+
+    Lleva la cuenta de las llamadas suprimidas respecto a un análisis fijo cada
+    `intervalo_referencia` segundos (el comportamiento anterior), para medir el ahorro.
+    """
+
+    def __init__(self, intervalo_min, intervalo_max=MOVIMIENTO_INTERVALO_MAX, umbral=MOVIMIENTO_UMBRAL,
+                 intervalo_referencia=None, activa=MOVIMIENTO_ACTIVO, detector=None):
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = max(intervalo_max, intervalo_min)
+        self.umbral = umbral
+        self.intervalo_referencia = intervalo_referencia or intervalo_min
+        self.activa = activa
+        self.detector = detector or DetectorMovimiento()
+        self._inicio = None
+        self._ultimo_analisis = None
+        self._anterior = None
+        self._lock = threading.Lock()
+        self._contadores = {'evaluados': 0, 'por_movimiento': 0, 'por_maximo': 0, 'por_seguimiento': 0}
+        self.ultima_actividad = 0.0
+
+    def debe_analizar(self, frame_bgr, ahora=None, forzar=False):
+        """
+        Evalúa un frame.
+
+        Args:
+            frame_bgr: Frame BGR de la cámara
+            ahora: Marca de tiempo (time.monotonic() por defecto)
+            forzar: Analizar aunque no haya movimiento (lo pide el seguimiento de objetos);
+                    el intervalo mínimo se respeta igual
+
+        Returns:
+            (analizar, motivo) con motivo 'movimiento', 'maximo', 'seguimiento',
+            'intervalo' (puerta desactivada) o None si se suprime
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        if self._inicio is None:
+            self._inicio = ahora
+        desde_ultimo = float('inf') if self._ultimo_analisis is None else ahora - self._ultimo_analisis
+        if desde_ultimo < self.intervalo_min:
+            return False, None
+
+        if not self.activa:
+            motivo = 'intervalo'
+        else:
+            self.ultima_actividad = self.detector.actividad(frame_bgr)
+            if self.ultima_actividad >= self.umbral:
+                motivo = 'movimiento'
+            elif forzar:
+                motivo = 'seguimiento'
+            elif desde_ultimo >= self.intervalo_max:
+                motivo = 'maximo'
+            else:
+                motivo = None
+
+        with self._lock:
+            self._contadores['evaluados'] += 1
+            if motivo == 'movimiento':
+                self._contadores['por_movimiento'] += 1
+            elif motivo == 'seguimiento':
+                self._contadores['por_seguimiento'] += 1
+            elif motivo in ('maximo', 'intervalo'):
+                self._contadores['por_maximo'] += 1
+        if motivo:
+            self._anterior = self._ultimo_analisis
+            self._ultimo_analisis = ahora
+        return motivo is not None, motivo
+
+    def devolver(self, motivo):
+        """
+        Anula el último análisis concedido cuando al final no se hizo (p. ej. sin presupuesto).
+
+        El frame no cuenta como analizado: los intervalos mínimo y máximo siguen
+        contando desde el análisis anterior.
+
+        Args:
+            motivo: El motivo que devolvió debe_analizar()
+        """
+        self._ultimo_analisis = self._anterior
+        with self._lock:
+            if motivo == 'movimiento':
+                self._contadores['por_movimiento'] -= 1
+            elif motivo == 'seguimiento':
+                self._contadores['por_seguimiento'] -= 1
+            elif motivo in ('maximo', 'intervalo'):
+                self._contadores['por_maximo'] -= 1
+
+    def estadisticas(self, ahora=None):
+        """
+        Devuelve análisis realizados y suprimidos.
+
+        Returns:
+            Diccionario con frames evaluados, análisis por movimiento, por seguimiento
+            y por intervalo máximo, análisis que habría hecho el intervalo fijo, suprimidos y ahorro
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            contadores = dict(self._contadores)
+        analisis = contadores['por_movimiento'] + contadores['por_maximo'] + contadores['por_seguimiento']
+        transcurrido = (ahora - self._inicio) if self._inicio is not None else 0.0
+        referencia = int(transcurrido // self.intervalo_referencia) + 1 if self._inicio is not None else 0
+        suprimidos = max(0, referencia - analisis)
+        return dict(
+            contadores,
+            analisis=analisis,
+            analisis_intervalo_fijo=referencia,
+            suprimidos=suprimidos,
+            ahorro=(suprimidos / referencia) if referencia else 0.0,
+            ultima_actividad=self.ultima_actividad
+        )
+
+
+def crear_puerta(intervalo_detector):
+    """
+    Crea la puerta de movimiento de una cámara con la configuración del entorno.
+
+    Args:
+        intervalo_detector: Intervalo fijo usado hasta ahora (referencia para el ahorro
+                            y mínimo por defecto, para no superar nunca ese ritmo de llamadas)
+    """
+    intervalo_min = float(MOVIMIENTO_INTERVALO_MIN) if MOVIMIENTO_INTERVALO_MIN else intervalo_detector
+    return PuertaMovimiento(intervalo_min, intervalo_referencia=intervalo_detector)
@@ -0,0 +1,150 @@
+"""
+Normalización de imágenes antes de enviarlas a Google Vision.
+
+Decodifica una sola vez, limita el lado mayor, descarta metadatos (EXIF, ICC)
+y vuelve a codificar en JPEG. Las zonas transparentes se componen sobre fondo
+blanco: convertidas directo a RGB quedan negras y pueden ocultar objetos. Vision devuelve coordenadas normalizadas (0-1)
+y el reescalado conserva la relación de aspecto, así que los bounding boxes
+siguen aplicándose directamente sobre la imagen original.
+"""
+
+import io
+import os
+import threading
+import time
+
+import cv2
+from PIL import Image
+
+# ------------------ CONFIGURACIÓN ------------------ #
+NORMALIZACION_ACTIVA = os.environ.get('NORMALIZACION_ACTIVA', '1') == '1'
+LADO_MAXIMO = int(os.environ.get('NORMALIZACION_LADO_MAXIMO', 1024))  # Píxeles del lado mayor
+CALIDAD_JPEG = int(os.environ.get('NORMALIZACION_CALIDAD_JPEG', 85))
+
+# Claves de Image.info con metadatos que no deben llegar a Vision (ubicación GPS, cámara, autor)
+_CLAVES_METADATOS = ('exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+_totales = {'imagenes': 0, 'bytes_antes': 0, 'bytes_despues': 0, 'ms_codificacion': 0.0}
+_lock_totales = threading.Lock()
+
+
+def _registrar(metricas):
+    with _lock_totales:
+        _totales['imagenes'] += 1
+        _totales['bytes_antes'] += metricas['bytes_antes']
+        _totales['bytes_despues'] += metricas['bytes_despues']
+        _totales['ms_codificacion'] += metricas['ms_codificacion']
+
+
+def _tiene_metadatos(img):
+    """Indica si la imagen trae EXIF, ICC, XMP, comentarios o texto PNG."""
+    return any(clave in img.info for clave in _CLAVES_METADATOS) or bool(getattr(img, 'text', None))
+
+
+def _a_rgb(img):
+    """Convierte a RGB componiendo la transparencia (RGBA, LA, P con transparencia) sobre fondo blanco."""
+    if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+        img = img.convert('RGBA')
+        fondo = Image.new('RGB', img.size, (255, 255, 255))
+        fondo.paste(img, mask=img.getchannel('A'))
+        return fondo
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def normalizar_bytes(content, lado_maximo=LADO_MAXIMO, calidad=CALIDAD_JPEG):
+    """
+    Normaliza una imagen subida (bytes de cualquier formato soportado por PIL).
+    Si NORMALIZACION_ACTIVA está desactivada, devuelve los bytes originales.
+
+    Args:
+        content: Bytes originales de la imagen
+        lado_maximo: Tamaño máximo del lado mayor en píxeles
+        calidad: Calidad JPEG de la recodificación
+
+    Returns:
+        (bytes_para_vision, metricas) donde metricas incluye bytes_antes,
+        bytes_despues, ms_codificacion y las dimensiones original y enviada
+    """
+    if not NORMALIZACION_ACTIVA:
+        return content, {'bytes_antes': len(content), 'bytes_despues': len(content), 'ms_codificacion': 0.0}
+
+    inicio = time.perf_counter()
+    img = Image.open(io.BytesIO(content))
+    tamano_original = img.size
+    con_metadatos = _tiene_metadatos(img)
+
+    # Para JPEG, decodificar directamente a escala reducida (DCT) en lugar de a tamaño completo
+    img.draft('RGB', (lado_maximo, lado_maximo))
+    img = _a_rgb(img)
+    img.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+
+    salida = io.BytesIO()
+    # Sin exif ni icc_profile: PIL no copia metadatos si no se le pasan
+    img.save(salida, format='JPEG', quality=calidad, optimize=True)
+    normalizada = salida.getvalue()
+
+    # Si la imagen ya era pequeña y compacta, no vale la pena enviar una versión más pesada,
+    # salvo que el original traiga metadatos: esos nunca se envían
+    if len(normalizada) >= len(content) and img.size == tamano_original and not con_metadatos:
+        normalizada = content
+
+    metricas = {
+        'bytes_antes': len(content),
+        'bytes_despues': len(normalizada),
+        'ms_codificacion': (time.perf_counter() - inicio) * 1000,
+        'tamano_original': tamano_original,
+        'tamano_enviado': img.size
+    }
+    _registrar(metricas)
+    return normalizada, metricas
+
+
+def normalizar_frame(frame_rgb, lado_maximo=LADO_MAXIMO, calidad=CALIDAD_JPEG):
+    """
+    Normaliza un frame de la cámara (array RGB de OpenCV) y lo codifica en JPEG.
+
+    Args:
+        frame_rgb: Frame en formato RGB
+        lado_maximo: Tamaño máximo del lado mayor en píxeles
+        calidad: Calidad JPEG de la codificación
+
+    Returns:
+        (bytes_para_vision, metricas)
+    """
+    inicio = time.perf_counter()
+    altura, ancho = frame_rgb.shape[:2]
+    escala = min(1.0, lado_maximo / max(altura, ancho)) if NORMALIZACION_ACTIVA else 1.0
+
+    if escala < 1.0:
+        frame_rgb = cv2.resize(frame_rgb, (round(ancho * escala), round(altura * escala)),
+                               interpolation=cv2.INTER_AREA)
+
+    # imencode espera BGR
+    frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+    _, buffer = cv2.imencode('.jpg', frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, calidad])
+    normalizada = buffer.tobytes()
+
+    metricas = {
+        'bytes_antes': altura * ancho * 3,  # Frame sin comprimir
+        'bytes_despues': len(normalizada),
+        'ms_codificacion': (time.perf_counter() - inicio) * 1000,
+        'tamano_original': (ancho, altura),
+        'tamano_enviado': (frame_bgr.shape[1], frame_bgr.shape[0])
+    }
+    _registrar(metricas)
+    return normalizada, metricas
+
+
+def estadisticas():
+    """
+    Devuelve los totales acumulados de la normalización.
+
+    Returns:
+        Diccionario con imágenes, bytes antes/después, reducción y latencia media añadida
+    """
+    with _lock_totales:
+        totales = dict(_totales)
+    imagenes = totales['imagenes']
+    totales['reduccion'] = (1 - totales['bytes_despues'] / totales['bytes_antes']) if totales['bytes_antes'] else 0.0
+    totales['ms_codificacion_promedio'] = (totales['ms_codificacion'] / imagenes) if imagenes else 0.0
+    return totales
@@ -0,0 +1,254 @@
+"""
+Dibujo de bounding boxes y etiquetas para imágenes anotadas y video en vivo.
+
+Las fuentes y las etiquetas ya renderizadas (sprites) se guardan en caché por
+texto, color y escala, así que cada etiqueta se mide y se dibuja una sola vez.
+En el video, la capa completa de overlays se compone solo cuando cambian las
+detecciones (cada FRAME_INTERVAL segundos) y en los demás frames se copia tal
+cual sobre la imagen.
+"""
+
+import threading
+import time
+from functools import lru_cache
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# ------------------ CONFIGURACIÓN ------------------ #
+TAMANO_FUENTE = 16  # Tamaño de la fuente de las imágenes anotadas
+GROSOR_CAJA = 3
+TIPOS_CRITICOS = ('arma', 'incendio', 'agresion')
+
+# Colores por tipo de amenaza en las imágenes anotadas (RGB)
+COLORES_RGB = {
+    'arma': (255, 0, 0),       # Rojo
+    'incendio': (255, 165, 0),  # Naranja
+    'vehiculo': (255, 255, 0),  # Amarillo
+    'otro': (0, 0, 255)         # Azul
+}
+
+_tiempos = {}
+_lock_tiempos = threading.Lock()
+
+
+def _registrar(origen, ms, reutilizada=None):
+    with _lock_tiempos:
+        total = _tiempos.setdefault(origen, {'dibujos': 0, 'ms_total': 0.0, 'ms_maximo': 0.0,
+                                             'capas_compuestas': 0, 'capas_reutilizadas': 0})
+        total['dibujos'] += 1
+        total['ms_total'] += ms
+        total['ms_maximo'] = max(total['ms_maximo'], ms)
+        if reutilizada is not None:
+            total['capas_reutilizadas' if reutilizada else 'capas_compuestas'] += 1
+
+
+# ------------------ IMÁGENES ANOTADAS (PIL) ------------------ #
+
+@lru_cache(maxsize=8)
+def obtener_fuente(tamano=TAMANO_FUENTE):
+    """Carga la fuente una sola vez por tamaño (Arial si existe, si no la de PIL)."""
+    try:
+        return ImageFont.truetype("arial.ttf", tamano)
+    except OSError:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=256)
+def sprite_etiqueta_pil(texto, color, tamano=TAMANO_FUENTE):
+    """
+    Renderiza una etiqueta (fondo de color y texto blanco) como imagen PIL.
+
+    Returns:
+        Imagen RGB lista para pegar con su esquina inferior izquierda sobre la caja
+    """
+    fuente = obtener_fuente(tamano)
+    bbox = ImageDraw.Draw(Image.new('RGB', (1, 1))).textbbox((0, 0), texto, font=fuente)
+    ancho_texto = bbox[2] - bbox[0]
+    alto_texto = bbox[3] - bbox[1]
+
+    sprite = Image.new('RGB', (ancho_texto + 5, alto_texto + 5), color)
+    ImageDraw.Draw(sprite).text((2, 2), texto, fill=(255, 255, 255), font=fuente)
+    return sprite
+
+
+def dibujar_cajas_pil(img, detecciones, colores=COLORES_RGB):
+    """
+    Dibuja las detecciones sobre una imagen PIL (la modifica en el lugar).
+
+    Args:
+        img: Imagen PIL en modo RGB
+        detecciones: Lista de tuplas (tipo, objeto, confianza, x1, y1, x2, y2)
+        colores: Color RGB por tipo de amenaza; 'otro' es el color por defecto
+    """
+    inicio = time.perf_counter()
+    draw = ImageDraw.Draw(img)
+    width, height = img.size
+
+    for tipo, objeto, confianza, x1, y1, x2, y2 in detecciones:
+        if x1 is None or y1 is None or x2 is None or y2 is None:
+            continue  # Saltar si no hay coordenadas
+
+        x1_px, y1_px = int(x1 * width), int(y1 * height)
+        x2_px, y2_px = int(x2 * width), int(y2 * height)
+        color = colores.get(tipo, colores['otro'])
+
+        draw.rectangle([x1_px, y1_px, x2_px, y2_px], outline=color, width=GROSOR_CAJA)
+
+        sprite = sprite_etiqueta_pil(f"{objeto} ({confianza:.2f})", color)
+        img.paste(sprite, (x1_px, y1_px - sprite.height + 1))
+
+    _registrar('imagenes', (time.perf_counter() - inicio) * 1000)
+
+
+# ------------------ VIDEO EN VIVO (OpenCV) ------------------ #
+
+@lru_cache(maxsize=256)
+def sprite_etiqueta_cv(texto, color, escala=0.6, grosor=2):
+    """
+    Renderiza una etiqueta opaca (fondo de color y texto blanco) para frames BGR.
+
+    Returns:
+        Array BGR cuya esquina inferior izquierda va sobre la esquina superior de la caja
+    """
+    (ancho_texto, alto_texto), _ = cv2.getTextSize(texto, cv2.FONT_HERSHEY_SIMPLEX, escala, grosor)
+    sprite = np.empty((alto_texto + 11, ancho_texto + 11, 3), dtype=np.uint8)
+    sprite[:] = color
+    cv2.putText(sprite, texto, (5, alto_texto + 5), cv2.FONT_HERSHEY_SIMPLEX, escala, (255, 255, 255), grosor)
+    sprite.flags.writeable = False
+    return sprite
+
+
+@lru_cache(maxsize=64)
+def sprite_texto_cv(texto, color, escala, grosor):
+    """
+    Renderiza texto sin fondo con su máscara, para dibujarlo sobre el frame.
+
+    Returns:
+        (sprite, mascara, dx, dy) donde (dx, dy) es el desplazamiento de la esquina
+        superior izquierda respecto al origen de cv2.putText
+    """
+    (ancho_texto, alto_texto), base = cv2.getTextSize(texto, cv2.FONT_HERSHEY_SIMPLEX, escala, grosor)
+    margen = grosor
+    mascara = np.zeros((alto_texto + base + 2 * margen, ancho_texto + 2 * margen), dtype=np.uint8)
+    cv2.putText(mascara, texto, (margen, margen + alto_texto), cv2.FONT_HERSHEY_SIMPLEX, escala, 255, grosor)
+    mascara = mascara.astype(bool)
+    sprite = np.empty(mascara.shape + (3,), dtype=np.uint8)
+    sprite[:] = color
+    sprite.flags.writeable = False
+    mascara.flags.writeable = False
+    return sprite, mascara, -margen, -(margen + alto_texto)
+
+
+def _pegar(frame, sprite, x, y, mascara=None):
+    """Copia un sprite en (x, y) recortándolo a los bordes del frame."""
+    alto, ancho = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + sprite.shape[1], ancho), min(y + sprite.shape[0], alto)
+    if x0 >= x1 or y0 >= y1:
+        return
+    recorte = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+    if mascara is None:
+        frame[y0:y1, x0:x1] = sprite[recorte]
+    else:
+        np.copyto(frame[y0:y1, x0:x1], sprite[recorte], where=mascara[recorte][..., None])
+
+
+class CapaOverlay:
+    """
+    Capa de overlays del video, recompuesta solo cuando cambian las detecciones.
+
+    La capa es una lista de elementos ya renderizados (bordes de cajas,
+    etiquetas y aviso de alerta) con su posición; dibujarla en un frame es
+    solo copiar esas regiones.
+    """
+
+    def __init__(self, colores, color_defecto=(255, 255, 255)):
+        self.colores = colores
+        self.color_defecto = color_defecto
+        self._clave = None
+        self._elementos = []
+        self._alerta = False
+
+    def _componer(self, detecciones, altura_frame, ancho_frame):
+        elementos = []
+        alerta = False
+        for tipo, objeto, confianza, x1, y1, x2, y2 in detecciones:
+            if x1 is None or y1 is None or x2 is None or y2 is None:
+                continue
+
+            x1_px, y1_px = int(x1 * ancho_frame), int(y1 * altura_frame)
+            x2_px, y2_px = int(x2 * ancho_frame), int(y2 * altura_frame)
+            color = self.colores.get(tipo, self.color_defecto)
+
+            # Bordes de la caja como cuatro franjas sólidas de GROSOR_CAJA px
+            izq, der = min(x1_px, x2_px), max(x1_px, x2_px)
+            arr, aba = min(y1_px, y2_px), max(y1_px, y2_px)
+            mitad = GROSOR_CAJA // 2
+            for fx, fy, fw, fh in ((izq - mitad, arr - mitad, der - izq + GROSOR_CAJA, GROSOR_CAJA),
+                                   (izq - mitad, aba - mitad, der - izq + GROSOR_CAJA, GROSOR_CAJA),
+                                   (izq - mitad, arr - mitad, GROSOR_CAJA, aba - arr + GROSOR_CAJA),
+                                   (der - mitad, arr - mitad, GROSOR_CAJA, aba - arr + GROSOR_CAJA)):
+                franja = np.empty((fh, fw, 3), dtype=np.uint8)
+                franja[:] = color
+                elementos.append((franja, fx, fy, None))
+
+            etiqueta = sprite_etiqueta_cv(f"{objeto} ({confianza:.2f})", color)
+            elementos.append((etiqueta, x1_px, y1_px - etiqueta.shape[0] + 1, None))
+
+            # Indicador de alerta
+            if tipo in TIPOS_CRITICOS:
+                alerta = True
+                sprite, mascara, dx, dy = sprite_texto_cv(f"ALERTA: {tipo.upper()}", (0, 0, 255), 1.0, 3)
+                elementos.append((sprite, 10 + dx, 30 + dy, mascara))
+
+        self._elementos = elementos
+        self._alerta = alerta
+
+    def dibujar(self, frame, detecciones):
+        """
+        Dibuja las detecciones sobre el frame BGR (lo modifica en el lugar).
+
+        Args:
+            frame: Frame BGR de OpenCV
+            detecciones: Lista de tuplas (tipo, objeto, confianza, x1, y1, x2, y2)
+
+        Returns:
+            True si alguna detección es una alerta crítica
+        """
+        inicio = time.perf_counter()
+        altura_frame, ancho_frame = frame.shape[:2]
+        clave = (tuple(detecciones), altura_frame, ancho_frame)
+        reutilizada = clave == self._clave
+        if not reutilizada:
+            self._componer(detecciones, altura_frame, ancho_frame)
+            self._clave = clave
+
+        for sprite, x, y, mascara in self._elementos:
+            _pegar(frame, sprite, x, y, mascara)
+
+        _registrar('video', (time.perf_counter() - inicio) * 1000, reutilizada)
+        return self._alerta
+
+
+def estadisticas():
+    """
+    Devuelve el tiempo de dibujo por origen ('imagenes' y 'video') y el uso de las cachés.
+
+    Returns:
+        Diccionario con dibujos, ms promedio y máximo, capas compuestas/reutilizadas
+        y aciertos de las cachés de sprites
+    """
+    with _lock_tiempos:
+        tiempos = {origen: dict(total) for origen, total in _tiempos.items()}
+    for total in tiempos.values():
+        total['ms_promedio'] = total['ms_total'] / total['dibujos'] if total['dibujos'] else 0.0
+
+    sprites = {}
+    for nombre, funcion in (('etiquetas_imagenes', sprite_etiqueta_pil),
+                            ('etiquetas_video', sprite_etiqueta_cv),
+                            ('textos_video', sprite_texto_cv)):
+        info = funcion.cache_info()
+        sprites[nombre] = {'aciertos': info.hits, 'fallos': info.misses, 'tamano': info.currsize}
+    return {'dibujo': tiempos, 'sprites': sprites}
@@ -0,0 +1,199 @@
+"""
+Seguimiento local de objetos entre llamadas al detector.
+
+Cada resultado del detector siembra una pista por caja: puntos de interés
+(cv2.goodFeaturesToTrack) dentro de la caja. En cada frame los puntos se
+siguen con flujo óptico Lucas-Kanade piramidal sobre una copia reducida en
+gris, con verificación ida y vuelta, y la caja se desplaza y escala con la
+mediana de los puntos que siguen siendo válidos.
+
+Una pista se retira cuando pierde la mayoría de sus puntos (el objeto salió
+o quedó tapado). Cuando una pista se aleja mucho de donde la vio el
+detector, o se pierde, el seguidor pide un análisis anticipado: el detector
+se llama cuando la escena cambió de verdad y no a intervalos fijos.
+
+Las detecciones sin caja (etiquetas de escena que ocupan el frame completo)
+se mantienen tal cual.
+"""
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# ------------------ CONFIGURACIÓN ------------------ #
+SEGUIMIENTO_ACTIVO = os.environ.get('SEGUIMIENTO_ACTIVO', '1') == '1'
+SEGUIMIENTO_ANCHO = int(os.environ.get('SEGUIMIENTO_ANCHO', 320))  # Ancho del frame reducido para el flujo (px)
+SEGUIMIENTO_PUNTOS = int(os.environ.get('SEGUIMIENTO_PUNTOS', 30))  # Puntos por pista
+SEGUIMIENTO_PUNTOS_MIN = 0.4  # Fracción de puntos que debe sobrevivir para no perder la pista
+SEGUIMIENTO_ERROR_IDA_VUELTA = 1.0  # Error máximo (px) entre un punto y su vuelta
+# Desplazamiento del centro (fracción del frame) desde la siembra que pide un análisis anticipado
+SEGUIMIENTO_DERIVA = float(os.environ.get('SEGUIMIENTO_DERIVA', 0.15))
+
+_PARAMETROS_LK = dict(winSize=(15, 15), maxLevel=3,
+                      criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+
+class Pista:
+    """Un objeto detectado y sus puntos de seguimiento (en píxeles del frame reducido)."""
+
+    __slots__ = ('deteccion', 'caja', 'puntos', 'puntos_iniciales', 'centro_inicial')
+
+    def __init__(self, deteccion, caja, puntos):
+        self.deteccion = deteccion
+        self.caja = caja  # (x1, y1, x2, y2) normalizada
+        self.puntos = puntos
+        self.puntos_iniciales = len(puntos)
+        self.centro_inicial = ((caja[0] + caja[2]) / 2, (caja[1] + caja[3]) / 2)
+
+    def deteccion_actual(self):
+        tipo, objeto, confianza = self.deteccion[:3]
+        return (tipo, objeto, confianza) + tuple(float(valor) for valor in self.caja)
+
+
+class SeguidorObjetos:
+    """
+    Mueve las cajas de la última detección en cada frame con flujo óptico.
+
+    sembrar() se puede llamar desde otro hilo (el del análisis): la siembra se
+    aplica en el siguiente actualizar(), que corre en el hilo del seguimiento.
+    """
+
+    def __init__(self, ancho=SEGUIMIENTO_ANCHO, puntos=SEGUIMIENTO_PUNTOS, deriva=SEGUIMIENTO_DERIVA):
+        self.ancho = ancho
+        self.max_puntos = puntos
+        self.deriva = deriva
+        self._lock = threading.Lock()
+        self._siembra = None
+        self._pistas = []
+        self._fijas = []  # Detecciones sin caja, se devuelven sin cambios
+        self._gris_anterior = None
+        self._tamano = None
+        self._gris = None
+        self._reducido = None
+        self._contadores = {'frames': 0, 'siembras': 0, 'pistas': 0, 'perdidas': 0, 'reanalisis_pedidos': 0}
+
+    def sembrar(self, frame_bgr, detecciones):
+        """Reemplaza las pistas con las detecciones del detector para ese frame."""
+        with self._lock:
+            self._siembra = (frame_bgr, list(detecciones))
+
+    def _gris_reducido(self, frame_bgr):
+        altura, ancho = frame_bgr.shape[:2]
+        escala = min(1.0, self.ancho / ancho)
+        tamano = (max(1, round(ancho * escala)), max(1, round(altura * escala)))
+        if self._tamano != tamano:
+            self._tamano = tamano
+            self._reducido = np.empty((tamano[1], tamano[0], 3), dtype=np.uint8) if escala < 1 else None
+            self._gris = None
+            self._gris_anterior = None
+        imagen = frame_bgr
+        if self._reducido is not None:
+            cv2.resize(frame_bgr, tamano, dst=self._reducido, interpolation=cv2.INTER_AREA)
+            imagen = self._reducido
+        return cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+
+    def _crear_pistas(self, gris, detecciones):
+        ancho, altura = self._tamano
+        pistas, fijas = [], []
+        for deteccion in detecciones:
+            x1, y1, x2, y2 = deteccion[3:7]
+            if x1 is None or (x1, y1, x2, y2) == (0.0, 0.0, 1.0, 1.0):
+                fijas.append(deteccion)
+                continue
+            izq, arr = int(max(0, x1) * ancho), int(max(0, y1) * altura)
+            der, aba = int(min(1, x2) * ancho), int(min(1, y2) * altura)
+            if der - izq < 4 or aba - arr < 4:
+                fijas.append(deteccion)
+                continue
+            mascara = np.zeros_like(gris)
+            mascara[arr:aba, izq:der] = 255
+            puntos = cv2.goodFeaturesToTrack(gris, self.max_puntos, 0.01, 3, mask=mascara)
+            if puntos is None or len(puntos) < 4:
+                fijas.append(deteccion)  # Caja sin textura: no se puede seguir
+                continue
+            pistas.append(Pista(deteccion, (x1, y1, x2, y2), puntos.astype(np.float32)))
+        return pistas, fijas
+
+    def actualizar(self, frame_bgr):
+        """
+        Sigue las pistas hasta este frame.
+
+        Returns:
+            (detecciones, pedir_analisis): detecciones con las cajas movidas y si
+            alguna pista derivó o se perdió desde la última siembra
+        """
+        with self._lock:
+            siembra, self._siembra = self._siembra, None
+
+        pedir_analisis = False
+        if siembra is not None:
+            frame_siembra, detecciones = siembra
+            gris_siembra = self._gris_reducido(frame_siembra)
+            self._pistas, self._fijas = self._crear_pistas(gris_siembra, detecciones)
+            self._gris_anterior = gris_siembra
+            self._contadores['siembras'] += 1
+            self._contadores['pistas'] += len(self._pistas)
+
+        gris = self._gris_reducido(frame_bgr)
+        if self._pistas and self._gris_anterior is not None:
+            pedir_analisis = self._seguir(self._gris_anterior, gris)
+        self._gris_anterior = gris
+        self._contadores['frames'] += 1
+        if pedir_analisis:
+            self._contadores['reanalisis_pedidos'] += 1
+
+        return [pista.deteccion_actual() for pista in self._pistas] + self._fijas, pedir_analisis
+
+    def _seguir(self, gris_anterior, gris):
+        ancho, altura = self._tamano
+        todos = np.concatenate([pista.puntos for pista in self._pistas])
+        siguientes, estado, _ = cv2.calcOpticalFlowPyrLK(gris_anterior, gris, todos, None, **_PARAMETROS_LK)
+        vuelta, estado_vuelta, _ = cv2.calcOpticalFlowPyrLK(gris, gris_anterior, siguientes, None, **_PARAMETROS_LK)
+        error = np.abs(todos - vuelta).reshape(-1, 2).max(axis=1)
+        validos = (estado.ravel() == 1) & (estado_vuelta.ravel() == 1) & (error < SEGUIMIENTO_ERROR_IDA_VUELTA)
+
+        pedir_analisis = False
+        vivas = []
+        inicio = 0
+        for pista in self._pistas:
+            fin = inicio + len(pista.puntos)
+            ok = validos[inicio:fin]
+            antes = todos[inicio:fin][ok].reshape(-1, 2)
+            despues = siguientes[inicio:fin][ok].reshape(-1, 2)
+            inicio = fin
+
+            if len(despues) < max(4, SEGUIMIENTO_PUNTOS_MIN * pista.puntos_iniciales):
+                self._contadores['perdidas'] += 1
+                pedir_analisis = True
+                continue
+
+            # Traslación y escala por mediana: robustas a puntos que se fueron al fondo
+            dx, dy = np.median(despues - antes, axis=0)
+            escala = 1.0
+            if len(antes) >= 2:
+                distancias_antes = np.linalg.norm(antes - antes.mean(axis=0), axis=1)
+                distancias_despues = np.linalg.norm(despues - despues.mean(axis=0), axis=1)
+                utiles = distancias_antes > 1e-3
+                if utiles.any():
+                    escala = float(np.clip(np.median(distancias_despues[utiles] / distancias_antes[utiles]), 0.8, 1.25))
+
+            x1, y1, x2, y2 = pista.caja
+            cx = (x1 + x2) / 2 + dx / ancho
+            cy = (y1 + y2) / 2 + dy / altura
+            medio_ancho = (x2 - x1) / 2 * escala
+            medio_alto = (y2 - y1) / 2 * escala
+            pista.caja = (cx - medio_ancho, cy - medio_alto, cx + medio_ancho, cy + medio_alto)
+            pista.puntos = despues.reshape(-1, 1, 2)
+
+            if max(abs(cx - pista.centro_inicial[0]), abs(cy - pista.centro_inicial[1])) > self.deriva:
+                pedir_analisis = True
+            vivas.append(pista)
+
+        self._pistas = vivas
+        return pedir_analisis
+
+    def estadisticas(self):
+        """Frames seguidos, siembras, pistas creadas y perdidas, y análisis anticipados pedidos."""
+        return dict(self._contadores, activas=len(self._pistas))
@@ -0,0 +1,232 @@
+"""
+Servidor falso de Google Vision para pruebas de carga sin red ni credenciales.
+
+Atiende POST /v1/images:annotate (la API REST que usan annotate_image y
+batch_annotate_images) con latencia, jitter y tasa de errores configurables.
+Si se indica un directorio de grabaciones (DETECTOR_GRABAR=1), responde con
+la grabación de cada imagen; si no, con una respuesta fija.
+
+Solo usa la biblioteca estándar.
+
+Ejecución:
+    python servidor_vision_falso.py --latencia-ms 350 --jitter-ms 120 --tasa-error 0.02
+
+Y luego, en otra terminal:
+    VISION_ENDPOINT=http://localhost:8089 python run_production.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ------------------ CONFIGURACIÓN ------------------ #
+PUERTO = int(os.environ.get('VISION_FALSO_PUERTO', 8089))
+LATENCIA_MS = float(os.environ.get('VISION_FALSO_LATENCIA_MS', 300))  # Latencia base por solicitud
+JITTER_MS = float(os.environ.get('VISION_FALSO_JITTER_MS', 100))  # Desviación estándar de la latencia
+LATENCIA_POR_IMAGEN_MS = float(os.environ.get('VISION_FALSO_LATENCIA_POR_IMAGEN_MS', 20))  # Extra por imagen del lote
+TASA_ERROR = float(os.environ.get('VISION_FALSO_TASA_ERROR', 0.0))  # Fracción de solicitudes con HTTP 503
+TASA_ERROR_IMAGEN = float(os.environ.get('VISION_FALSO_TASA_ERROR_IMAGEN', 0.0))  # Fracción de imágenes con error
+
+# Respuesta por defecto: una persona y etiquetas de escena sin amenazas
+RESPUESTA_FIJA = {
+    "localizedObjectAnnotations": [{
+        "name": "Person",
+        "score": 0.91,
+        "boundingPoly": {"normalizedVertices": [
+            {"x": 0.30, "y": 0.15}, {"x": 0.62, "y": 0.15},
+            {"x": 0.62, "y": 0.95}, {"x": 0.30, "y": 0.95}
+        ]}
+    }],
+    "labelAnnotations": [
+        {"description": "Person", "score": 0.95},
+        {"description": "Clothing", "score": 0.90},
+        {"description": "Standing", "score": 0.82},
+        {"description": "Room", "score": 0.74}
+    ]
+}
+
+
+class SimuladorVision:
+    """Genera respuestas y latencias de Vision y acumula estadísticas."""
+
+    def __init__(self, latencia_ms=LATENCIA_MS, jitter_ms=JITTER_MS, latencia_por_imagen_ms=LATENCIA_POR_IMAGEN_MS,
+                 tasa_error=TASA_ERROR, tasa_error_imagen=TASA_ERROR_IMAGEN, perfil=None, grabaciones=None,
+                 semilla=None):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.latencia_por_imagen_ms = latencia_por_imagen_ms
+        self.tasa_error = tasa_error
+        self.tasa_error_imagen = tasa_error_imagen
+        self.perfil = perfil or []
+        self.grabaciones = grabaciones or {}
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._latencias = []
+        self._contadores = {'solicitudes': 0, 'imagenes': 0, 'errores': 0, 'errores_imagen': 0,
+                            'grabaciones_usadas': 0}
+
+    def latencia(self, imagenes):
+        """Latencia simulada en segundos: muestra del perfil o normal(latencia, jitter)."""
+        with self._lock:
+            if self.perfil:
+                ms = self._random.choice(self.perfil)
+            else:
+                ms = self._random.gauss(self.latencia_ms, self.jitter_ms)
+        return max(0.0, ms + self.latencia_por_imagen_ms * imagenes) / 1000
+
+    def falla_solicitud(self):
+        with self._lock:
+            return self._random.random() < self.tasa_error
+
+    def respuesta_imagen(self, solicitud):
+        """Respuesta de una imagen: error aleatorio, grabación por hash o respuesta fija."""
+        with self._lock:
+            if self._random.random() < self.tasa_error_imagen:
+                self._contadores['errores_imagen'] += 1
+                return {"error": {"code": 13, "message": "Error interno simulado"}}
+
+        contenido = base64.b64decode(solicitud.get('image', {}).get('content', ''))
+        grabacion = self.grabaciones.get(hashlib.sha256(contenido).hexdigest())
+        if grabacion is not None:
+            with self._lock:
+                self._contadores['grabaciones_usadas'] += 1
+            return grabacion
+        return RESPUESTA_FIJA
+
+    def registrar(self, imagenes, segundos, error):
+        with self._lock:
+            self._contadores['solicitudes'] += 1
+            self._contadores['imagenes'] += imagenes
+            if error:
+                self._contadores['errores'] += 1
+            self._latencias.append(segundos * 1000)
+
+    def estadisticas(self):
+        """Devuelve los contadores y los percentiles de la latencia servida (ms)."""
+        with self._lock:
+            latencias = sorted(self._latencias)
+            resultado = dict(self._contadores)
+
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] if latencias else 0.0
+
+        resultado.update({'p50_ms': percentil(0.50), 'p95_ms': percentil(0.95), 'p99_ms': percentil(0.99)})
+        return resultado
+
+
+def cargar_grabaciones(directorio):
+    """Lee las grabaciones JSON guardadas con DETECTOR_GRABAR=1 ({hash: respuesta})."""
+    grabaciones = {}
+    for nombre in os.listdir(directorio):
+        if nombre.endswith('.json'):
+            with open(os.path.join(directorio, nombre), encoding='utf-8') as f:
+                grabaciones[nombre[:-5]] = json.load(f)
+    return grabaciones
+
+
+def cargar_perfil(ruta):
+    """Lee un perfil de latencias medidas en producción (ms, una por línea o lista JSON)."""
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read().strip()
+    if texto.startswith('['):
+        return [float(valor) for valor in json.loads(texto)]
+    return [float(linea) for linea in texto.splitlines() if linea.strip()]
+
+
+def crear_manejador(simulador):
+    class ManejadorVision(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _responder(self, codigo, cuerpo):
+            datos = json.dumps(cuerpo).encode('utf-8')
+            self.send_response(codigo)
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            if self.path == '/estadisticas':
+                self._responder(200, simulador.estadisticas())
+            else:
+                self._responder(404, {"error": {"code": 404, "message": "No encontrado"}})
+
+        def do_POST(self):
+            if not self.path.split('?')[0].endswith('/images:annotate'):
+                self._responder(404, {"error": {"code": 404, "message": "No encontrado"}})
+                return
+
+            longitud = int(self.headers.get('Content-Length', 0))
+            solicitudes = json.loads(self.rfile.read(longitud) or b'{}').get('requests', [])
+            espera = simulador.latencia(len(solicitudes))
+            time.sleep(espera)
+
+            if simulador.falla_solicitud():
+                simulador.registrar(len(solicitudes), espera, error=True)
+                self._responder(503, {"error": {"code": 503, "message": "Servicio no disponible (simulado)",
+                                                "status": "UNAVAILABLE"}})
+                return
+
+            respuestas = [simulador.respuesta_imagen(solicitud) for solicitud in solicitudes]
+            simulador.registrar(len(solicitudes), espera, error=False)
+            self._responder(200, {"responses": respuestas})
+
+        def log_message(self, formato, *args):
+            pass  # Sin un log por solicitud: las estadísticas se imprimen al salir
+
+    return ManejadorVision
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso de Google Vision (REST)")
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    parser.add_argument('--latencia-ms', type=float, default=LATENCIA_MS)
+    parser.add_argument('--jitter-ms', type=float, default=JITTER_MS)
+    parser.add_argument('--latencia-por-imagen-ms', type=float, default=LATENCIA_POR_IMAGEN_MS)
+    parser.add_argument('--tasa-error', type=float, default=TASA_ERROR,
+                        help="Fracción de solicitudes que responden HTTP 503")
+    parser.add_argument('--tasa-error-imagen', type=float, default=TASA_ERROR_IMAGEN,
+                        help="Fracción de imágenes con error dentro de una respuesta 200")
+    parser.add_argument('--perfil', help="Archivo de latencias de producción (ms) para muestrear")
+    parser.add_argument('--grabaciones', help="Directorio con respuestas grabadas (DETECTOR_GRABAR=1)")
+    parser.add_argument('--semilla', type=int, help="Semilla para reproducir la misma secuencia")
+    args = parser.parse_args()
+
+    simulador = SimuladorVision(
+        latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms,
+        latencia_por_imagen_ms=args.latencia_por_imagen_ms,
+        tasa_error=args.tasa_error,
+        tasa_error_imagen=args.tasa_error_imagen,
+        perfil=cargar_perfil(args.perfil) if args.perfil else None,
+        grabaciones=cargar_grabaciones(args.grabaciones) if args.grabaciones else None,
+        semilla=args.semilla
+    )
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', args.puerto), crear_manejador(simulador))
+    servidor.daemon_threads = True
+    print(f"[VISION FALSO] Escuchando en http://127.0.0.1:{args.puerto}/v1/images:annotate")
+    print(f"[VISION FALSO] Latencia {args.latencia_ms:.0f}±{args.jitter_ms:.0f} ms"
+          f"{' (perfil)' if args.perfil else ''}, errores {args.tasa_error:.1%} por solicitud, "
+          f"{args.tasa_error_imagen:.1%} por imagen, {len(simulador.grabaciones)} grabación(es)")
+    # Terminar con SIGTERM igual que con Ctrl+C, para imprimir las estadísticas
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        servidor.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        servidor.server_close()
+        print(f"\n[VISION FALSO] {json.dumps(simulador.estadisticas())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""
+Supervisor de varias cámaras con un proceso de captura/análisis por fuente.
+
+Lee la configuración de un archivo JSON (camaras.json por defecto):
+
+    {
+        "presupuesto_detector_por_minuto": 120,
+        "camaras": [
+            {"nombre": "entrada", "fuente": 0, "ubicacion": "Zona 1 - Entrada principal",
+             "umbrales": {"arma": 0.45, "incendio": 0.55}},
+            {"nombre": "patio", "fuente": "rtsp://10.0.0.12/stream1", "ubicacion": "Zona 3 - Patio",
+             "intervalo": 3.0, "espejo": false},
+            {"nombre": "prueba", "fuente": "videos/pasillo.mp4", "ubicacion": "Zona 2 - Pasillo",
+             "repetir": true}
+        ]
+    }
+
+- Cada cámara corre en su propio proceso (PipelineCamara sin ventana), con su
+  ubicación y sus umbrales. Los procesos se crean con 'spawn' para que cada
+  uno abra su propio cliente del detector (gRPC no tolera fork).
+- Todas las cámaras comparten un presupuesto de llamadas al detector por
+  minuto (cubeta de fichas en memoria compartida).
+- Las alertas viajan por una cola al supervisor, que las guarda con
+  guardar_alerta: un solo escritor de alertas para todas las cámaras. Las
+  actualizaciones de confianza de un incidente viajan por la misma cola.
+- Un proceso que termina se reinicia con espera exponencial.
+- FPS, latencia, errores y reinicios de cada cámara se escriben en
+  ESTADO_CAMARAS_PATH (lo sirve /api/camaras) y se imprimen periódicamente.
+
+Ejecución:
+    python supervisor_camaras.py camaras.json
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# ------------------ CONFIGURACIÓN ------------------ #
+CAMARAS_CONFIG = os.environ.get('CAMARAS_CONFIG', 'camaras.json')
+ESTADO_CAMARAS_PATH = os.environ.get('ESTADO_CAMARAS_PATH', 'estado_camaras.json')
+CAMARAS_INTERVALO_ESTADO = float(os.environ.get('CAMARAS_INTERVALO_ESTADO', 2.0))  # Segundos entre reportes
+CAMARAS_REINICIO_MAX = float(os.environ.get('CAMARAS_REINICIO_MAX', 60.0))  # Espera máxima entre reinicios (s)
+CAMARAS_ALERTAS_RECORDADAS = 1000  # Alertas recientes que aún pueden actualizar su confianza
+CAMARAS_PRESUPUESTO_POR_MINUTO = float(os.environ.get('CAMARAS_PRESUPUESTO_POR_MINUTO', 0))  # 0 = sin límite
+
+
+class PresupuestoDetector:
+    """
+    Cubeta de fichas compartida entre procesos: limita las llamadas al detector.
+
+    Se recarga a `por_minuto / 60` fichas por segundo hasta `rafaga` fichas;
+    cada análisis consume una. Con por_minuto <= 0 no hay límite.
+    """
+
+    def __init__(self, contexto, por_minuto, rafaga=None):
+        self.por_segundo = max(0.0, por_minuto) / 60
+        self.rafaga = rafaga or max(1.0, self.por_segundo * 10)
+        self._fichas = contexto.Value('d', self.rafaga, lock=False)
+        self._marca = contexto.Value('d', time.time(), lock=False)
+        self._tomadas = contexto.Value('q', 0, lock=False)
+        self._denegadas = contexto.Value('q', 0, lock=False)
+        self._lock = contexto.Lock()
+
+    def tomar(self):
+        """Consume una ficha si hay; devuelve False si el presupuesto está agotado."""
+        with self._lock:
+            if self.por_segundo <= 0:
+                self._tomadas.value += 1
+                return True
+            ahora = time.time()
+            self._fichas.value = min(self.rafaga, self._fichas.value + (ahora - self._marca.value) * self.por_segundo)
+            self._marca.value = ahora
+            if self._fichas.value >= 1:
+                self._fichas.value -= 1
+                self._tomadas.value += 1
+                return True
+            self._denegadas.value += 1
+            return False
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'por_minuto': self.por_segundo * 60,
+                'llamadas': self._tomadas.value,
+                'denegadas': self._denegadas.value,
+                'fichas': round(self._fichas.value, 2)
+            }
+
+
+class FuenteVideo:
+    """
+    Envuelve cv2.VideoCapture para las fuentes del supervisor.
+
+    Los archivos se leen al ritmo de su FPS (como una cámara real) y, con
+    `repetir`, vuelven al inicio al terminar.
+    """
+
+    def __init__(self, fuente, repetir=False):
+        import cv2
+
+        self._cv2 = cv2
+        self.cap = cv2.VideoCapture(fuente)
+        self.es_archivo = isinstance(fuente, str) and os.path.isfile(fuente)
+        self.repetir = repetir
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.es_archivo else 0
+        self._periodo = 1.0 / fps if fps and fps > 0 else 0.0
+        self._siguiente = time.monotonic()
+        if not self.es_archivo:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        if self._periodo:
+            espera = self._siguiente - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self._siguiente = max(self._siguiente + self._periodo, time.monotonic() - self._periodo)
+
+        ret, frame = self.cap.read()
+        if not ret and self.es_archivo and self.repetir:
+            self.cap.set(self._cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def _fuente(valor):
+    """Índice de dispositivo si la fuente es un número, si no URL o ruta."""
+    if isinstance(valor, str) and valor.isdigit():
+        return int(valor)
+    return valor
+
+
+def proceso_camara(config, presupuesto, cola_alertas, cola_estado, detener):
+    """
+    Cuerpo del proceso de una cámara: pipeline sin ventana que envía sus
+    alertas y su estado al supervisor.
+
+    Args:
+        config: Configuración de la cámara (nombre, fuente, ubicacion, umbrales, ...)
+        presupuesto: PresupuestoDetector compartido
+        cola_alertas: Cola de alertas hacia el supervisor
+        cola_estado: Cola de estado periódico hacia el supervisor
+        detener: Evento de parada del supervisor
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C lo atiende el supervisor
+
+    from camara_vivo import PipelineCamara, crear_clasificador
+    from detectores import obtener_detector, estadisticas_llamadas_vision
+
+    nombre = config['nombre']
+    detector = obtener_detector()
+    detector.calentar(en_segundo_plano=False)
+    intervalo = float(config.get('intervalo') or detector.intervalo_camara)
+
+    fuente = FuenteVideo(_fuente(config['fuente']), repetir=config.get('repetir', False))
+    if not fuente.isOpened():
+        print(f"[CAMARAS] ❌ {nombre}: no se pudo abrir la fuente {config['fuente']}")
+        sys.exit(2)
+
+    claves = itertools.count(1)
+
+    def enviar_alerta(**alerta):
+        # La alerta se guarda en el supervisor; la clave identifica su fila para actualizarla
+        clave = (nombre, os.getpid(), next(claves))
+        cola_alertas.put(dict(alerta, camara=nombre, clave=clave))
+        return clave
+
+    def actualizar_alerta(clave, confianza, imagen=None, objeto=None):
+        cola_alertas.put({'actualizar': clave, 'confianza': confianza, 'imagen': imagen, 'objeto': objeto})
+
+    pipeline = PipelineCamara(
+        fuente, detector, intervalo,
+        ubicacion=config['ubicacion'],
+        clasificador=crear_clasificador(config.get('umbrales')),
+        guardar=enviar_alerta,
+        actualizar=actualizar_alerta,
+        presupuesto=presupuesto,
+        espejo=config.get('espejo', False),
+        ruta_base=f"alertas_{nombre}"
+    )
+    pipeline.iniciar()
+    print(f"[CAMARAS] {nombre}: proceso {os.getpid()} analizando como mucho cada {intervalo:.2f} s "
+          f"({detector.nombre})")
+
+    try:
+        while pipeline.activo and not detener.wait(CAMARAS_INTERVALO_ESTADO):
+            tasas = pipeline.tasas()
+            cola_estado.put({
+                'nombre': nombre,
+                'pid': os.getpid(),
+                'captura_fps': round(tasas['captura_fps'], 2),
+                'analisis_por_segundo': round(tasas['analisis_por_segundo'], 3),
+                'ms_retraso': round(tasas['ms_antiguedad_frame'] + tasas['ms_analisis'], 1),
+                'ms_analisis': round(tasas['ms_analisis'], 1),
+                'frames_capturados': tasas['frames_capturados'],
+                'frames_analizados': tasas['frames_analizados'],
+                'analisis_suprimidos': tasas['analisis_suprimidos'],
+                'analisis_sin_presupuesto': tasas['analisis_sin_presupuesto'],
+                'errores': tasas['errores'],
+                'fuego': tasas['fuego'],
+                'clips': tasas['clips'],
+                'llamadas_vision': estadisticas_llamadas_vision(),
+                'actualizado': time.time()
+            })
+    finally:
+        pipeline.detener()
+        fuente.release()
+
+    if pipeline.error:
+        print(f"[CAMARAS] ⚠️ {nombre}: {pipeline.error}")
+        sys.exit(1)
+
+
+class SupervisorCamaras:
+    """Arranca, vigila y reinicia los procesos de cámara y guarda sus alertas."""
+
+    def __init__(self, config, ruta_estado=ESTADO_CAMARAS_PATH):
+        self.contexto = multiprocessing.get_context('spawn')
+        self.ruta_estado = ruta_estado
+        por_minuto = config.get('presupuesto_detector_por_minuto', CAMARAS_PRESUPUESTO_POR_MINUTO)
+        self.presupuesto = PresupuestoDetector(self.contexto, float(por_minuto or 0))
+        self.cola_alertas = self.contexto.Queue()
+        self.cola_estado = self.contexto.Queue()
+        self.detener_evento = self.contexto.Event()
+        self.alertas_guardadas = 0
+        self.errores_guardado = 0
+
+        self.camaras = {}
+        for camara in config['camaras']:
+            if camara['nombre'] in self.camaras:
+                raise ValueError(f"Cámara duplicada: {camara['nombre']}")
+            self.camaras[camara['nombre']] = {
+                'config': camara,
+                'proceso': None,
+                'reinicios': 0,
+                'espera': 1.0,
+                'proximo_inicio': 0.0,
+                'ultimo_codigo': None,
+                'estado': {}
+            }
+        self._hilos = []
+
+    def _iniciar_camara(self, nombre):
+        camara = self.camaras[nombre]
+        proceso = self.contexto.Process(
+            target=proceso_camara,
+            args=(camara['config'], self.presupuesto, self.cola_alertas, self.cola_estado, self.detener_evento),
+            name=f"camara-{nombre}",
+            daemon=True
+        )
+        proceso.start()
+        camara['proceso'] = proceso
+        camara['inicio'] = time.monotonic()
+
+    def _guardar_alertas(self):
+        """Único consumidor de alertas: todas pasan por guardar_alerta (un solo escritor)."""
+        from analizador import guardar_alerta, actualizar_alerta
+
+        # Future de cada alerta por clave, para sus actualizaciones (las más recientes)
+        futuros = OrderedDict()
+        while True:
+            alerta = self.cola_alertas.get()
+            if alerta is None:
+                break
+            try:
+                if 'actualizar' in alerta:
+                    futuro = futuros.get(alerta['actualizar'])
+                    if futuro is not None:
+                        actualizar_alerta(futuro, alerta['confianza'], alerta['imagen'], alerta['objeto'])
+                    continue
+                alerta.pop('camara', None)
+                clave = alerta.pop('clave', None)
+                futuros[clave] = guardar_alerta(**alerta)
+                if len(futuros) > CAMARAS_ALERTAS_RECORDADAS:
+                    futuros.popitem(last=False)
+                self.alertas_guardadas += 1
+            except Exception as e:
+                self.errores_guardado += 1
+                print(f"[CAMARAS] ⚠️ No se pudo guardar la alerta de {alerta.get('ubicacion')}: {e}")
+
+    def _recibir_estado(self):
+        while not self.detener_evento.is_set():
+            try:
+                estado = self.cola_estado.get(timeout=1)
+            except queue.Empty:
+                continue
+            camara = self.camaras.get(estado['nombre'])
+            if camara is not None:
+                camara['estado'] = estado
+
+    def iniciar(self):
+        from analizador import init_db
+
+        init_db()
+        for objetivo, nombre in ((self._guardar_alertas, "camaras-alertas"),
+                                 (self._recibir_estado, "camaras-estado")):
+            hilo = threading.Thread(target=objetivo, name=nombre, daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        for nombre in self.camaras:
+            self._iniciar_camara(nombre)
+
+    def vigilar(self):
+        """Reinicia los procesos caídos (espera exponencial) y publica el estado."""
+        ahora = time.monotonic()
+        for nombre, camara in self.camaras.items():
+            proceso = camara['proceso']
+            if proceso is not None and not proceso.is_alive():
+                proceso.join()
+                camara['ultimo_codigo'] = proceso.exitcode
+                # Un proceso que aguantó más que la espera máxima empieza de nuevo con 1 s
+                if ahora - camara['inicio'] > CAMARAS_REINICIO_MAX:
+                    camara['espera'] = 1.0
+                camara['proximo_inicio'] = ahora + camara['espera']
+                print(f"[CAMARAS] ⚠️ {nombre} terminó (código {proceso.exitcode}); "
+                      f"reinicio en {camara['espera']:.0f} s")
+                camara['espera'] = min(camara['espera'] * 2, CAMARAS_REINICIO_MAX)
+                camara['proceso'] = None
+            if camara['proceso'] is None and ahora >= camara['proximo_inicio']:
+                camara['reinicios'] += 1
+                self._iniciar_camara(nombre)
+
+    def estado(self):
+        """
+        Devuelve el estado de cada cámara y del presupuesto compartido.
+
+        Returns:
+            Diccionario con 'camaras' (FPS, retraso, errores, reinicios por cámara),
+            'presupuesto' y el total de alertas guardadas
+        """
+        ahora = time.time()
+        camaras = {}
+        for nombre, camara in self.camaras.items():
+            proceso = camara['proceso']
+            reporte = dict(camara['estado'])
+            camaras[nombre] = dict(
+                reporte,
+                ubicacion=camara['config']['ubicacion'],
+                vivo=proceso is not None and proceso.is_alive(),
+                reinicios=camara['reinicios'],
+                ultimo_codigo=camara['ultimo_codigo'],
+                segundos_sin_reporte=round(ahora - reporte['actualizado'], 1) if reporte else None
+            )
+        return {
+            'camaras': camaras,
+            'presupuesto': self.presupuesto.estadisticas(),
+            'alertas_guardadas': self.alertas_guardadas,
+            'errores_guardado': self.errores_guardado,
+            'actualizado': ahora
+        }
+
+    def publicar_estado(self):
+        """Escribe el estado en ESTADO_CAMARAS_PATH de forma atómica."""
+        temporal = f"{self.ruta_estado}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.estado(), f, ensure_ascii=False, indent=2)
+        os.replace(temporal, self.ruta_estado)
+
+    def imprimir_estado(self):
+        estado = self.estado()
+        for nombre, camara in estado['camaras'].items():
+            errores = camara.get('errores', {})
+            print(f"[CAMARAS] {nombre:<12} {'vivo' if camara['vivo'] else 'caído':<6} "
+                  f"{camara.get('captura_fps', 0):5.1f} fps | {camara.get('analisis_por_segundo', 0):.2f} análisis/s | "
+                  f"retraso {camara.get('ms_retraso', 0):.0f} ms | errores {sum(errores.values())} | "
+                  f"sin presupuesto {camara.get('analisis_sin_presupuesto', 0)} | reinicios {camara['reinicios']}")
+        presupuesto = estado['presupuesto']
+        print(f"[CAMARAS] Detector: {presupuesto['llamadas']} llamadas, {presupuesto['denegadas']} denegadas "
+              f"| Alertas guardadas: {estado['alertas_guardadas']}")
+
+    def detener(self):
+        """Detiene los procesos, guarda las alertas pendientes y vacía el escritor."""
+        from escritor_alertas import detener_escritores
+
+        self.detener_evento.set()
+        for camara in self.camaras.values():
+            proceso = camara['proceso']
+            if proceso is not None:
+                proceso.join(timeout=10)
+                if proceso.is_alive():
+                    proceso.terminate()
+        self.cola_alertas.put(None)
+        for hilo in self._hilos:
+            hilo.join(timeout=10)
+        detener_escritores()
+        self.publicar_estado()
+
+    def ejecutar(self, intervalo_impresion=30.0):
+        self.iniciar()
+        ultima_impresion = time.monotonic()
+        try:
+            while not self.detener_evento.wait(1.0):
+                self.vigilar()
+                self.publicar_estado()
+                if time.monotonic() - ultima_impresion >= intervalo_impresion:
+                    self.imprimir_estado()
+                    ultima_impresion = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print("\n[CAMARAS] Deteniendo cámaras...")
+            self.detener()
+            self.imprimir_estado()
+
+
+def cargar_configuracion(ruta):
+    """
+    Lee y valida el archivo de cámaras.
+
+    Raises:
+        ValueError: Si falta la lista de cámaras o algún campo obligatorio
+    """
+    with open(ruta, encoding='utf-8') as f:
+        config = json.load(f)
+    camaras = config.get('camaras')
+    if not camaras:
+        raise ValueError(f"{ruta} no define ninguna cámara")
+    for camara in camaras:
+        faltantes = [campo for campo in ('nombre', 'fuente', 'ubicacion') if campo not in camara]
+        if faltantes:
+            raise ValueError(f"Cámara {camara.get('nombre', '?')}: faltan {', '.join(faltantes)}")
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supervisor de varias cámaras")
+    parser.add_argument('config', nargs='?', default=CAMARAS_CONFIG, help="Archivo JSON de cámaras")
+    parser.add_argument('--imprimir-cada', type=float, default=30.0, help="Segundos entre resúmenes en consola")
+    args = parser.parse_args()
+
+    supervisor = SupervisorCamaras(cargar_configuracion(args.config))
+    print(f"[CAMARAS] {len(supervisor.camaras)} cámara(s) | Presupuesto: "
+          f"{supervisor.presupuesto.por_segundo * 60:.0f} llamadas/min (0 = sin límite) | Estado en {supervisor.ruta_estado}")
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.detener_evento.set())
+    supervisor.ejecutar(args.imprimir_cada)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Cola de trabajos de análisis en segundo plano.
+
+/analizar guarda la imagen, encola el trabajo y responde de inmediato con un
+id; un pool acotado de hilos ejecuta el análisis sin ocupar los hilos de
+waitress. El estado se consulta en /api/analisis/<job_id>.
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+
+# ------------------ CONFIGURACIÓN ------------------ #
+ANALISIS_WORKERS = int(os.environ.get('ANALISIS_WORKERS', 2))  # Análisis simultáneos
+ANALISIS_COLA_MAX = int(os.environ.get('ANALISIS_COLA_MAX', 32))  # Trabajos en espera antes de rechazar
+ANALISIS_RETENCION_SEGUNDOS = 3600  # Tiempo que se conserva un trabajo terminado
+
+# Estados de un trabajo
+EN_COLA = 'en_cola'
+EJECUTANDO = 'ejecutando'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+
+
+class ColaLlena(Exception):
+    """Se lanza cuando la cola de análisis alcanzó su capacidad máxima."""
+
+
+class ColaAnalisis:
+    """Pool acotado de workers que ejecuta una función de análisis por trabajo."""
+
+    def __init__(self, funcion, workers=ANALISIS_WORKERS, max_cola=ANALISIS_COLA_MAX,
+                 retencion=ANALISIS_RETENCION_SEGUNDOS):
+        self.funcion = funcion
+        self.workers = max(1, workers)
+        self.retencion = retencion
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        self._hilos = []
+        self._ocupados = 0
+        self._tiempo_ocupado = 0.0
+        self._inicio = time.time()
+        self._contadores = {'encolados': 0, 'rechazados': 0, 'completados': 0, 'fallidos': 0}
+
+    def _iniciar_workers(self):
+        """Arranca los hilos la primera vez que se encola un trabajo."""
+        if self._hilos:
+            return
+        for indice in range(self.workers):
+            hilo = threading.Thread(target=self._bucle_worker, name=f"analisis-{indice}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def encolar(self, **parametros):
+        """
+        Encola un trabajo con los parámetros dados para la función de análisis.
+
+        Returns:
+            Id del trabajo
+
+        Raises:
+            ColaLlena: si ya hay ANALISIS_COLA_MAX trabajos esperando
+        """
+        job_id = uuid.uuid4().hex
+        trabajo = {
+            'job_id': job_id,
+            'estado': EN_COLA,
+            'parametros': parametros,
+            'resultado': None,
+            'error': None,
+            'creado': time.time(),
+            'iniciado': None,
+            'terminado': None
+        }
+        with self._lock:
+            self._iniciar_workers()
+            self._purgar()
+            try:
+                self._cola.put_nowait(job_id)
+            except queue.Full:
+                self._contadores['rechazados'] += 1
+                raise ColaLlena(f"La cola de análisis está llena ({self._cola.maxsize} trabajos)")
+            self._trabajos[job_id] = trabajo
+            self._contadores['encolados'] += 1
+        return job_id
+
+    def _purgar(self):
+        """Elimina los trabajos terminados hace más de `retencion` segundos (requiere el lock)."""
+        limite = time.time() - self.retencion
+        vencidos = [job_id for job_id, trabajo in self._trabajos.items()
+                    if trabajo['terminado'] and trabajo['terminado'] < limite]
+        for job_id in vencidos:
+            del self._trabajos[job_id]
+
+    def _bucle_worker(self):
+        while True:
+            job_id = self._cola.get()
+            with self._lock:
+                trabajo = self._trabajos[job_id]
+                trabajo['estado'] = EJECUTANDO
+                trabajo['iniciado'] = time.time()
+                self._ocupados += 1
+
+            try:
+                resultado = self.funcion(**trabajo['parametros'])
+                estado, error = COMPLETADO, None
+            except Exception as e:
+                print(f"[ANÁLISIS] ❌ Trabajo {job_id} falló: {e}")
+                resultado, estado, error = None, FALLIDO, str(e)
+
+            with self._lock:
+                trabajo['resultado'] = resultado
+                trabajo['error'] = error
+                trabajo['estado'] = estado
+                trabajo['terminado'] = time.time()
+                self._ocupados -= 1
+                self._tiempo_ocupado += trabajo['terminado'] - trabajo['iniciado']
+                self._contadores['completados' if estado == COMPLETADO else 'fallidos'] += 1
+            self._cola.task_done()
+
+    def estado(self, job_id):
+        """
+        Devuelve el estado público de un trabajo.
+
+        Returns:
+            Diccionario con job_id, estado, resultado y error, o None si no existe
+        """
+        with self._lock:
+            trabajo = self._trabajos.get(job_id)
+            if trabajo is None:
+                return None
+            return {
+                'job_id': job_id,
+                'estado': trabajo['estado'],
+                'resultado': trabajo['resultado'],
+                'error': trabajo['error'],
+                'segundos_en_cola': ((trabajo['iniciado'] or time.time()) - trabajo['creado']),
+                'segundos_ejecucion': ((trabajo['terminado'] or time.time()) - trabajo['iniciado'])
+                                      if trabajo['iniciado'] else None
+            }
+
+    def metricas(self):
+        """
+        Devuelve la profundidad de la cola y la utilización de los workers.
+
+        Returns:
+            Diccionario con trabajos en cola, workers ocupados, utilización actual
+            e histórica y contadores de trabajos
+        """
+        with self._lock:
+            transcurrido = max(time.time() - self._inicio, 1e-9)
+            tiempo_ocupado = self._tiempo_ocupado + sum(
+                time.time() - t['iniciado'] for t in self._trabajos.values() if t['estado'] == EJECUTANDO
+            )
+            return {
+                'en_cola': self._cola.qsize(),
+                'capacidad_cola': self._cola.maxsize,
+                'workers': self.workers,
+                'workers_ocupados': self._ocupados,
+                'utilizacion': self._ocupados / self.workers,
+                'utilizacion_promedio': tiempo_ocupado / (transcurrido * self.workers),
+                **self._contadores
+            }
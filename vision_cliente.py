@@ -0,0 +1,144 @@
+"""
+Gestor de clientes de Google Vision compartido por todo el proceso.
+
+Los clientes se crean de forma perezosa, se mantienen vivos y se reparten
+en round-robin entre los hilos de waitress y el bucle de la cámara.
+"""
+
+import os
+import threading
+from urllib.parse import urlparse
+
+import grpc
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import vision
+from google.cloud.vision_v1.services.image_annotator.transports.grpc import ImageAnnotatorGrpcTransport
+from google.cloud.vision_v1.services.image_annotator.transports.rest import ImageAnnotatorRestTransport
+
+# Ruta al JSON de credenciales
+os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'hackaton-segiridad-500d3a7a5a64.json'
+
+# ------------------ CONFIGURACIÓN ------------------ #
+VISION_POOL_TAMANO = int(os.environ.get('VISION_POOL_TAMANO', 2))  # Número de canales/clientes
+VISION_KEEPALIVE_MS = int(os.environ.get('VISION_KEEPALIVE_MS', 30000))  # Ping de keepalive del canal
+VISION_CALENTAR = os.environ.get('VISION_CALENTAR', '1') == '1'  # Calentar canales al iniciar
+VISION_TIMEOUT_CALENTAMIENTO = 10  # Segundos máximos esperando a que un canal esté listo
+# Servidor REST alternativo, p. ej. http://localhost:8089 para servidor_vision_falso.py ('' = Google)
+VISION_ENDPOINT = os.environ.get('VISION_ENDPOINT', '')
+
+
+class GestorClientesVision:
+    """
+    Pool de clientes de Vision con canales gRPC persistentes.
+
+    Es seguro compartirlo entre hilos: la creación de cada cliente está
+    protegida por un lock y los clientes de gRPC son thread-safe.
+    """
+
+    def __init__(self, tamano=VISION_POOL_TAMANO, keepalive_ms=VISION_KEEPALIVE_MS):
+        self.tamano = max(1, tamano)
+        self.keepalive_ms = keepalive_ms
+        self._clientes = [None] * self.tamano
+        self._canales = [None] * self.tamano
+        self._siguiente = 0
+        self._lock = threading.Lock()
+
+    def _crear_cliente(self, indice):
+        """Crea el canal y el cliente de la posición indicada del pool."""
+        if VISION_ENDPOINT:
+            return self._crear_cliente_rest(indice)
+
+        opciones = [
+            ('grpc.keepalive_time_ms', self.keepalive_ms),
+            ('grpc.keepalive_timeout_ms', 10000),
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.max_pings_without_data', 0),
+            ('grpc.max_receive_message_length', -1),
+        ]
+        canal = ImageAnnotatorGrpcTransport.create_channel(options=opciones)
+        transporte = ImageAnnotatorGrpcTransport(channel=canal)
+        self._canales[indice] = canal
+        self._clientes[indice] = vision.ImageAnnotatorClient(transport=transporte)
+        return self._clientes[indice]
+
+    def _crear_cliente_rest(self, indice):
+        """Crea un cliente REST contra VISION_ENDPOINT, sin credenciales (servidor local de pruebas)."""
+        destino = urlparse(VISION_ENDPOINT if '://' in VISION_ENDPOINT else f"http://{VISION_ENDPOINT}")
+        transporte = ImageAnnotatorRestTransport(
+            host=destino.netloc,
+            url_scheme=destino.scheme,
+            credentials=AnonymousCredentials()
+        )
+        self._canales[indice] = None
+        self._clientes[indice] = vision.ImageAnnotatorClient(transport=transporte)
+        return self._clientes[indice]
+
+    def obtener_cliente(self):
+        """Devuelve un cliente del pool (round-robin), creándolo si aún no existe."""
+        with self._lock:
+            indice = self._siguiente
+            self._siguiente = (self._siguiente + 1) % self.tamano
+            cliente = self._clientes[indice]
+            if cliente is None:
+                cliente = self._crear_cliente(indice)
+        return cliente
+
+    def calentar(self, timeout=VISION_TIMEOUT_CALENTAMIENTO):
+        """
+        Crea todos los clientes y espera a que sus canales estén conectados.
+
+        Returns:
+            Número de canales listos
+        """
+        with self._lock:
+            for indice in range(self.tamano):
+                if self._clientes[indice] is None:
+                    self._crear_cliente(indice)
+            canales = list(self._canales)
+
+        if VISION_ENDPOINT:
+            print(f"[VISION] Usando el endpoint REST {VISION_ENDPOINT} ({self.tamano} clientes)")
+            return self.tamano
+
+        listos = 0
+        for canal in canales:
+            try:
+                grpc.channel_ready_future(canal).result(timeout=timeout)
+                listos += 1
+            except grpc.FutureTimeoutError:
+                print("[VISION] ⚠️ Canal no disponible tras el calentamiento")
+        print(f"[VISION] Pool calentado: {listos}/{self.tamano} canales listos")
+        return listos
+
+    def cerrar(self):
+        """Cierra todos los canales del pool."""
+        with self._lock:
+            for indice, canal in enumerate(self._canales):
+                if canal is not None:
+                    canal.close()
+                self._canales[indice] = None
+                self._clientes[indice] = None
+
+
+# Instancia global del proceso
+gestor_vision = GestorClientesVision()
+
+
+def obtener_cliente():
+    """Devuelve un cliente de Vision compartido del pool global."""
+    return gestor_vision.obtener_cliente()
+
+
+def calentar_clientes(en_segundo_plano=True):
+    """
+    Calienta el pool global si VISION_CALENTAR está activo.
+
+    Args:
+        en_segundo_plano: Si True, el calentamiento corre en un hilo daemon para no bloquear el arranque
+    """
+    if not VISION_CALENTAR:
+        return
+    if en_segundo_plano:
+        threading.Thread(target=gestor_vision.calentar, name="vision-calentamiento", daemon=True).start()
+    else:
+        gestor_vision.calentar()